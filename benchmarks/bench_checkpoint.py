@@ -0,0 +1,102 @@
+# Memory of several worker processes loading the model from a torch checkpoint or from a flat checkpoint.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_checkpoint [--checkpoint pre_trained_weights/Pix2Vox-A-ShapeNet_cpu.pth] [--workers 4]
+#
+# The checkpoint is converted to a flat checkpoint in a temporary directory. For each format, the workers load the
+# model at the same time, run one forward pass so every weight is read, and wait while their memory is measured.
+# RSS counts shared pages in full in every worker, PSS divides them between the processes sharing them, so the sum
+# of the PSS is the memory the workers really use. Without the checkpoint, random weights are used.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from model.config import cfg
+
+WORKER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import torch
+import lib.utils
+from model.config import cfg
+cfg.INFERENCE.CHECKPOINT_PATH = {checkpoint!r}
+torch.set_num_threads(1)
+model = lib.utils.load_model(cfg)
+loaded = time.perf_counter() - start
+with torch.no_grad():
+    model(torch.zeros(1, 1, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W))
+print(json.dumps({{"load_s": loaded}}), flush=True)
+sys.stdin.read()
+"""
+
+
+def memory_mb(pid):
+    # RSS and PSS of a process from /proc, in MB
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file:
+            fields = line.split()
+            if fields[0] in ("Rss:", "Pss:"):
+                values[fields[0][:-1].lower()] = int(fields[1]) / 1024
+    return values
+
+
+def run(checkpoint, workers):
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER_SCRIPT.format(checkpoint=checkpoint)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        for _ in range(workers)
+    ]
+    try:
+        results = [json.loads(process.stdout.readline()) for process in processes]
+        for process, result in zip(processes, results):
+            result.update(memory_mb(process.pid))
+        return results
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+
+
+def write_random_checkpoint(path):
+    import torch
+    from model.model_architecture import SwinVoxModel
+
+    model = SwinVoxModel(cfg)
+    torch.save({f"{name}_state_dict": getattr(model, name).state_dict() for name in ("encoder", "decoder", "refiner", "merger")}, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the memory of workers loading the checkpoint")
+    parser.add_argument("--checkpoint", default=cfg.INFERENCE.CHECKPOINT_PATH, help="torch checkpoint of the model")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes loading the model at the same time")
+    args = parser.parse_args()
+
+    from lib.helpers import save_checkpoint_flat
+
+    os.makedirs("logs", exist_ok=True)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        checkpoint = args.checkpoint
+        if not os.path.exists(checkpoint):
+            checkpoint = os.path.join(temp_dir, "random.pth")
+            print(f"{args.checkpoint} not found, using random weights")
+            write_random_checkpoint(checkpoint)
+        flat_checkpoint = os.path.join(temp_dir, "model.flat")
+        save_checkpoint_flat(checkpoint, flat_checkpoint)
+
+        print(f"{'format':>6} {'load s':>7} {'RSS MB/worker':>14} {'PSS MB/worker':>14} {'PSS MB total':>13}")
+        for name, path in (("torch", checkpoint), ("flat", flat_checkpoint)):
+            results = run(path, args.workers)
+            load_s = sorted(result["load_s"] for result in results)[len(results) // 2]
+            rss = sum(result["rss"] for result in results) / len(results)
+            pss = sum(result["pss"] for result in results)
+            print(f"{name:>6} {load_s:>7.2f} {rss:>14.0f} {pss / len(results):>14.0f} {pss:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
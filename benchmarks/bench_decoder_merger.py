@@ -0,0 +1,65 @@
+# Latency of the decoder and merger with the views folded into the batch against running the views one at a time.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_decoder_merger [--views 1 4 8 20] [--repeats 5] [--threads N]
+
+import argparse
+import torch
+from benchmarks.bench_encoder import time_ms
+from model.config import cfg
+from model.decoder import Decoder
+from model.merger import Merger
+
+
+def per_view_forward(decoder, merger, image_features):
+    # The previous implementation, one decoder and merger call per view
+    gen_volumes = []
+    raw_features = []
+    for features in torch.split(image_features.permute(1, 0, 2, 3, 4), 1, dim=0):
+        raw_feature = decoder.layer4(decoder.layer3(decoder.layer2(decoder.layer1(features.reshape(-1, 2048, 2, 2, 2)))))
+        gen_volume = decoder.layer5(raw_feature)
+        raw_features.append(torch.cat((raw_feature, gen_volume), dim=1))
+        gen_volumes.append(torch.squeeze(gen_volume, dim=1))
+    coarse_volumes = torch.stack(gen_volumes, dim=1)
+
+    volume_weights = []
+    for raw_feature in raw_features:
+        volume_weight = raw_feature
+        for layer in (merger.layer1, merger.layer2, merger.layer3, merger.layer4, merger.layer5):
+            volume_weight = layer(volume_weight)
+        volume_weights.append(torch.squeeze(volume_weight, dim=1))
+    volume_weights = torch.softmax(torch.stack(volume_weights, dim=1), dim=1)
+    return torch.clamp(torch.sum(coarse_volumes * volume_weights, dim=1), min=0, max=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batched multi-view decoder and merger")
+    parser.add_argument("--views", type=int, nargs="+", default=[1, 4, 8, 20], help="view counts to measure")
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per view count")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    decoder = Decoder(cfg).eval()
+    merger = Merger(cfg).eval()
+
+    def batched_forward(image_features):
+        return merger(*decoder(image_features))
+
+    print(f"torch threads: {torch.get_num_threads()}")
+    print(f"{'views':>6} {'per-view ms':>12} {'batched ms':>12} {'ms / view':>10} {'speedup':>8}")
+    with torch.no_grad():
+        for n_views in args.views:
+            image_features = torch.rand(1, n_views, 256, 8, 8)
+            loop_ms = time_ms(lambda features: per_view_forward(decoder, merger, features), image_features, args.repeats)
+            batched_ms = time_ms(batched_forward, image_features, args.repeats)
+            print(
+                f"{n_views:>6} {loop_ms:>12.1f} {batched_ms:>12.1f} {batched_ms / n_views:>10.1f} "
+                f"{loop_ms / batched_ms:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Latency of the encoder with the views folded into the batch against running the views one at a time.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_encoder [--views 1 4 8 20] [--repeats 5] [--threads N]
+#
+# The encoder has random weights, the latency does not depend on the weight values.
+
+import argparse
+import time
+import torch
+from model.config import cfg
+from model.encoder import Encoder
+
+
+def time_ms(fn, rendering_images, repeats):
+    # Median latency over the repeats, after one warm-up call
+    fn(rendering_images)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(rendering_images)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batched multi-view encoder")
+    parser.add_argument("--views", type=int, nargs="+", default=[1, 4, 8, 20], help="view counts to measure")
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per view count")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    encoder = Encoder(cfg).eval()
+
+    print(f"torch threads: {torch.get_num_threads()}")
+    print(f"{'views':>6} {'per-view ms':>12} {'batched ms':>12} {'speedup':>8}")
+    with torch.no_grad():
+        for n_views in args.views:
+            rendering_images = torch.rand(1, n_views, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W)
+            loop_ms = time_ms(encoder.forward_per_view, rendering_images, args.repeats)
+            batched_ms = time_ms(encoder, rendering_images, args.repeats)
+            print(f"{n_views:>6} {loop_ms:>12.1f} {batched_ms:>12.1f} {loop_ms / batched_ms:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
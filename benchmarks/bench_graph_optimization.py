@@ -0,0 +1,50 @@
+# Forward latency of the model with BatchNorm folding and with frozen TorchScript graphs, against the unchanged model.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_graph_optimization [--views 1,3,8] [--repeats 5] [--threads N]
+#
+# The BatchNorms get random statistics, as a freshly built model would make folding them a no-op, and the largest
+# difference to the unchanged model output is reported with every variant.
+
+import argparse
+import copy
+import torch
+from benchmarks.bench_encoder import time_ms
+from lib.graph_optimization import fold_batch_norms, freeze_model
+from model.config import cfg
+from model.model_architecture import SwinVoxModel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BatchNorm folding and graph freezing")
+    parser.add_argument("--views", default="1,3,8", help="comma separated view counts")
+    parser.add_argument("--repeats", type=int, default=5, help="timed forward passes per measurement")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads, 0 keeps the default")
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    torch.manual_seed(0)
+    model = SwinVoxModel(cfg)
+    for module in model.modules():
+        if isinstance(module, (torch.nn.BatchNorm2d, torch.nn.BatchNorm3d)):
+            module.running_mean.uniform_(-0.1, 0.1)
+            module.running_var.uniform_(0.5, 1.5)
+    model.eval()
+
+    folded = copy.deepcopy(model)
+    fold_batch_norms(folded)
+    frozen = freeze_model(copy.deepcopy(folded), cfg)
+
+    print(f"threads: {torch.get_num_threads()}")
+    print(f"{'views':>5} {'model ms':>9} {'fold ms':>8} {'freeze ms':>10} {'max diff':>9}")
+    for n_views in [int(views) for views in args.views.split(",")]:
+        images = torch.rand(1, n_views, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W)
+        expected = model(images)
+        difference = max((variant(images) - expected).abs().max().item() for variant in (folded, frozen))
+        timings = [time_ms(variant, images, args.repeats) for variant in (model, folded, frozen)]
+        print(f"{n_views:>5} {timings[0]:>9.0f} {timings[1]:>8.0f} {timings[2]:>10.0f} {difference:>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
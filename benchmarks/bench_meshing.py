@@ -0,0 +1,72 @@
+# Compare the mesh generation modes of lib.utils on sample voxel grids.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_meshing [--repeats 5]
+#
+# For every sample grid and mesh mode, reports the triangle count, the size of the exported GLB and the
+# median time to build the mesh and export it. The first row of every grid is the original mesher, one trimesh
+# box per voxel exported by trimesh, and the speedup of the modes is relative to it.
+
+import argparse
+import time
+import numpy as np
+from lib.glb_writer import write_glb
+from lib.meshing import box_per_voxel_mesh
+from lib.utils import MESH_MODES
+
+
+def sample_grids(n_vox=32, seed=0):
+    rng = np.random.default_rng(seed)
+    x, y, z = np.mgrid[:n_vox, :n_vox, :n_vox]
+    centre = (n_vox - 1) / 2
+
+    block = np.zeros((n_vox, n_vox, n_vox), dtype=np.float32)
+    block[4:-4, 8:-8, 2:-2] = 1
+
+    return {
+        "sphere": ((x - centre) ** 2 + (y - centre) ** 2 + (z - centre) ** 2 < (n_vox * 0.45) ** 2).astype(np.float32),
+        "block": block,
+        "random 10%": (rng.random((n_vox, n_vox, n_vox)) < 0.1).astype(np.float32),
+        "random 50%": (rng.random((n_vox, n_vox, n_vox)) < 0.5).astype(np.float32),
+    }
+
+
+def export_glb(mesh):
+    return write_glb(mesh.vertices, mesh.faces)
+
+
+def export_trimesh_glb(mesh):
+    # GLB export of the original pipeline
+    return mesh.export(file_type="glb")
+
+
+def benchmark(voxel_grid, mesh_fn, repeats, export_fn=export_glb):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        mesh = mesh_fn(voxel_grid, voxel_size=1.0)
+        glb_data = export_fn(mesh)
+        timings.append(time.perf_counter() - start)
+    return len(mesh.faces), len(glb_data), float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark voxel grid to GLB mesh modes")
+    parser.add_argument("--repeats", type=int, default=5, help="number of timed runs per grid and mode")
+    args = parser.parse_args()
+
+    print(f"{'grid':<12} {'mode':<10} {'triangles':>10} {'GLB bytes':>12} {'time (ms)':>10} {'speedup':>8}")
+    for grid_name, voxel_grid in sample_grids().items():
+        n_triangles, n_bytes, reference_seconds = benchmark(
+            voxel_grid, box_per_voxel_mesh, args.repeats, export_fn=export_trimesh_glb
+        )
+        print(f"{grid_name:<12} {'original':<10} {n_triangles:>10} {n_bytes:>12} {reference_seconds * 1000:>10.2f} "
+              f"{1.0:>7.1f}x")
+        for mode, mesh_fn in MESH_MODES.items():
+            n_triangles, n_bytes, seconds = benchmark(voxel_grid, mesh_fn, args.repeats)
+            print(f"{grid_name:<12} {mode:<10} {n_triangles:>10} {n_bytes:>12} {seconds * 1000:>10.2f} "
+                  f"{reference_seconds / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# Forward latency of the model exported to ONNX and run by ONNX Runtime, against the PyTorch model.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_onnx [--views 1,3,8] [--repeats 5] [--threads N]
+#
+# The model is built with random weights and exported to a temporary file, both backends get the same inputs and
+# the same intra-op threads. The largest difference between their outputs is reported with every view count.
+
+import argparse
+import os
+import tempfile
+import time
+import torch
+from benchmarks.bench_encoder import time_ms
+from lib.onnx_backend import OnnxRuntimeModel, export_onnx
+from model.config import cfg
+from model.model_architecture import SwinVoxModel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ONNX Runtime backend against PyTorch")
+    parser.add_argument("--views", default="1,3,8", help="comma separated view counts")
+    parser.add_argument("--repeats", type=int, default=5, help="timed forward passes per measurement")
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads, 0 keeps the PyTorch default")
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    torch.manual_seed(0)
+    model = SwinVoxModel(cfg)
+    model.eval()
+    view_counts = [int(views) for views in args.views.split(",")]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.onnx")
+        start = time.perf_counter()
+        export_onnx(model, path, cfg, max_views=max(view_counts))
+        print(f"export: {time.perf_counter() - start:.1f} s, {os.path.getsize(path) / 2 ** 20:.0f} MB")
+        onnx_model = OnnxRuntimeModel(path)
+
+        print(f"threads: {torch.get_num_threads()}")
+        print(f"{'views':>5} {'torch ms':>9} {'onnx ms':>8} {'max diff':>9}")
+        for n_views in view_counts:
+            images = torch.rand(1, n_views, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W)
+            with torch.no_grad():
+                difference = (onnx_model(images) - model(images)).abs().max().item()
+            timings = [time_ms(variant, images, args.repeats) for variant in (model, onnx_model)]
+            print(f"{n_views:>5} {timings[0]:>9.0f} {timings[1]:>8.0f} {difference:>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Throughput of generate_3d_model under concurrent requests, with meshing on the request threads or in a
+# MeshingPool of worker processes.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_pipeline [--clients 8] [--requests 64] [--inference-ms 40] [--mesh-workers 2]
+#
+# Inference is simulated by a model that sleeps for --inference-ms per forward pass (torch releases the GIL
+# inside its kernels in the same way) behind the micro-batching scheduler, and returns a noisy volume that is
+# expensive to mesh. Meshing and GLB export are the real code paths.
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+from lib.meshing import MeshingPool
+from lib.scheduler import MicroBatchScheduler
+from lib.utils import generate_3d_model
+
+
+class SimulatedModel:
+    def __init__(self, inference_ms, n_vox=32, seed=0):
+        self.inference_ms = inference_ms
+        self.lock = threading.Lock()
+
+        # Sphere with noisy surface, the kind of output that gives large meshes
+        rng = np.random.default_rng(seed)
+        x, y, z = np.mgrid[:n_vox, :n_vox, :n_vox]
+        radius = np.sqrt((x - n_vox / 2) ** 2 + (y - n_vox / 2) ** 2 + (z - n_vox / 2) ** 2)
+        volume = 1 / (1 + np.exp(radius - n_vox * 0.4)) + rng.normal(0, 0.2, radius.shape)
+        self.volume = torch.from_numpy(np.clip(volume, 0, 1).astype(np.float32))
+
+    def __call__(self, images_tensor):
+        with self.lock:
+            time.sleep(self.inference_ms / 1000)
+        return self.volume.expand(images_tensor.size(0), -1, -1, -1)
+
+
+def run(n_clients, n_requests, model, mesh_mode, mesh_pool):
+    images_tensor = torch.zeros(1, 1, 3, 8, 8)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_clients) as executor:
+        futures = [
+            executor.submit(generate_3d_model, images_tensor, model, mesh_mode, mesh_pool=mesh_pool)
+            for _ in range(n_requests)
+        ]
+        for future in futures:
+            future.result()
+    return n_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inference and meshing under concurrent requests")
+    parser.add_argument("--clients", type=int, default=8, help="number of concurrent clients")
+    parser.add_argument("--requests", type=int, default=64, help="total number of requests")
+    parser.add_argument("--inference-ms", type=float, default=40, help="simulated forward pass time")
+    parser.add_argument("--mesh-workers", type=int, default=2, help="worker processes of the meshing pool")
+    parser.add_argument("--mesh-mode", default="cubes", help="mesh mode (cubes, greedy, smooth)")
+    args = parser.parse_args()
+
+    mesh_pool = MeshingPool(max_workers=args.mesh_workers).start()
+    scheduler = MicroBatchScheduler(SimulatedModel(args.inference_ms), max_batch_size=8, max_wait_ms=5).start()
+    try:
+        print(f"{'clients':>8} {'meshing':>16} {'requests/s':>12}")
+        for n_clients in sorted({1, args.clients}):
+            for name, pool in (("request thread", None), (f"{args.mesh_workers} processes", mesh_pool)):
+                throughput = run(n_clients, args.requests, scheduler, args.mesh_mode, pool)
+                print(f"{n_clients:>8} {name:>16} {throughput:>12.2f}")
+    finally:
+        scheduler.stop()
+        mesh_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# Memory and latency of the gunicorn workers, with the model loaded once in the master process before the fork or
+# loaded again by every worker.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_prefork [--checkpoint pre_trained_weights/Pix2Vox-A-ShapeNet_cpu.pth] [--workers 2] [--requests 8]
+#
+# Both modes run gunicorn.conf.py, only preload_app differs. Once the workers are up, the benchmark uploads a new
+# random image per request, so the result cache never answers, and reads the memory of the server from /proc. The
+# totals are over the master, the workers and their meshing processes: PSS divides shared pages between the processes
+# sharing them, so its sum is the memory the server really uses, and private dirty memory is memory a process wrote
+# and shares with no other process. Without the checkpoint, random weights are used.
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from io import BytesIO
+import numpy as np
+from PIL import Image
+from benchmarks.bench_startup import write_random_checkpoint
+from model.config import cfg
+
+CONFIG = """
+exec(open("gunicorn.conf.py").read())
+from model.config import cfg
+cfg.INFERENCE.CHECKPOINT_PATH = {checkpoint!r}
+workers = {workers}
+preload_app = {preload}
+bind = "127.0.0.1:{port}"
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def upload(port, image):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"images[]\"; filename=\"view.png\"\r\n"
+        f"Content-Type: image/png\r\n\r\n"
+    ).encode() + image + f"\r\n--{boundary}--\r\n".encode()
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/upload", data=body, headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return response.read()
+
+
+def random_png(seed):
+    png = BytesIO()
+    Image.fromarray(np.random.default_rng(seed).integers(0, 255, (224, 224, 3), dtype=np.uint8)).save(png, format="PNG")
+    return png.getvalue()
+
+
+def memory_mb(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file:
+            fields = line.split()
+            if fields[0] in ("Rss:", "Pss:", "Private_Dirty:"):
+                values[fields[0][:-1].lower()] = int(fields[1]) / 1024
+    return values
+
+
+def child_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as file:
+        return [int(child) for child in file.read().split()]
+
+
+def tree_pids(pid):
+    return [pid] + [descendant for child in child_pids(pid) for descendant in tree_pids(child)]
+
+
+def run(checkpoint, workers, preload, requests, temp_dir):
+    port = free_port()
+    config_path = os.path.join(temp_dir, f"gunicorn_{preload}.conf.py")
+    with open(config_path, "w") as file:
+        file.write(CONFIG.format(checkpoint=checkpoint, workers=workers, preload=preload, port=port))
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", config_path, "main:app"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        # Wait until gunicorn answers and every worker holds the model, which it loaded or inherited
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/ready", timeout=5):
+                    pass
+                pids = child_pids(server.pid)
+                if len(pids) == workers and all(memory_mb(pid)["rss"] > 300 for pid in pids):
+                    break
+            except OSError:
+                pass
+            if server.poll() is not None:
+                raise RuntimeError("gunicorn exited")
+            time.sleep(0.5)
+        ready = time.perf_counter() - start
+
+        latencies = []
+        for index in range(requests):
+            request_start = time.perf_counter()
+            upload(port, random_png(index + 1000 * preload))
+            latencies.append(time.perf_counter() - request_start)
+
+        workers_rss = [memory_mb(pid)["rss"] for pid in child_pids(server.pid)]
+        total = [memory_mb(pid) for pid in tree_pids(server.pid)]
+        return (
+            ready, sorted(latencies)[len(latencies) // 2], sum(workers_rss) / len(workers_rss),
+            sum(memory["pss"] for memory in total), sum(memory["private_dirty"] for memory in total),
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pre-forked gunicorn workers")
+    parser.add_argument("--checkpoint", default=cfg.INFERENCE.CHECKPOINT_PATH, help="checkpoint loaded by the application")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--requests", type=int, default=8, help="uploads sent before the memory is measured")
+    args = parser.parse_args()
+
+    os.makedirs("logs", exist_ok=True)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        checkpoint = os.path.abspath(args.checkpoint)
+        if not os.path.exists(checkpoint):
+            checkpoint = os.path.join(temp_dir, "random.pth")
+            print(f"{args.checkpoint} not found, using random weights")
+            write_random_checkpoint(checkpoint)
+
+        print(
+            f"{'model loaded':>13} {'ready s':>8} {'p50 s':>6} {'RSS MB/worker':>14} {'PSS MB total':>13} "
+            f"{'private dirty MB total':>23}"
+        )
+        for name, preload in (("per worker", False), ("before fork", True)):
+            ready, latency, rss, pss, private_dirty = run(checkpoint, args.workers, preload, args.requests, temp_dir)
+            print(f"{name:>13} {ready:>8.1f} {latency:>6.2f} {rss:>14.0f} {pss:>13.0f} {private_dirty:>23.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Preprocessing time of an upload.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_preprocessing [--views 8] [--size 1024 768] [--repeats 10] [--workers 4]
+#
+# Compares the fused ResizePadNormalize step with ResizeAndPad, Normalize and ToTensor on decoded images, then the
+# decoding of JPEG uploads at full size or in draft mode, serially or on a thread pool.
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import numpy as np
+import torch
+from PIL import Image
+from lib.data_transforms import Compose, Normalize, ToTensor, ResizeAndPad, ResizePadNormalize
+from lib.utils import decode_image
+from model.config import cfg
+
+
+def time_ms(fn, repeats):
+    # Median latency over the repeats, after one warm-up call
+    fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def photo(width, height, seed):
+    # JPEG bytes of a smooth random image, which compresses like a photo
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, size=(height // 32, width // 32, 3), dtype=np.uint8)
+    image_bytes = BytesIO()
+    Image.fromarray(small).resize((width, height), Image.BILINEAR).save(image_bytes, format="JPEG", quality=90)
+    return image_bytes.getvalue()
+
+
+def preprocess(images, transform, draft, pool):
+    # Decode, resize, pad and normalize every image into its slice of the output tensor, as process_images does
+    transformed_images = torch.empty((len(images), 3, transform.target_h, transform.target_w), dtype=torch.float32)
+    out = transformed_images.numpy()
+
+    def process_image(index):
+        np_image = decode_image(images[index], (transform.target_w, transform.target_h), draft)
+        transform.transform_into(np_image, out[index])
+
+    if pool is None:
+        for index in range(len(images)):
+            process_image(index)
+    else:
+        list(pool.map(process_image, range(len(images))))
+    return transformed_images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inference preprocessing")
+    parser.add_argument("--views", type=int, default=8, help="images per upload")
+    parser.add_argument("--size", type=int, nargs=2, default=[1024, 768], help="width and height of decoded images")
+    parser.add_argument("--photo-size", type=int, nargs=2, default=[4032, 3024], help="width and height of JPEG uploads")
+    parser.add_argument("--repeats", type=int, default=10, help="timed runs")
+    parser.add_argument("--workers", type=int, default=cfg.INFERENCE.DECODE_WORKERS, help="decode threads")
+    args = parser.parse_args()
+
+    img_size = cfg.CONST.IMG_H, cfg.CONST.IMG_W
+    transform = Compose([
+        ResizeAndPad(img_size, bg_color_range=cfg.TEST.RANDOM_BG_COLOR_RANGE),
+        Normalize(mean=cfg.DATASET.MEAN, std=cfg.DATASET.STD),
+        ToTensor(),
+    ])
+    fused_transform = ResizePadNormalize(
+        img_size, mean=cfg.DATASET.MEAN, std=cfg.DATASET.STD, bg_color_range=cfg.TEST.RANDOM_BG_COLOR_RANGE
+    )
+
+    width, height = args.size
+    images = [np.random.randint(0, 255, size=(height, width, 3), dtype=np.uint8) for _ in range(args.views)]
+    print(f"{args.views} decoded images of {width}x{height}")
+    print(f"{'transform':>28} {'ms':>8}")
+    print(f"{'compose':>28} {time_ms(lambda: transform(images), args.repeats):>8.2f}")
+    print(f"{'resize pad normalize':>28} {time_ms(lambda: fused_transform(images), args.repeats):>8.2f}")
+
+    width, height = args.photo_size
+    photos = [photo(width, height, seed) for seed in range(args.views)]
+    print(f"\n{args.views} JPEG uploads of {width}x{height}")
+    print(f"{'decoding':>28} {'ms':>8}")
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for name, draft, decode_pool in (
+            ("full size, serial", False, None),
+            ("draft, serial", True, None),
+            (f"full size, {args.workers} threads", False, pool),
+            (f"draft, {args.workers} threads", True, pool),
+        ):
+            latency_ms = time_ms(lambda: preprocess(photos, fused_transform, draft, decode_pool), args.repeats)
+            print(f"{name:>28} {latency_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
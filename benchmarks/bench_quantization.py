@@ -0,0 +1,138 @@
+# Accuracy, latency and memory of the dynamic and static int8 variants of the model against the float model.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_quantization [--checkpoint pre_trained_weights/Pix2Vox-A-ShapeNet_cpu.pth]
+#                                           [--images sample_test_images] [--views 3] [--repeats 5]
+#
+# The static variant is calibrated on the same images it is evaluated on. The accuracy is the mean IoU of the
+# occupied voxels of a variant and of the float model at every cfg.TEST.VOXEL_THRESH level. Without the checkpoint,
+# random weights are used, and without the image directory, images of random shapes: the benchmark then only
+# measures speed and memory, the IoU of a model with random weights means little.
+#
+# The peak RSS of a variant is measured in a new process that loads it as the server does, with load_model, and runs
+# one forward pass: it counts the weights, the packed int8 buffers, the activations and the allocator. The serialized
+# size is that of the state dict of the variant.
+
+import argparse
+import copy
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from io import BytesIO
+import numpy as np
+import torch
+from PIL import Image, ImageDraw
+from benchmarks.bench_encoder import time_ms
+from benchmarks.bench_startup import write_random_checkpoint
+from calibrate import load_image_groups
+from lib.quantization import calibrate_encoder, quantize_linear_layers, save_calibration, select_engine
+from lib.utils import load_model, process_images
+from model.config import cfg
+
+MEMORY_SCRIPT = """
+import json, resource
+import torch
+import lib.utils
+from model.config import cfg
+cfg.INFERENCE.CHECKPOINT_PATH = {checkpoint!r}
+cfg.QUANTIZATION.MODE = {mode!r}
+cfg.QUANTIZATION.CALIBRATION_PATH = {calibration!r}
+model = lib.utils.load_model(cfg)
+with torch.no_grad():
+    model(torch.zeros(1, {views}, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W))
+print(json.dumps({{"peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}), flush=True)
+"""
+
+
+def random_shape_groups(n_objects, views, seed=0):
+    rng = np.random.default_rng(seed)
+    groups = []
+    for _ in range(n_objects):
+        images = []
+        for _ in range(views):
+            image = Image.new("RGB", (224, 224), (240, 240, 240))
+            draw = ImageDraw.Draw(image)
+            for _ in range(3):
+                x, y = rng.integers(20, 140, 2)
+                w, h = rng.integers(30, 80, 2)
+                color = tuple(int(c) for c in rng.integers(0, 200, 3))
+                (draw.ellipse if rng.random() < 0.5 else draw.rectangle)([x, y, x + w, y + h], fill=color)
+            png = BytesIO()
+            image.save(png, format="PNG")
+            images.append(png.getvalue())
+        groups.append(process_images(images, cfg))
+    return groups
+
+
+def serialized_mb(model):
+    buffer = BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 2 ** 20
+
+
+def peak_rss_mb(checkpoint, mode, calibration, views):
+    # Peak resident memory of a new process that loads the variant and runs one forward pass, ru_maxrss is in KB
+    output = subprocess.run(
+        [sys.executable, "-c", MEMORY_SCRIPT.format(checkpoint=checkpoint, mode=mode, calibration=calibration, views=views)],
+        stdout=subprocess.PIPE, text=True, check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])["peak_rss_mb"]
+
+
+def iou(volume, reference, thresh):
+    occupied, reference_occupied = volume >= thresh, reference >= thresh
+    union = (occupied | reference_occupied).sum().item()
+    return (occupied & reference_occupied).sum().item() / union if union else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the quantized model variants")
+    parser.add_argument("--checkpoint", default=cfg.INFERENCE.CHECKPOINT_PATH, help="checkpoint of the float model")
+    parser.add_argument("--images", default="sample_test_images", help="directory of calibration and test images")
+    parser.add_argument("--views", type=int, default=3, help="images per object")
+    parser.add_argument("--repeats", type=int, default=5, help="timed forward passes per variant")
+    args = parser.parse_args()
+
+    os.makedirs("logs", exist_ok=True)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        checkpoint = args.checkpoint
+        if not os.path.exists(checkpoint):
+            checkpoint = os.path.join(temp_dir, "random.pth")
+            print(f"{args.checkpoint} not found, using random weights")
+            write_random_checkpoint(checkpoint)
+        cfg.INFERENCE.CHECKPOINT_PATH = checkpoint
+        cfg.QUANTIZATION.MODE = "none"
+        model = load_model(cfg)
+
+        if os.path.isdir(args.images):
+            groups = load_image_groups(args.images, args.views, cfg)
+        else:
+            print(f"{args.images} not found, using images of random shapes")
+            groups = random_shape_groups(8, args.views)
+
+        engine = select_engine(cfg)
+        dynamic_model = quantize_linear_layers(copy.deepcopy(model))
+        static_model = calibrate_encoder(quantize_linear_layers(copy.deepcopy(model)), groups, engine)
+        calibration = os.path.join(temp_dir, "encoder_int8.pth")
+        save_calibration(static_model.encoder, engine, calibration)
+
+        reference = [model(images) for images in groups]
+        thresholds = cfg.TEST.VOXEL_THRESH
+        print(f"engine: {engine}, {len(groups)} objects of {groups[0].size(1)} views")
+        print(f"{'variant':>8} {'forward ms':>11} {'peak RSS MB':>12} {'serialized MB':>14} "
+              + " ".join(f"{f'IoU@{t}':>8}" for t in thresholds))
+        for name, mode, variant in (("float", "none", model), ("dynamic", "dynamic", dynamic_model),
+                                    ("static", "static", static_model)):
+            ious = [
+                np.mean([iou(variant(images), volume, t) for images, volume in zip(groups, reference)])
+                for t in thresholds
+            ]
+            latency = time_ms(variant, groups[0], args.repeats)
+            rss = peak_rss_mb(checkpoint, mode, calibration, groups[0].size(1))
+            print(f"{name:>8} {latency:>11.0f} {rss:>12.0f} {serialized_mb(variant):>14.0f} "
+                  + " ".join(f"{value:>8.4f}" for value in ious))
+
+if __name__ == "__main__":
+    main()
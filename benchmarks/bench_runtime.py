@@ -0,0 +1,103 @@
+# Latency and throughput of SwinVoxModel.forward under the thread, pinning and concurrency settings of cfg.RUNTIME.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_runtime [--intra-op 1,2,4] [--inter-op 0,1] [--pinning none] [--limits 1,2,4]
+#                                      [--clients 4] [--requests 32] [--views 3]
+#
+# Every combination runs in a fresh process configured through the SWINVOX_RUNTIME_* environment variables, since
+# PyTorch only sets the inter-op threads once per process. clients threads send requests of views views each as
+# fast as they are answered, through an InferenceLimiter with the given limit (0 for none), and the latency of a
+# request includes the time it waited for the limiter. The model has random weights.
+
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+
+BENCH_SCRIPT = """
+import json, threading, time
+import torch
+from lib.runtime import configure_runtime, InferenceLimiter
+from model.config import cfg
+from model.model_architecture import SwinVoxModel
+
+settings = configure_runtime(cfg)
+model = SwinVoxModel(cfg)
+model.eval()
+images = torch.rand(1, {views}, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W)
+model(images)
+limit = cfg.RUNTIME.MAX_CONCURRENT_INFERENCE
+inference_model = InferenceLimiter(model, limit) if limit > 0 else model
+
+latencies = []
+lock = threading.Lock()
+
+def client(n_requests):
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        inference_model(images)
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+threads = [threading.Thread(target=client, args=({requests} // {clients},)) for _ in range({clients})]
+start = time.perf_counter()
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+elapsed = time.perf_counter() - start
+
+latencies.sort()
+print(json.dumps({{
+    "intra_op_threads": settings["intra_op_threads"],
+    "inter_op_threads": settings["inter_op_threads"],
+    "p50_ms": latencies[len(latencies) // 2] * 1000,
+    "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    "throughput": len(latencies) / elapsed,
+}}))
+"""
+
+
+def run(intra_op, inter_op, pinning, limit, clients, requests, views):
+    env = dict(
+        os.environ,
+        SWINVOX_RUNTIME_INTRA_OP_THREADS=str(intra_op),
+        SWINVOX_RUNTIME_INTER_OP_THREADS=str(inter_op),
+        SWINVOX_RUNTIME_PINNING=pinning,
+        SWINVOX_RUNTIME_MAX_CONCURRENT_INFERENCE=str(limit),
+    )
+    script = BENCH_SCRIPT.format(views=views, requests=requests, clients=clients)
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, env=env).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the runtime settings of the model")
+    parser.add_argument("--intra-op", type=int_list, default=[1, 2, 4], help="intra-op thread counts, 0 for all cores")
+    parser.add_argument("--inter-op", type=int_list, default=[0, 1], help="inter-op thread counts, 0 for the default")
+    parser.add_argument("--pinning", default="none", help="pinning strategies, comma separated")
+    parser.add_argument("--limits", type=int_list, default=[1, 2, 4], help="concurrent forward passes, 0 for no limit")
+    parser.add_argument("--clients", type=int, default=4, help="threads sending requests")
+    parser.add_argument("--requests", type=int, default=32, help="requests per combination")
+    parser.add_argument("--views", type=int, default=3, help="views per request")
+    args = parser.parse_args()
+
+    print(f"{'intra':>5} {'inter':>5} {'pinning':>7} {'limit':>5} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>6}")
+    for intra_op, inter_op, pinning, limit in itertools.product(
+        args.intra_op, args.inter_op, args.pinning.split(","), args.limits
+    ):
+        result = run(intra_op, inter_op, pinning, limit, args.clients, args.requests, args.views)
+        print(
+            f"{result['intra_op_threads']:>5} {result['inter_op_threads']:>5} {pinning:>7} {limit:>5} "
+            f"{result['p50_ms']:>8.0f} {result['p99_ms']:>8.0f} {result['throughput']:>6.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
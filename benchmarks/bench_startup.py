@@ -0,0 +1,84 @@
+# Startup time of the application, with the model loaded on the import thread or in the background.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_startup [--checkpoint pre_trained_weights/Pix2Vox-A-ShapeNet_cpu.pth] [--repeats 3]
+#
+# Every run imports main in a fresh process and reports the time until the server can answer requests (main is
+# imported) and until /api/ready returns 200. Without the checkpoint, a checkpoint of random weights is written to
+# a temporary directory.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from model.config import cfg
+
+STARTUP_SCRIPT = """
+import json, os, time
+start = time.perf_counter()
+from model.config import cfg
+cfg.INFERENCE.CHECKPOINT_PATH = {checkpoint!r}
+cfg.STARTUP.LAZY_MODEL_LOADING = {lazy}
+cfg.CACHE.RESULTS_STORE = 'memory'
+cfg.JOBS.STORE = 'memory'
+import main
+imported = time.perf_counter() - start
+main.model_loader.wait()
+ready = time.perf_counter() - start
+print(json.dumps({{"imported": imported, "ready": ready, "status": main.model_loader.status()["status"]}}))
+# The meshing workers inherit stdout, the benchmark reads it until they exit too
+if main.mesh_pool is not None:
+    main.mesh_pool.shutdown()
+os._exit(0)
+"""
+
+
+def write_random_checkpoint(path):
+    import torch
+    from model.model_architecture import SwinVoxModel
+
+    model = SwinVoxModel(cfg)
+    torch.save({
+        "encoder_state_dict": model.encoder.state_dict(),
+        "decoder_state_dict": model.decoder.state_dict(),
+        "refiner_state_dict": model.refiner.state_dict(),
+        "merger_state_dict": model.merger.state_dict(),
+    }, path)
+
+
+def run(checkpoint, lazy):
+    script = STARTUP_SCRIPT.format(checkpoint=checkpoint, lazy=lazy)
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True, env=dict(os.environ, PYTHONWARNINGS="ignore")
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the application startup")
+    parser.add_argument("--checkpoint", default=cfg.INFERENCE.CHECKPOINT_PATH, help="checkpoint loaded by the application")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per mode")
+    args = parser.parse_args()
+
+    os.makedirs("logs", exist_ok=True)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        checkpoint = args.checkpoint
+        if not os.path.exists(checkpoint):
+            checkpoint = os.path.join(temp_dir, "random.pth")
+            print(f"{args.checkpoint} not found, using random weights")
+            write_random_checkpoint(checkpoint)
+
+        print(f"{'model loading':>14} {'serving s':>10} {'ready s':>9}")
+        for name, lazy in (("import thread", False), ("background", True)):
+            results = [run(checkpoint, lazy) for _ in range(args.repeats)]
+            if any(result["status"] != "ready" for result in results):
+                raise RuntimeError(f"The model failed to load: {results}")
+            imported = sorted(result["imported"] for result in results)[len(results) // 2]
+            ready = sorted(result["ready"] for result in results)[len(results) // 2]
+            print(f"{name:>14} {imported:>10.2f} {ready:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
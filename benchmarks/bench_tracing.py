@@ -0,0 +1,52 @@
+# Overhead of the per-stage timers, with tracing disabled and enabled.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_tracing [--calls 1000000] [--views 1,3] [--repeats 5]
+#
+# Reports the cost of one empty stage, then the forward latency of the model (random weights) with tracing
+# disabled and enabled. A forward pass runs four to a dozen stages.
+
+import argparse
+import time
+import torch
+from benchmarks.bench_encoder import time_ms
+from lib.tracing import Tracer, tracer
+from model.config import cfg
+from model.model_architecture import SwinVoxModel
+
+
+def stage_ns(stages, calls):
+    # Mean cost of entering and leaving an empty stage
+    start = time.perf_counter()
+    for _ in range(calls):
+        with stages.stage("stage"):
+            pass
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the overhead of the stage timers")
+    parser.add_argument("--calls", type=int, default=1000000, help="empty stages per measurement")
+    parser.add_argument("--views", default="1,3", help="comma separated view counts")
+    parser.add_argument("--repeats", type=int, default=5, help="timed forward passes per measurement")
+    args = parser.parse_args()
+
+    print(f"empty stage: {stage_ns(Tracer(enabled=False), args.calls):.0f} ns disabled, "
+          f"{stage_ns(Tracer(enabled=True), args.calls):.0f} ns enabled")
+
+    torch.manual_seed(0)
+    model = SwinVoxModel(cfg)
+    model.eval()
+    print(f"{'views':>5} {'disabled ms':>12} {'enabled ms':>11}")
+    for n_views in [int(views) for views in args.views.split(",")]:
+        images = torch.rand(1, n_views, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W)
+        timings = []
+        for enabled in (False, True):
+            tracer.enabled = enabled
+            timings.append(time_ms(model, images, args.repeats))
+        tracer.enabled = False
+        print(f"{n_views:>5} {timings[0]:>12.0f} {timings[1]:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
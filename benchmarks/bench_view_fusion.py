@@ -0,0 +1,47 @@
+# Peak memory and latency of the model with all views fused at once against the streaming fusion in chunks.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_view_fusion [--views 4 8 20] [--chunk-size 4]
+#
+# Every measurement runs in a fresh process so the peak resident set size of one configuration does not carry over
+# to the next. The model has random weights.
+
+import argparse
+import multiprocessing
+import resource
+import time
+import torch
+from model.config import cfg
+from model.model_architecture import SwinVoxModel
+
+
+def measure(n_views, chunk_size):
+    # Runs in the child process, returns (peak RSS growth in MB, latency in ms)
+    model = SwinVoxModel(cfg).eval()
+    model.view_chunk_size = chunk_size
+    rendering_images = torch.rand(1, n_views, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W)
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    model(rendering_images)
+    latency_ms = (time.perf_counter() - start) * 1000
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_kb) / 1024, latency_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming view fusion")
+    parser.add_argument("--views", type=int, nargs="+", default=[4, 8, 20], help="view counts to measure")
+    parser.add_argument("--chunk-size", type=int, default=4, help="views per chunk of the streaming fusion")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'views':>6} {'fusion':>10} {'peak MB':>9} {'ms':>9}")
+    for n_views in args.views:
+        for name, chunk_size in (("all", 0), (f"chunks {args.chunk_size}", args.chunk_size)):
+            with context.Pool(1) as pool:
+                peak_mb, latency_ms = pool.apply(measure, (n_views, chunk_size))
+            print(f"{n_views:>6} {name:>10} {peak_mb:>9.0f} {latency_ms:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Calibrate the int8 encoder of the static quantization mode on local sample images.
+#
+# Usage (from the project root):
+#   python calibrate.py [--images sample_test_images] [--views 1]
+#
+# Every image in the directory is preprocessed like an upload, views images at a time make one object. The range of
+# the encoder activations on these objects sets the int8 scales, so the images should look like the uploads the
+# server gets. The int8 encoder is written to cfg.QUANTIZATION.CALIBRATION_PATH, set cfg.QUANTIZATION.MODE to
+# 'static' to serve it.
+
+import argparse
+import os
+from lib.quantization import calibrate_encoder, save_calibration, select_engine
+from lib.utils import load_model, process_images
+from model.config import cfg
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+# Preprocessed objects of views images each, [1, views, 3, H, W], from the images of a directory
+def load_image_groups(directory, views, cfg):
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        raise ValueError(f"No images in {directory}")
+
+    groups = []
+    for start in range(0, len(paths), views):
+        images = []
+        for path in paths[start:start + views]:
+            with open(path, "rb") as file:
+                images.append(file.read())
+        groups.append(process_images(images, cfg))
+    return groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the int8 encoder of the static quantization mode")
+    parser.add_argument("--images", default="sample_test_images", help="directory of calibration images")
+    parser.add_argument("--views", type=int, default=1, help="images per object")
+    parser.add_argument("--output", default=cfg.QUANTIZATION.CALIBRATION_PATH, help="calibrated encoder file")
+    args = parser.parse_args()
+
+    calibration_images = load_image_groups(args.images, args.views, cfg)
+
+    # The float model is calibrated whatever the server is set to. The encoder modules are fused for quantization
+    # here, so the BatchNorms must not be folded or the encoder frozen already.
+    cfg.QUANTIZATION.MODE = "none"
+    cfg.INFERENCE.OPTIMIZE = "none"
+    model = load_model(cfg)
+    engine = select_engine(cfg)
+    calibrate_encoder(model, calibration_images, engine)
+
+    save_calibration(model.encoder, engine, args.output, images=args.images)
+    print(f"Calibrated the {engine} int8 encoder on {len(calibration_images)} objects, saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# Export the model to ONNX for the onnxruntime inference backend.
+#
+# Usage (from the project root):
+#   python export_onnx.py [--output pre_trained_weights/Pix2Vox-A-ShapeNet_cpu.onnx] [--max-views 64]
+#
+# The float model is exported from the checkpoint, with the encoder, decoder, merger and refiner in one graph that
+# takes [batch_size, n_views, 3, H, W] images of any batch size and up to max-views views. The exporter needs the
+# onnx and onnxscript packages, the backend the onnxruntime package. Set cfg.INFERENCE.BACKEND to 'onnxruntime' to
+# serve the exported model.
+
+import argparse
+from lib.onnx_backend import export_onnx
+from lib.utils import load_model
+from model.config import cfg
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the model to ONNX")
+    parser.add_argument("--output", default=cfg.INFERENCE.ONNX_PATH, help="exported model file")
+    parser.add_argument("--max-views", type=int, default=64, help="largest view count the exported model accepts")
+    args = parser.parse_args()
+
+    # The float model is exported whatever the server is set to
+    cfg.QUANTIZATION.MODE = "none"
+    cfg.INFERENCE.OPTIMIZE = "none"
+    model = load_model(cfg)
+
+    export_onnx(model, args.output, cfg, max_views=args.max_views)
+    print(f"Exported the model to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Production server: gunicorn -c gunicorn.conf.py main:app (see prodserver.sh)
+#
+# The master process imports main, which loads and warms up the model, and then forks the workers. The workers share
+# the weights with the master copy-on-write instead of each loading its own copy, and start their meshing processes
+# and threads in main.start_worker. Worker counts are set in cfg.SERVER and the threads of each worker in cfg.RUNTIME.
+
+import gc
+import os
+import torch
+from lib.runtime import WorkerSlots
+from model.config import cfg
+
+cfg.SERVER.PREFORK = True
+
+# A forked worker hangs in its first parallel region when the master used the OpenMP thread pool before the fork,
+# so the master loads and warms up the model on one thread. The workers set their own thread count.
+torch.set_num_threads(1)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+workers = cfg.SERVER.WORKERS
+worker_class = "gthread"
+threads = cfg.SERVER.THREADS
+preload_app = True
+timeout = 300
+
+
+def when_ready(server):
+    # Runs after the application is loaded, before the first fork. The garbage collector writes to the header of
+    # every object it scans, which would copy the pages holding the model objects into each worker, so the objects
+    # created so far are moved out of its reach.
+    gc.freeze()
+
+
+# Indices of the live workers, kept by the master
+worker_slots = WorkerSlots()
+
+
+def pre_fork(server, worker):
+    # Runs in the master, the forked worker inherits the index
+    worker.swinvox_index = worker_slots.acquire(worker.age)
+
+
+def post_fork(server, worker):
+    import main
+
+    main.start_worker(worker_index=worker.swinvox_index)
+
+
+def child_exit(server, worker):
+    # Runs in the master once a worker exited, its replacement takes the index over
+    worker_slots.release(worker.age)
+
+
+def worker_exit(server, worker):
+    import main
+
+    if main.mesh_pool is not None:
+        main.mesh_pool.shutdown()
@@ -4,7 +4,7 @@
 # References:
 # - https://github.com/xiumingzhang/GenRe-ShapeHD
 
-import cv2
+# cv2 is imported by the transforms that use it, so importing this module does not load OpenCV
 # import matplotlib.pyplot as plt
 # import matplotlib.patches as patches
 import numpy as np
@@ -90,6 +90,8 @@ class CenterCrop(object):
         self.crop_size_w = crop_size[1]
 
     def __call__(self, rendering_images, bounding_box=None):
+        import cv2
+
         if len(rendering_images) == 0:
             return rendering_images
 
@@ -184,6 +186,8 @@ class RandomCrop(object):
         self.crop_size_w = crop_size[1]
 
     def __call__(self, rendering_images, bounding_box=None):
+        import cv2
+
         if len(rendering_images) == 0:
             return rendering_images
 
@@ -429,6 +433,8 @@ class RandomBackground(object):
             self.random_bg_files = [os.path.join(random_bg_folder_path, rbf) for rbf in self.random_bg_files]
 
     def __call__(self, rendering_images):
+        import cv2
+
         if len(rendering_images) == 0:
             return rendering_images
 
@@ -471,6 +477,8 @@ class ResizeAndPad(object):
         self.bg_color_range = bg_color_range  # [[low, high] for each RGB channel]
 
     def __call__(self, rendering_images):
+        import cv2
+
         if len(rendering_images) == 0:
             return rendering_images
 
@@ -506,4 +514,52 @@ class ResizeAndPad(object):
         else:
             bg_color = [0, 0, 0]  # Default to black
             
-        return np.full((height, width, channels), bg_color, dtype=np.uint8)
\ No newline at end of file
+        return np.full((height, width, channels), bg_color, dtype=np.uint8)
+
+# Deterministic inference version of ResizeAndPad, Normalize and ToTensor in one step
+class ResizePadNormalize(object):
+    def __init__(self, target_size, mean, std, bg_color_range=None):
+        """
+            Resizes images while preserving aspect ratio, pads them with a fixed background color and normalizes
+            them, writing straight into one float32 [n_views, 3, H, W] tensor. The background is the centre of
+            bg_color_range, normalized once into a tile that is copied under every image.
+        """
+        self.target_h, self.target_w = target_size
+        self.mean = np.array(mean, dtype=np.float32).reshape(3, 1, 1)
+        self.std = np.array(std, dtype=np.float32).reshape(3, 1, 1)
+
+        if bg_color_range:
+            bg_color = [(bg_color_range[i][0] + bg_color_range[i][1]) // 2 for i in range(3)]
+        else:
+            bg_color = [0, 0, 0]  # Default to black
+        self.bg_tile = np.empty((3, self.target_h, self.target_w), dtype=np.float32)
+        self.bg_tile[:] = np.array(bg_color, dtype=np.uint8).reshape(3, 1, 1)
+        self._normalize(self.bg_tile, self.bg_tile)
+
+    def __call__(self, rendering_images):
+        transformed_images = torch.empty((len(rendering_images), 3, self.target_h, self.target_w), dtype=torch.float32)
+        out = transformed_images.numpy()
+        for img_idx, img in enumerate(rendering_images):
+            self.transform_into(img, out[img_idx])
+        return transformed_images
+
+    def transform_into(self, img, out):
+        # Writes one H x W x 3 uint8 image into out, a [3, target_h, target_w] float32 array
+        import cv2
+
+        h, w = img.shape[:2]
+        scale = min(self.target_h / h, self.target_w / w)
+        new_h, new_w = int(h * scale), int(w * scale)
+        resized_img = img if (new_h, new_w) == (h, w) else cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
+
+        top = (self.target_h - new_h) // 2
+        left = (self.target_w - new_w) // 2
+        np.copyto(out, self.bg_tile)
+        self._normalize(resized_img.transpose(2, 0, 1), out[:, top:top + new_h, left:left + new_w])
+        return out
+
+    def _normalize(self, image, out):
+        # Same operations as Normalize, so the result is identical, without the intermediate copies
+        np.divide(image, np.float32(255.0), out=out)
+        out -= self.mean
+        out /= self.std
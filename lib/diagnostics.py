@@ -0,0 +1,126 @@
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger("root")
+
+
+# PNG bytes of a normalized [3, H, W] view, the same image visualize_transformed_image shows
+def transformed_image_to_png(view, mean, std):
+    image = view.permute(1, 2, 0).numpy() * np.asarray(std, dtype=np.float32) + np.asarray(mean, dtype=np.float32)
+    image = (np.clip(image, 0, 1) * 255).round().astype(np.uint8)
+    png = BytesIO()
+    Image.fromarray(image).save(png, format="PNG")
+    return png.getvalue()
+
+
+class DiagnosticSink:
+    """
+    Keeps a sample of the preprocessed uploads for debugging.
+
+    capture copies the first view of a sampled upload and returns straight away. A background thread encodes it as
+    PNG and keeps it in a ring buffer of the last capacity captures, or in mode "file" writes it to directory and
+    keeps only its path. Captures are dropped while capacity captures are still waiting to be encoded.
+    """
+    def __init__(self, mean, std, sample_rate=1.0, capacity=32, mode="memory", directory=None):
+        if mode not in ("memory", "file"):
+            raise ValueError(f"Unknown diagnostic sink mode: {mode}")
+        self.mean = mean
+        self.std = std
+        self.sample_rate = sample_rate
+        self.capacity = capacity
+        self.mode = mode
+        self.directory = directory
+        if mode == "file":
+            os.makedirs(directory, exist_ok=True)
+
+        self._captures = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._counters = {"sampled": 0, "dropped": 0, "failed": 0}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="swinvox-diagnostics")
+
+    def capture(self, transformed_images):
+        # transformed_images is the [n_views, 3, H, W] output of the preprocessing
+        if len(transformed_images) == 0 or random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._counters["dropped"] += 1
+                return
+            self._pending += 1
+            self._counters["sampled"] += 1
+
+        capture = {
+            "id": uuid.uuid4().hex,
+            "created_at": time.time(),
+            "n_views": len(transformed_images),
+            "shape": list(transformed_images.shape),
+        }
+        self._executor.submit(self._write, capture, transformed_images[0].clone())
+
+    def captures(self):
+        # Metadata of the kept captures, newest first
+        with self._lock:
+            return [
+                {key: value for key, value in capture.items() if key not in ("png", "path")}
+                for capture in reversed(self._captures)
+            ]
+
+    def get_png(self, capture_id):
+        with self._lock:
+            capture = next((capture for capture in self._captures if capture["id"] == capture_id), None)
+        if capture is None:
+            return None
+        if self.mode == "memory":
+            return capture["png"]
+        try:
+            with open(capture["path"], "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._counters, pending=self._pending, kept=len(self._captures))
+
+    def flush(self):
+        # Wait until the captures submitted so far are written
+        self._executor.submit(lambda: None).result()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _write(self, capture, view):
+        try:
+            png = transformed_image_to_png(view, self.mean, self.std)
+            if self.mode == "memory":
+                capture["png"] = png
+            else:
+                capture["path"] = os.path.join(self.directory, f"{int(capture['created_at'])}_{capture['id']}.png")
+                with open(capture["path"], "wb") as file:
+                    file.write(png)
+
+            with self._lock:
+                if self.mode == "file" and len(self._captures) == self.capacity:
+                    # The file of the capture leaving the ring buffer is removed with it
+                    try:
+                        os.remove(self._captures[0]["path"])
+                    except OSError:
+                        pass
+                self._captures.append(capture)
+        except Exception as e:
+            logger.error(f"Error writing diagnostic capture: {str(e)}")
+            with self._lock:
+                self._counters["failed"] += 1
+        finally:
+            with self._lock:
+                self._pending -= 1
@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+import numpy as np
+import torch
+
+logger = logging.getLogger("root")
+
+
+# Identifies the weights a cache entry was computed with. Size and modification time change whenever the checkpoint
+# file is replaced, without reading the whole file.
+def checkpoint_fingerprint(path):
+    try:
+        stat = os.stat(path)
+        identity = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    except OSError:
+        identity = os.path.abspath(path)
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+
+
+class FeatureCache:
+    """
+    Content addressed LRU cache of the per-view encoder output, bounded by a byte budget.
+
+    Keys are digests of a preprocessed view, which is a deterministic function of the uploaded image bytes and the
+    preprocessing config, and of the checkpoint fingerprint given as namespace. Entries evicted from memory stay
+    available in the optional on-disk tier, which keeps one directory per namespace and removes the others.
+    """
+    def __init__(self, max_bytes, namespace="", cache_dir=None, max_disk_bytes=0):
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self.cache_dir = None
+        self._disk_bytes = 0
+        if cache_dir:
+            self.cache_dir = os.path.join(cache_dir, namespace or "default")
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Entries of other checkpoints can never be hit again
+            for name in os.listdir(cache_dir):
+                path = os.path.join(cache_dir, name)
+                if path != self.cache_dir and os.path.isdir(path):
+                    logger.info(f"Removing stale feature cache {path}")
+                    shutil.rmtree(path, ignore_errors=True)
+            self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(self.cache_dir))
+
+    def key(self, view):
+        # Digest of one preprocessed view tensor, [3, H, W]
+        array = view.detach().cpu().contiguous().numpy()
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{self.namespace}:{array.dtype}:{array.shape}".encode("utf-8"))
+        digest.update(array)
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            features = self._entries.get(key)
+            if features is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return features
+
+        features = self._read(key)
+        with self._lock:
+            if features is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+            self._insert(key, features)
+            return features
+
+    def put(self, key, features):
+        features = features.detach().cpu().clone()
+        with self._lock:
+            self._insert(key, features)
+        self._write(key, features)
+
+    def metrics(self):
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            return dict(
+                self._counters,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                disk_bytes=self._disk_bytes,
+                hit_rate=(self._counters["hits"] + self._counters["disk_hits"]) / lookups if lookups else 0.0,
+            )
+
+    def _insert(self, key, features):
+        # Called with the lock held
+        size = features.numel() * features.element_size()
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            replaced = self._entries.pop(key)
+            self._bytes -= replaced.numel() * replaced.element_size()
+        self._entries[key] = features
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.numel() * evicted.element_size()
+            self._counters["evictions"] += 1
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def _read(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            return torch.from_numpy(np.load(self._path(key)))
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key, features):
+        if self.cache_dir is None or os.path.exists(self._path(key)):
+            return
+        # Write to a temporary file first so readers never see a partial entry
+        temp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            np.save(file, features.numpy())
+        os.replace(temp_path, self._path(key))
+        with self._lock:
+            self._disk_bytes += os.path.getsize(self._path(key))
+            over_budget = self.max_disk_bytes and self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        # Remove the least recently written entries until the disk tier is back to 3/4 of its budget
+        entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".npy")]
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= self.max_disk_bytes * 3 // 4:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
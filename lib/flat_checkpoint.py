@@ -0,0 +1,71 @@
+import json
+import struct
+import torch
+
+# File layout: magic, little endian uint64 length of the JSON header, the header, then the raw tensor data. The
+# header maps "<state dict>/<parameter>" to the dtype, shape and offset of the tensor in the data section. The data
+# section and every tensor in it start on a multiple of ALIGNMENT, so the tensors can be viewed in place.
+FLAT_MAGIC = b"SWVXFLAT"
+ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+# Whether path is a flat checkpoint written by save_flat_checkpoint
+def is_flat_checkpoint(path):
+    try:
+        with open(path, "rb") as file:
+            return file.read(len(FLAT_MAGIC)) == FLAT_MAGIC
+    except OSError:
+        return False
+
+
+# Write a checkpoint, a dict of state dicts such as {"encoder_state_dict": {...}, ...}, as a flat tensor file
+def save_flat_checkpoint(checkpoint, path):
+    tensors = []
+    for state_dict_name, state_dict in checkpoint.items():
+        for name, tensor in state_dict.items():
+            tensors.append((f"{state_dict_name}/{name}", tensor.detach().cpu().contiguous()))
+
+    entries = {}
+    offset = 0
+    for key, tensor in tensors:
+        entries[key] = {"dtype": str(tensor.dtype).replace("torch.", ""), "shape": list(tensor.shape), "offset": offset}
+        offset = _align(offset + tensor.numel() * tensor.element_size())
+    header = json.dumps(entries).encode("utf-8")
+    data_start = _align(len(FLAT_MAGIC) + 8 + len(header))
+
+    with open(path, "wb") as file:
+        file.write(FLAT_MAGIC)
+        file.write(struct.pack("<Q", len(header)))
+        file.write(header)
+        for key, tensor in tensors:
+            file.seek(data_start + entries[key]["offset"])
+            file.write(tensor.numpy().tobytes())
+        file.truncate(data_start + offset)
+
+
+# Map a flat checkpoint into memory and return its state dicts. The tensors are views of one private file mapping:
+# their pages are read from the OS page cache on first use and shared by every process mapping the same file, a
+# process that writes to a tensor gets a private copy of the page and never changes the file.
+def load_flat_checkpoint(path):
+    with open(path, "rb") as file:
+        if file.read(len(FLAT_MAGIC)) != FLAT_MAGIC:
+            raise ValueError(f"{path} is not a flat checkpoint")
+        header_length, = struct.unpack("<Q", file.read(8))
+        entries = json.loads(file.read(header_length).decode("utf-8"))
+        file.seek(0, 2)
+        size = file.tell()
+    data_start = _align(len(FLAT_MAGIC) + 8 + header_length)
+
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=size)
+    checkpoint = {}
+    for key, entry in entries.items():
+        state_dict_name, name = key.split("/", 1)
+        dtype = getattr(torch, entry["dtype"])
+        element_size = torch.empty(0, dtype=dtype).element_size()
+        tensor = torch.empty(0, dtype=dtype).set_(storage, (data_start + entry["offset"]) // element_size, entry["shape"])
+        checkpoint.setdefault(state_dict_name, {})[name] = tensor
+    return checkpoint
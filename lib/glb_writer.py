@@ -0,0 +1,126 @@
+import json
+import struct
+import numpy as np
+
+# GLB container constants (https://registry.khronos.org/glTF/specs/2.0/glTF-2.0.html#binary-gltf-layout)
+GLB_MAGIC = 0x46546C67          # "glTF"
+GLB_VERSION = 2
+CHUNK_TYPE_JSON = 0x4E4F534A    # "JSON"
+CHUNK_TYPE_BIN = 0x004E4942     # "BIN\0"
+GLB_HEADER_SIZE = 12
+CHUNK_HEADER_SIZE = 8
+
+# glTF accessor component types and buffer view targets
+COMPONENT_UNSIGNED_SHORT = 5123
+COMPONENT_UNSIGNED_INT = 5125
+COMPONENT_FLOAT = 5126
+TARGET_ARRAY_BUFFER = 34962
+TARGET_ELEMENT_ARRAY_BUFFER = 34963
+MODE_TRIANGLES = 4
+
+# Largest vertex count that can be indexed with uint16. 65535 is reserved as the primitive restart value.
+MAX_UINT16_VERTICES = 65535
+
+
+def align4(n):
+    return (n + 3) & ~3
+
+
+def write_glb(vertices, faces, normals=None):
+    # Pack a triangle mesh into a GLB container. The JSON chunk describes a single node with a single mesh,
+    # the BIN chunk holds float32 positions, optional float32 normals and the triangle indices. Indices are
+    # stored as uint16 when the vertex count allows it, uint32 otherwise. Returns the GLB file as a bytearray.
+    vertices = np.asarray(vertices)
+    faces = np.asarray(faces)
+    n_vertices = len(vertices)
+    n_indices = faces.size
+
+    gltf = {
+        "asset": {"version": "2.0", "generator": "SwinVox"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"name": "geometry_0"}],
+    }
+
+    # An empty mesh is written as a scene with a single empty node
+    if n_vertices == 0 or n_indices == 0:
+        return pack_glb(gltf, 0)[0]
+
+    index_dtype, index_component = (
+        (np.uint16, COMPONENT_UNSIGNED_SHORT) if n_vertices < MAX_UINT16_VERTICES else (np.uint32, COMPONENT_UNSIGNED_INT)
+    )
+
+    # Lay out the buffer views one after the other, each starting on a 4 byte boundary
+    layout = [("POSITION", np.float32, vertices.shape, TARGET_ARRAY_BUFFER)]
+    if normals is not None:
+        layout.append(("NORMAL", np.float32, vertices.shape, TARGET_ARRAY_BUFFER))
+    layout.append(("indices", index_dtype, (n_indices,), TARGET_ELEMENT_ARRAY_BUFFER))
+
+    buffer_views, accessors, offsets = [], [], []
+    bin_length = 0
+    for name, dtype, shape, target in layout:
+        byte_length = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        offsets.append(bin_length)
+        buffer_views.append({"buffer": 0, "byteOffset": bin_length, "byteLength": byte_length, "target": target})
+        bin_length = align4(bin_length + byte_length)
+
+    position_min = vertices.min(axis=0).astype(np.float32)
+    position_max = vertices.max(axis=0).astype(np.float32)
+    accessors.append({
+        "bufferView": 0, "componentType": COMPONENT_FLOAT, "count": n_vertices, "type": "VEC3",
+        "min": position_min.tolist(), "max": position_max.tolist(),
+    })
+    attributes = {"POSITION": 0}
+    if normals is not None:
+        accessors.append({"bufferView": 1, "componentType": COMPONENT_FLOAT, "count": n_vertices, "type": "VEC3"})
+        attributes["NORMAL"] = 1
+    accessors.append({
+        "bufferView": len(buffer_views) - 1, "componentType": index_component, "count": n_indices, "type": "SCALAR",
+    })
+
+    gltf["nodes"][0]["mesh"] = 0
+    gltf["meshes"] = [{
+        "name": "geometry_0",
+        "primitives": [{"attributes": attributes, "indices": len(accessors) - 1, "mode": MODE_TRIANGLES}],
+    }]
+    gltf["accessors"] = accessors
+    gltf["bufferViews"] = buffer_views
+    gltf["buffers"] = [{"byteLength": bin_length}]
+
+    glb, bin_offset = pack_glb(gltf, bin_length)
+
+    # Convert the arrays straight into their place in the output buffer
+    arrays = [vertices] + ([normals] if normals is not None else []) + [faces]
+    for (_, dtype, shape, _), offset, array in zip(layout, offsets, arrays):
+        view = np.frombuffer(glb, dtype=dtype, count=int(np.prod(shape)), offset=bin_offset + offset)
+        view.reshape(shape)[...] = np.reshape(array, shape)
+
+    # Returned without copying it into bytes, which would duplicate the whole file
+    return glb
+
+
+def pack_glb(gltf, bin_length):
+    # Allocate the whole GLB file at once and fill in the header and the JSON chunk. Returns the buffer and the
+    # offset of the BIN chunk data, which is left zeroed for the caller to fill.
+    json_data = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+    json_length = align4(len(json_data))
+
+    total_length = GLB_HEADER_SIZE + CHUNK_HEADER_SIZE + json_length
+    if bin_length > 0:
+        total_length += CHUNK_HEADER_SIZE + bin_length
+
+    glb = bytearray(total_length)
+    struct.pack_into("<III", glb, 0, GLB_MAGIC, GLB_VERSION, total_length)
+
+    # The JSON chunk is padded with spaces
+    struct.pack_into("<II", glb, GLB_HEADER_SIZE, json_length, CHUNK_TYPE_JSON)
+    json_offset = GLB_HEADER_SIZE + CHUNK_HEADER_SIZE
+    glb[json_offset:json_offset + json_length] = json_data.ljust(json_length, b" ")
+
+    # The BIN chunk is padded with zeros, which bytearray already provides
+    bin_offset = json_offset + json_length
+    if bin_length > 0:
+        struct.pack_into("<II", glb, bin_offset, bin_length, CHUNK_TYPE_BIN)
+        bin_offset += CHUNK_HEADER_SIZE
+
+    return glb, bin_offset
@@ -0,0 +1,72 @@
+import logging
+import warnings
+import torch
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+logger = logging.getLogger("root")
+
+OPTIMIZATION_MODES = ("none", "fold", "freeze")
+
+CONVOLUTIONS = (torch.nn.Conv2d, torch.nn.Conv3d)
+TRANSPOSED_CONVOLUTIONS = (torch.nn.ConvTranspose2d, torch.nn.ConvTranspose3d)
+BATCH_NORMS = (torch.nn.BatchNorm2d, torch.nn.BatchNorm3d)
+
+
+# Fold every BatchNorm that follows a convolution in a Sequential into the weights and bias of the convolution, and
+# replace it with an Identity. Only valid in eval mode, where the BatchNorm applies its running statistics.
+def fold_batch_norms(module):
+    folded = 0
+    for sequential in [child for child in module.modules() if isinstance(child, torch.nn.Sequential)]:
+        layers = list(sequential.children())
+        for index in range(len(layers) - 1):
+            convolution, batch_norm = layers[index], layers[index + 1]
+            if not isinstance(batch_norm, BATCH_NORMS):
+                continue
+            if isinstance(convolution, CONVOLUTIONS + TRANSPOSED_CONVOLUTIONS):
+                transpose = isinstance(convolution, TRANSPOSED_CONVOLUTIONS)
+                sequential[index] = fuse_conv_bn_eval(convolution, batch_norm, transpose=transpose)
+                sequential[index + 1] = torch.nn.Identity()
+                folded += 1
+    return folded
+
+
+def _freeze(traced, preserved_methods=()):
+    # Frozen graphs inline the weights as constants, which lets the optimization pass fuse the convolutions with
+    # their activations and pick the CPU kernels
+    return torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval(), preserved_methods), preserved_methods)
+
+
+# Trace the encoder, decoder, merger and refiner of an eval model into frozen TorchScript graphs. The view chunking
+# and the feature cache of SwinVoxModel stay in Python around them. The graphs accept any batch size and view count.
+def freeze_model(model, cfg):
+    images = torch.zeros(1, 2, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W)
+    with torch.no_grad(), warnings.catch_warnings():
+        # TorchScript is deprecated in favour of torch.export and torch.compile, which need a compiler toolchain
+        warnings.simplefilter("ignore")
+        features = model.encoder(images)
+        raw_features, coarse_volumes = model.decoder(features)
+        merged_volume = model.merger(raw_features, coarse_volumes)
+
+        model.encoder = _freeze(torch.jit.trace(model.encoder, images))
+        model.decoder = _freeze(torch.jit.trace(model.decoder, features))
+        model.merger = _freeze(
+            torch.jit.trace_module(model.merger, {"forward": (raw_features, coarse_volumes), "score": raw_features}),
+            ["score"],
+        )
+        model.refiner = _freeze(torch.jit.trace(model.refiner, merged_volume))
+    return model
+
+
+# Apply cfg.INFERENCE.OPTIMIZE to a loaded eval model: fold the BatchNorms, and for freeze also trace and freeze it
+def optimize_model(model, cfg):
+    mode = cfg.INFERENCE.OPTIMIZE
+    if mode not in OPTIMIZATION_MODES:
+        raise ValueError(f"Unknown optimization mode: {mode}")
+    if mode == "none":
+        return model
+
+    folded = fold_batch_norms(model)
+    if mode == "freeze":
+        freeze_model(model, cfg)
+    logger.info(f"Optimized the model: {folded} BatchNorms folded, {mode} mode")
+    return model
@@ -3,11 +3,12 @@
 # Developed by Sandeepa Samaranayake <sandeepasamaranayake@outlook.com>
 
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 import torch
 
 def get_volume_views(volume, save_dir):
+    # matplotlib is only imported when a plot is made, so the server starts without it
+    import matplotlib.pyplot as plt
 
     if not os.path.exists(save_dir):
         os.makedirs(save_dir)
@@ -61,8 +62,20 @@ def save_checkpoint_for_cpu(load_path = 'pre_trained_weights/Pix2Vox-A-ShapeNet.
     print('Saved checkpoint for CPU')
 
 
+# Convert the CPU checkpoint to the flat tensor format of lib.flat_checkpoint. Point cfg.INFERENCE.CHECKPOINT_PATH at
+# the new file and every worker maps the weights read-only instead of loading a private copy.
+def save_checkpoint_flat(load_path = 'pre_trained_weights/Pix2Vox-A-ShapeNet_cpu.pth', save_path = 'pre_trained_weights/Pix2Vox-A-ShapeNet_cpu.flat'):
+    from lib.flat_checkpoint import save_flat_checkpoint
+
+    ckpt = torch.load(load_path, map_location=torch.device("cpu"), weights_only = False)
+    save_flat_checkpoint({k: ckpt[k] for k in ['encoder_state_dict', 'decoder_state_dict', 'refiner_state_dict', 'merger_state_dict']}, save_path)
+    print('Saved flat checkpoint')
+
+
 
 def visualize_transformed_image(tensor, cfg):
+    import matplotlib.pyplot as plt
+
     # Convert tensor to NumPy array
     image = tensor.squeeze(0).permute(1, 2, 0).numpy()  # Convert to HWC format
     image = (image * cfg.DATASET.STD) + cfg.DATASET.MEAN  # Reverse normalization
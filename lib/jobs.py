@@ -0,0 +1,151 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger("root")
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class MemoryJobStore:
+    """ Keeps job state in a dictionary. Jobs are lost when the process exits. """
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id):
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                "id": job_id, "status": QUEUED, "result": None, "error": None, "created_at": now, "updated_at": now
+            }
+
+    def update(self, job_id, status, result=None, error=None):
+        with self._lock:
+            self._jobs[job_id].update(status=status, result=result, error=error, updated_at=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def purge(self, older_than):
+        # Remove jobs created before the older_than timestamp
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job["created_at"] < older_than]:
+                del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """ Keeps job state in a SQLite database file, so finished results survive a restart. """
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, result BLOB, error TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            # Jobs that were queued or running when the previous process exited will never finish
+            connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status IN (?, ?)",
+                (FAILED, "Interrupted by a server restart", time.time(), QUEUED, RUNNING),
+            )
+
+    @contextmanager
+    def _connect(self):
+        # One connection per operation, committed on success and always closed
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def create(self, job_id):
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, status, created_at, updated_at) VALUES (?, ?, ?, ?)", (job_id, QUEUED, now, now)
+            )
+
+    def update(self, job_id, status, result=None, error=None):
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id),
+            )
+
+    def get(self, job_id):
+        with self._connect() as connection:
+            connection.row_factory = sqlite3.Row
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job["result"] is not None:
+            job["result"] = bytes(job["result"])
+        return job
+
+    def purge(self, older_than):
+        # Remove jobs created before the older_than timestamp
+        with self._connect() as connection:
+            connection.execute("DELETE FROM jobs WHERE created_at < ?", (older_than,))
+
+
+# Job stores selectable through cfg.JOBS.STORE
+JOB_STORES = {
+    "memory": lambda cfg: MemoryJobStore(),
+    "sqlite": lambda cfg: SQLiteJobStore(cfg.JOBS.SQLITE_PATH),
+}
+
+
+class JobQueue:
+    """
+    Runs functions on a worker pool and records their state and result in a job store.
+
+    submit returns a job id straight away, the caller polls the store through get for the status and,
+    once the job is done, its result.
+    """
+    def __init__(self, store, max_workers=2, result_ttl=3600):
+        self.store = store
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="swinvox-job")
+
+    def submit(self, fn, *args, **kwargs):
+        # Drop expired jobs so the store does not grow without bounds
+        self.store.purge(time.time() - self.result_ttl)
+
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id)
+        self._executor.submit(self._run, job_id, fn, *args, **kwargs)
+        return job_id
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job_id, fn, *args, **kwargs):
+        self.store.update(job_id, RUNNING)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self.store.update(job_id, FAILED, error=str(e))
+        else:
+            self.store.update(job_id, DONE, result=result)
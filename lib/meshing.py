@@ -0,0 +1,352 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from lib.glb_writer import write_glb
+from lib.tracing import tracer
+
+logger = logging.getLogger("root")
+
+# Meshing and GLB export only need NumPy and trimesh, so this module can be imported by worker processes
+# without loading torch or the model. trimesh takes about a second to import and is only imported by the
+# functions that build meshes.
+
+
+# Face directions of a voxel as (axis, sign) pairs: +x, -x, +y, -y, +z, -z.
+FACE_DIRECTIONS = [(axis, sign) for axis in range(3) for sign in (1, -1)]
+
+
+def exposed_face_masks(occupancy):
+    # Yield (axis, sign, mask) for every face direction, where mask marks filled voxels whose neighbour
+    # in that direction is empty. The grid is padded with one empty layer so that neighbour lookups at
+    # the border of the grid see empty space.
+    padded = np.pad(occupancy, 1)
+    for axis, sign in FACE_DIRECTIONS:
+        # Shift the occupancy grid by one voxel along the face normal to find the neighbour of every voxel
+        neighbour = [slice(1, -1)] * 3
+        neighbour[axis] = slice(1 + sign, padded.shape[axis] - 1 + sign)
+        yield axis, sign, occupancy & ~padded[tuple(neighbour)]
+
+
+def quad_corners(axis, sign, origins, u_sizes, v_sizes):
+    # Build the 4 lattice corners of each quad lying on the given face of the voxels at origins. Quads span
+    # u_sizes x v_sizes voxels along the two other axes and are wound counter-clockwise seen from outside.
+    u, v = (axis + 1) % 3, (axis + 2) % 3
+    corners = np.repeat(origins[:, None, :], 4, axis=1)
+    corners[:, :, axis] += 1 if sign > 0 else 0
+    corners[:, [1, 2], u] += u_sizes[:, None]
+    corners[:, [2, 3], v] += v_sizes[:, None]
+    return corners if sign > 0 else corners[:, ::-1]
+
+
+def quads_to_mesh(quads, grid_shape, voxel_size):
+    # Turn an array of [n_quads, 4, 3] lattice corners into a triangle mesh. Cube corners live on an
+    # integer lattice one larger than the grid in every direction, so shared corners are merged by index.
+    import trimesh
+
+    lattice_shape = tuple(np.array(grid_shape) + 1)
+    lattice_ids = np.ravel_multi_index(quads.reshape(-1, 3).T, lattice_shape)
+    lattice_ids, quads = np.unique(lattice_ids, return_inverse=True)
+    quads = quads.reshape(-1, 4)
+
+    # Voxel centres sit on integer coordinates, so the corners are offset by half a voxel
+    vertices = (np.column_stack(np.unravel_index(lattice_ids, lattice_shape)) - 0.5) * voxel_size
+    faces = quads[:, [0, 1, 2, 0, 2, 3]].reshape(-1, 3)
+
+    return trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+
+
+def box_per_voxel_mesh(voxel_grid, voxel_size=1.0):
+    # The mesher voxel_to_mesh replaced: one trimesh box per filled voxel, hidden faces included. Kept as the
+    # reference that the tests compare voxel_to_mesh to and that benchmarks/bench_meshing.py times it against.
+    import trimesh
+
+    cubes = []
+    for x, y, z in np.array(np.nonzero(voxel_grid)).T:
+        cube = trimesh.primitives.Box(extents=[voxel_size, voxel_size, voxel_size])
+        cube.apply_translation([x * voxel_size, y * voxel_size, z * voxel_size])
+        cubes.append(cube)
+    return trimesh.util.concatenate(cubes)
+
+
+def voxel_to_mesh(voxel_grid, voxel_size=1.0):
+    # Each filled voxel is a unit cube centred on its (x, y, z) index. Only faces that border an empty
+    # voxel (or the edge of the grid) are visible, so hidden faces between neighbours are never built.
+    import trimesh
+
+    occupancy = np.asarray(voxel_grid) != 0
+    if not occupancy.any():
+        return trimesh.Trimesh()
+
+    quads = []
+    for axis, sign, exposed in exposed_face_masks(occupancy):
+        origins = np.argwhere(exposed)
+        ones = np.ones(len(origins), dtype=origins.dtype)
+        quads.append(quad_corners(axis, sign, origins, ones, ones))
+
+    return quads_to_mesh(np.concatenate(quads), occupancy.shape, voxel_size)
+
+
+def voxel_to_greedy_mesh(voxel_grid, voxel_size=1.0):
+    # Same surface as voxel_to_mesh, but coplanar neighbouring faces are merged into rectangles so that
+    # a flat wall of voxels becomes a handful of quads instead of two triangles per voxel.
+    import trimesh
+
+    occupancy = np.asarray(voxel_grid) != 0
+    if not occupancy.any():
+        return trimesh.Trimesh()
+
+    quads = []
+    for axis, sign, exposed in exposed_face_masks(occupancy):
+        u, v = (axis + 1) % 3, (axis + 2) % 3
+
+        # Reorder the mask to [plane, u, v] and find the runs of exposed faces along v in every row
+        exposed = np.transpose(exposed, (axis, u, v))
+        edges = np.diff(np.pad(exposed, ((0, 0), (0, 0), (1, 1))).astype(np.int8), axis=2)
+        starts = np.argwhere(edges == 1)
+        run_ends = np.argwhere(edges == -1)[:, 2]
+        if len(starts) == 0:
+            continue
+
+        # Stack identical runs (same plane, start and end) of consecutive rows into one rectangle
+        plane, row, run_starts = starts.T
+        order = np.lexsort((row, run_ends, run_starts, plane))
+        plane, row, run_starts, run_ends = plane[order], row[order], run_starts[order], run_ends[order]
+        is_new = np.ones(len(order), dtype=bool)
+        is_new[1:] = (
+            (plane[1:] != plane[:-1])
+            | (run_starts[1:] != run_starts[:-1])
+            | (run_ends[1:] != run_ends[:-1])
+            | (row[1:] != row[:-1] + 1)
+        )
+        first = np.flatnonzero(is_new)
+        last = np.append(first[1:], len(order)) - 1
+
+        origins = np.empty((len(first), 3), dtype=np.int64)
+        origins[:, axis] = plane[first]
+        origins[:, u] = row[first]
+        origins[:, v] = run_starts[first]
+        u_sizes = row[last] - row[first] + 1
+        v_sizes = run_ends[first] - run_starts[first]
+        quads.append(quad_corners(axis, sign, origins, u_sizes, v_sizes))
+
+    return quads_to_mesh(np.concatenate(quads), occupancy.shape, voxel_size)
+
+
+def volume_to_smooth_mesh(volume, voxel_size=1.0, iso_level=0.5, smoothing_iterations=0, step_size=1):
+    # Extract the iso-surface of the occupancy probability volume with marching cubes. Vertices are
+    # interpolated between voxel centres, so the surface follows the probabilities instead of the voxel
+    # boundaries. step_size > 1 samples the volume more coarsely for fewer triangles.
+    import trimesh
+    from skimage import measure
+
+    volume = np.asarray(volume, dtype=np.float32)
+    if volume.size == 0 or volume.max() <= iso_level:
+        return trimesh.Trimesh()
+
+    # Pad with one empty layer so that surfaces touching the border of the grid are closed
+    vertices, faces, _, _ = measure.marching_cubes(
+        np.pad(volume, 1), level=iso_level, step_size=step_size, gradient_direction="ascent"
+    )
+
+    # Undo the padding offset so voxel centres sit on integer coordinates, as in voxel_to_mesh
+    mesh = trimesh.Trimesh(vertices=(vertices - 1) * voxel_size, faces=faces, process=False)
+
+    # Taubin smoothing removes the staircase pattern of the voxel grid without shrinking the mesh
+    if smoothing_iterations > 0:
+        trimesh.smoothing.filter_taubin(mesh, iterations=smoothing_iterations)
+
+    return mesh
+
+
+# Volume to mesh conversions selectable through generate_3d_model's mesh_mode. The cubes and greedy
+# modes mesh the thresholded voxel grid, the smooth mode meshes the probability volume directly.
+MESH_MODES = {
+    "cubes": voxel_to_mesh,
+    "greedy": voxel_to_greedy_mesh,
+    "smooth": volume_to_smooth_mesh,
+}
+
+
+def volume_to_glb(volume, mesh_mode="cubes", iso_level=0.5, smoothing_iterations=0, step_size=1):
+    # Convert one [32, 32, 32] occupancy probability volume into GLB bytes
+    if mesh_mode == "smooth":
+        # Marching cubes works on the probabilities directly, no thresholding needed
+        with tracer.stage("mesh"):
+            mesh = volume_to_smooth_mesh(
+                volume, voxel_size=1.0, iso_level=iso_level, smoothing_iterations=smoothing_iterations,
+                step_size=step_size,
+            )
+    else:
+        # Convert probabilities to binary values
+        # Apply threshold of 0.5 to get binary values
+        voxel_array = (volume > 0.5).astype(np.float32)
+
+        # np.save(f"output/voxel_array{timestamp}.npy", voxel_array)
+
+        #logger.info(f"voxel_array : {voxel_array}")
+
+        # Convert voxel grid to a mesh
+        with tracer.stage("mesh"):
+            mesh = MESH_MODES[mesh_mode](voxel_array, voxel_size=1.0)
+
+    # Export the mesh to a GLB file (in memory)
+    # The interpolated surface of the smooth mode is shaded with vertex normals, the frontend does not compute them.
+    # The flat faces of the cubes and greedy modes share vertices between faces and are shaded per face.
+    with tracer.stage("glb"):
+        normals = mesh.vertex_normals if mesh_mode == "smooth" and len(mesh.faces) else None
+        glb_data = write_glb(mesh.vertices, mesh.faces, normals=normals)
+        
+    # Convert GLB data to a byte stream for sending to the frontend
+    return glb_data
+
+
+# Compact representation of a volume for sending it to a worker process. The cubes and greedy modes only need
+# the occupancy, which is bit-packed (4 KB for 32^3 voxels). The smooth mode needs the probabilities, which are
+# sent as float16.
+def pack_volume(volume, mesh_mode="cubes"):
+    volume = np.asarray(volume)
+    if mesh_mode == "smooth":
+        return volume.shape, volume.astype(np.float16).tobytes()
+    return volume.shape, np.packbits(volume > 0.5).tobytes()
+
+
+def unpack_volume(packed, mesh_mode="cubes"):
+    shape, data = packed
+    if mesh_mode == "smooth":
+        return np.frombuffer(data, dtype=np.float16).reshape(shape).astype(np.float32)
+    n_voxels = int(np.prod(shape))
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=n_voxels).reshape(shape).astype(np.float32)
+
+
+def import_mesh_dependencies():
+    # Imports trimesh ahead of the first request, in a meshing worker process
+    import trimesh
+
+
+def mesh_packed_volume(packed, mesh_mode="cubes", **mesh_options):
+    return volume_to_glb(unpack_volume(packed, mesh_mode), mesh_mode, **mesh_options)
+
+
+# Mesh a volume in a worker process and return the GLB bytes with the durations of the meshing stages, which the
+# parent process records
+def traced_mesh_packed_volume(packed, mesh_mode="cubes", **mesh_options):
+    # The worker may have been started before tracing was enabled
+    tracer.enabled = True
+    with tracer.trace() as trace:
+        glb_data = mesh_packed_volume(packed, mesh_mode, **mesh_options)
+    return glb_data, trace.stages
+
+
+class MeshingPool:
+    """
+    Runs meshing and GLB export in worker processes, so that the GIL-heavy NumPy and trimesh work of one
+    request does not hold up inference for the next one.
+
+    A worker that dies, killed for memory or crashed in a native extension, breaks the whole executor and fails
+    every pending call. The broken executor is replaced and each of its calls retried once on the new one.
+
+    By then the application runs other threads, and a process forked from it can deadlock on a lock that one of
+    them held during the fork. The replacement workers are started with restart_method, forkserver by default,
+    which forks them from a clean single-threaded server process. Like spawn, forkserver imports the main script
+    again in every new worker, so a script that starts the application on import needs fork here.
+    """
+    def __init__(self, max_workers=2, restart_method=None):
+        # fork starts the workers without re-importing the application. Fall back to spawn where it is missing.
+        start_methods = multiprocessing.get_all_start_methods()
+        start_method = "fork" if "fork" in start_methods else "spawn"
+        if restart_method is None:
+            restart_method = "forkserver" if "forkserver" in start_methods else "spawn"
+        self.max_workers = max_workers
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(start_method))
+        self._restart_context = multiprocessing.get_context(restart_method)
+        if restart_method == "forkserver":
+            # The server imports the meshing functions once, the workers forked from it inherit them
+            self._restart_context.set_forkserver_preload(["lib.meshing"])
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Create the worker processes now, ideally before the application starts other threads
+        for future in [self._executor.submit(int) for _ in range(self.max_workers)]:
+            future.result()
+        # The workers import trimesh in the background while the application keeps starting
+        for _ in range(self.max_workers):
+            self._executor.submit(import_mesh_dependencies)
+        return self
+
+    def submit(self, volume, mesh_mode="cubes", **mesh_options):
+        # Returns a future that resolves to the GLB bytes of the volume
+        packed = pack_volume(volume, mesh_mode)
+        if not tracer.enabled:
+            return self._run(mesh_packed_volume, packed, mesh_mode, **mesh_options)
+
+        # The stages timed in the worker go to the histograms of this process and the trace of the request
+        trace = tracer.current_trace()
+        future = Future()
+
+        def record_stages(traced_future):
+            try:
+                glb_data, stages = traced_future.result()
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            for name, seconds in stages.items():
+                tracer.record(name, seconds, trace)
+            future.set_result(glb_data)
+
+        self._run(traced_mesh_packed_volume, packed, mesh_mode, **mesh_options).add_done_callback(record_stages)
+        return future
+
+    def _run(self, function, *args, retries=1, **kwargs):
+        # Returns a future of function(*args, **kwargs) run in a worker process, retried on a new executor if the
+        # one it ran on broke. The executor raises BrokenProcessPool from submit once it knows it is broken, and
+        # fails the futures of the calls it had already accepted.
+        future = Future()
+        executor = self._executor
+        try:
+            worker_future = executor.submit(function, *args, **kwargs)
+        except BrokenProcessPool as e:
+            worker_future = Future()
+            worker_future.set_exception(e)
+
+        def resolve(worker_future):
+            try:
+                result = worker_future.result()
+            except BrokenProcessPool as e:
+                self._replace_executor(executor)
+                if retries > 0:
+                    self._run(function, *args, retries=retries - 1, **kwargs).add_done_callback(
+                        lambda retry_future: _copy_outcome(retry_future, future)
+                    )
+                else:
+                    future.set_exception(e)
+                return
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            future.set_result(result)
+
+        worker_future.add_done_callback(resolve)
+        return future
+
+    def _replace_executor(self, broken_executor):
+        # Every call that failed on the broken executor gets here, only the first one replaces it
+        with self._lock:
+            if self._executor is not broken_executor:
+                return
+            logger.warning("A meshing worker process died, restarting the meshing workers")
+            broken_executor.shutdown(wait=False)
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._restart_context)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def _copy_outcome(source, target):
+    # Resolve the future target with the result or exception of the done future source
+    try:
+        target.set_result(source.result())
+    except BaseException as e:
+        target.set_exception(e)
@@ -0,0 +1,64 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger("root")
+
+# Loader states
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelLoader:
+    """
+    Runs the model setup function once and reports whether the model is ready.
+
+    With background=True the setup runs on a daemon thread, so the server answers requests that do not need the
+    model, and readiness checks, while the weights are loaded and the model is warmed up.
+    """
+    def __init__(self, setup):
+        self.setup = setup
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._state = {"status": LOADING, "error": None, "started_at": None, "seconds": None}
+
+    def start(self, background=True):
+        with self._lock:
+            self._state["started_at"] = time.time()
+        if background:
+            threading.Thread(target=self._run, name="swinvox-model-loader", daemon=True).start()
+        else:
+            self._run()
+        return self
+
+    @property
+    def ready(self):
+        return self._ready.is_set() and self._state["status"] == READY
+
+    def wait(self, timeout=None):
+        # Block until the setup finished, successfully or not. Returns whether the model is ready.
+        self._ready.wait(timeout)
+        return self.ready
+
+    def status(self):
+        with self._lock:
+            status = dict(self._state)
+        if status["seconds"] is None and status["started_at"] is not None:
+            status["seconds"] = time.time() - status["started_at"]
+        return status
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.setup()
+        except Exception as e:
+            logger.error(f"Error loading the model: {str(e)}")
+            with self._lock:
+                self._state.update(status=FAILED, error=str(e), seconds=time.perf_counter() - start)
+        else:
+            logger.info(f"Model ready in {time.perf_counter() - start:.2f} s")
+            with self._lock:
+                self._state.update(status=READY, seconds=time.perf_counter() - start)
+        finally:
+            self._ready.set()
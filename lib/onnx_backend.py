@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import threading
+import torch
+from lib.helpers import count_parameters
+from lib.tracing import tracer
+
+logger = logging.getLogger("root")
+
+
+class InferencePipeline(torch.nn.Module):
+    """
+    The encoder, decoder, merger and refiner of a SwinVoxModel as one graph for export.
+
+    Runs all the views of an object at once: the view chunking and the feature cache of SwinVoxModel are left out.
+    """
+    def __init__(self, model):
+        super(InferencePipeline, self).__init__()
+        self.encoder = model.encoder
+        self.decoder = model.decoder
+        self.merger = model.merger
+        self.refiner = model.refiner
+
+    def forward(self, rendering_images):
+        raw_features, coarse_volumes = self.decoder(self.encoder(rendering_images))
+        return self.refiner(self.merger(raw_features, coarse_volumes))
+
+
+# Export the float model to ONNX, with dynamic batch and view axes up to max_views views. The parameter counts and
+# dtype of the model are stored in the metadata of the ONNX model, see OnnxRuntimeModel.exported_metadata. The
+# exporter of torch.onnx needs the onnxscript package.
+def export_onnx(model, path, cfg, max_views=64):
+    pipeline = InferencePipeline(model).eval()
+    images = torch.zeros(1, 2, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W)
+    batch_size = torch.export.Dim("batch_size", min=1, max=cfg.INFERENCE.MAX_BATCH_SIZE * 8)
+    n_views = torch.export.Dim("n_views", min=1, max=max_views)
+    with torch.no_grad():
+        program = torch.onnx.export(
+            pipeline, (images,), dynamo=True,
+            input_names=["images"], output_names=["volumes"],
+            dynamic_shapes={"rendering_images": {0: batch_size, 1: n_views}},
+        )
+
+    parameters = {name: count_parameters(module) for name, module in pipeline.named_children()}
+    metadata = {
+        "parameters": dict(parameters, total=sum(parameters.values())),
+        "dtype": str(next(pipeline.parameters()).dtype).replace("torch.", ""),
+    }
+    for key, value in metadata.items():
+        program.model.metadata_props[key] = json.dumps(value)
+    program.save(path, external_data=False)
+    logger.info(f"Exported the model to {path}")
+    return path
+
+
+class OnnxRuntimeModel:
+    """
+    Runs an exported model with ONNX Runtime on the CPU, callable like SwinVoxModel.
+
+    The session is created by the process that first calls the model: ONNX Runtime starts its thread pools with
+    the session, and threads do not survive the fork of a pre-forking server. Without intra_op_threads it gets the
+    intra-op threads that PyTorch has in that process, as set by configure_runtime.
+    """
+    def __init__(self, path, intra_op_threads=None, inter_op_threads=0):
+        # onnxruntime is only needed with this backend
+        import onnxruntime
+
+        self.path = path
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self._onnxruntime = onnxruntime
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def session(self):
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                options = self._onnxruntime.SessionOptions()
+                options.intra_op_num_threads = self.intra_op_threads or torch.get_num_threads()
+                options.inter_op_num_threads = self.inter_op_threads
+                options.graph_optimization_level = self._onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+                self._session = self._onnxruntime.InferenceSession(
+                    self.path, options, providers=["CPUExecutionProvider"]
+                )
+                self._pid = os.getpid()
+            return self._session
+
+    # Metadata export_onnx stored in the model, empty for models exported without it
+    def exported_metadata(self):
+        return {key: json.loads(value) for key, value in self.session().get_modelmeta().custom_metadata_map.items()}
+
+    def __call__(self, rendering_images):
+        # [batch_size, n_views, img_c, img_h, img_w] -> [batch_size, 32, 32, 32]
+        with tracer.stage("onnxruntime"):
+            volumes = self.session().run(["volumes"], {"images": rendering_images.detach().cpu().numpy()})[0]
+        return torch.from_numpy(volumes)
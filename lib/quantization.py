@@ -0,0 +1,107 @@
+import logging
+import warnings
+import torch
+from torch.ao import quantization
+from torch.ao.nn import quantized as nnq
+
+logger = logging.getLogger("root")
+
+QUANTIZATION_MODES = ("none", "dynamic", "static")
+
+# Quantized kernels, in order of preference
+QUANTIZED_ENGINES = ("x86", "fbgemm", "qnnpack")
+
+
+# Select the quantized kernels, cfg.QUANTIZATION.ENGINE or the first one available in this PyTorch build
+def select_engine(cfg):
+    engine = cfg.QUANTIZATION.ENGINE or next(
+        (engine for engine in QUANTIZED_ENGINES if engine in torch.backends.quantized.supported_engines), None
+    )
+    if engine not in torch.backends.quantized.supported_engines:
+        raise RuntimeError(f"Quantized engine {engine} is not available")
+    torch.backends.quantized.engine = engine
+    return engine
+
+
+# int8 weights and dynamically quantized activations for the Linear layers of the refiner (8192 <-> 2048)
+def quantize_linear_layers(model):
+    with warnings.catch_warnings():
+        # The eager mode quantization of torch.ao is deprecated in favour of torchao, which this project does not use
+        warnings.simplefilter("ignore")
+        quantization.quantize_dynamic(model.refiner, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+# Fuse the convolutions of the encoder with their batch norm and ReLU, and put quantize and dequantize steps around
+# the convolution stack. The encoder then takes float images and returns float features.
+def _prepare_encoder(encoder, engine):
+    vgg = list(encoder.vgg.children())
+    fused = [
+        [str(index), str(index + 1), str(index + 2)]
+        for index in range(len(vgg) - 2)
+        if isinstance(vgg[index], torch.nn.Conv2d) and isinstance(vgg[index + 2], torch.nn.ReLU)
+    ]
+    quantization.fuse_modules(encoder.vgg, fused, inplace=True)
+    for layer in (encoder.layer1, encoder.layer2, encoder.layer3):
+        quantization.fuse_modules(layer, [["0", "1"]], inplace=True)
+
+    encoder.vgg = torch.nn.Sequential(quantization.QuantStub(), *encoder.vgg.children())
+    encoder.layer3 = torch.nn.Sequential(*encoder.layer3.children(), quantization.DeQuantStub())
+    encoder.qconfig = quantization.get_default_qconfig(engine)
+    quantization.prepare(encoder, inplace=True)
+    return encoder
+
+
+# Static post-training quantization of the encoder convolutions. The observers record the range of the activations
+# of the calibration images, [batch_size, n_views, 3, H, W] tensors, before the encoder is converted to int8.
+def calibrate_encoder(model, calibration_images, engine):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        _prepare_encoder(model.encoder, engine)
+        with torch.no_grad():
+            for images in calibration_images:
+                model.encoder(images)
+        quantization.convert(model.encoder, inplace=True)
+    return model
+
+
+# Write the calibrated int8 encoder to path. Quantized activations such as ELU keep their output scale in attributes
+# that the state dict does not hold, so these are stored next to it.
+def save_calibration(encoder, engine, path, **info):
+    activation_scales = {
+        name: [module.scale, module.zero_point]
+        for name, module in encoder.named_modules()
+        if isinstance(module, nnq.ELU)
+    }
+    torch.save(
+        dict(info, engine=engine, encoder_state_dict=encoder.state_dict(), activation_scales=activation_scales), path
+    )
+
+
+# Quantize a loaded model as set in cfg.QUANTIZATION. The static mode loads the int8 encoder written by calibrate.py
+# to cfg.QUANTIZATION.CALIBRATION_PATH.
+def quantize_model(model, cfg):
+    mode = cfg.QUANTIZATION.MODE
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode}")
+    if mode == "none":
+        return model
+
+    engine = select_engine(cfg)
+    quantize_linear_layers(model)
+    if mode == "static":
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            calibration = torch.load(cfg.QUANTIZATION.CALIBRATION_PATH, map_location=torch.device("cpu"), weights_only=False)
+            if calibration.get("engine") != engine:
+                raise RuntimeError(f"The encoder was calibrated for the {calibration.get('engine')} engine, not {engine}")
+            # Converting without calibration builds the int8 modules, the calibrated scales and weights replace theirs
+            _prepare_encoder(model.encoder, engine)
+            quantization.convert(model.encoder, inplace=True)
+            model.encoder.load_state_dict(calibration["encoder_state_dict"])
+            modules = dict(model.encoder.named_modules())
+            for name, (scale, zero_point) in calibration["activation_scales"].items():
+                modules[name].scale, modules[name].zero_point = scale, zero_point
+
+    logger.info(f"Quantized the model: {mode} mode, {engine} engine")
+    return model
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger("root")
+
+
+# Digest of an upload and everything that changes its reconstruction. The merger fuses the views with a softmax
+# over the view axis, which does not depend on their order, so the file digests are sorted. The mesh options only
+# apply to the smooth mode, the cubes and greedy modes ignore them.
+def result_key(images, cfg, mesh_mode, mesh_options, namespace=""):
+    digest = hashlib.sha256()
+    for image_digest in sorted(hashlib.sha256(image).digest() for image in images):
+        digest.update(image_digest)
+
+    settings = {
+        "checkpoint": namespace,
+        "img_size": [cfg.CONST.IMG_H, cfg.CONST.IMG_W],
+        "bg_color_range": cfg.TEST.RANDOM_BG_COLOR_RANGE,
+        "mean": cfg.DATASET.MEAN,
+        "std": cfg.DATASET.STD,
+        "draft_decode": cfg.INFERENCE.DRAFT_DECODE,
+        "mesh_mode": mesh_mode,
+        "mesh_options": mesh_options if mesh_mode == "smooth" else None,
+    }
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SQLiteResultStore:
+    """ Keeps results in a SQLite database file, least recently used results are removed over max_bytes. """
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        # One connection per operation, committed on success and always closed
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, key):
+        with self._connect() as connection:
+            row = connection.execute("SELECT data FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return bytes(row[0])
+
+    def put(self, key, data):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results (key, data, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            for old_key, size in connection.execute("SELECT key, size FROM results ORDER BY accessed_at").fetchall():
+                if total <= self.max_bytes:
+                    break
+                connection.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                total -= size
+
+
+class DirectoryResultStore:
+    """ Keeps results as files in a directory, least recently used results are removed over max_bytes. """
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.glb")
+
+    def get(self, key):
+        try:
+            with open(self._file(key), "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+        # The modification time doubles as the last access time for the eviction order
+        try:
+            os.utime(self._file(key))
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        # Write to a temporary file first so readers never see a partial result
+        temp_path = f"{self._file(key)}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, self._file(key))
+
+        entries = [entry for entry in os.scandir(self.path) if entry.name.endswith(".glb")]
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            total -= size
+
+
+# Backing stores selectable through cfg.CACHE.RESULTS_STORE
+RESULT_STORES = {
+    "memory": lambda cfg: None,
+    "sqlite": lambda cfg: SQLiteResultStore(cfg.CACHE.RESULTS_SQLITE_PATH, cfg.CACHE.RESULTS_STORE_MAX_BYTES),
+    "directory": lambda cfg: DirectoryResultStore(cfg.CACHE.RESULTS_DIR, cfg.CACHE.RESULTS_STORE_MAX_BYTES),
+}
+
+
+class ResultCache:
+    """
+    LRU cache of reconstructed GLB models, bounded by a byte budget, in front of an optional backing store.
+
+    Results evicted from memory, or stored by a previous process, are read back from the store.
+    """
+    def __init__(self, max_bytes, store=None):
+        self.max_bytes = max_bytes
+        self.store = store
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "store_hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return data
+
+        data = None
+        if self.store is not None:
+            try:
+                data = self.store.get(key)
+            except Exception as e:
+                logger.error(f"Error reading cached result {key}: {str(e)}")
+        with self._lock:
+            if data is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["store_hits"] += 1
+            self._insert(key, data)
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._insert(key, data)
+        if self.store is not None:
+            try:
+                self.store.put(key, data)
+            except Exception as e:
+                # The result is still served from memory
+                logger.error(f"Error storing cached result {key}: {str(e)}")
+
+    def metrics(self):
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["store_hits"] + self._counters["misses"]
+            return dict(
+                self._counters,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                hit_rate=(self._counters["hits"] + self._counters["store_hits"]) / lookups if lookups else 0.0,
+            )
+
+    def _insert(self, key, data):
+        # Called with the lock held
+        if len(data) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key))
+        self._entries[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._counters["evictions"] += 1
@@ -0,0 +1,85 @@
+import logging
+import os
+import threading
+import torch
+
+logger = logging.getLogger("root")
+
+PINNING_STRATEGIES = ("none", "worker")
+
+
+# Cores this process is allowed to run on
+def available_cores():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+# Apply cfg.RUNTIME to this process: PyTorch intra-op and inter-op threads and the CPU affinity. workers is the number
+# of processes sharing the cores of the host and worker_index the position of this one among them. Returns the
+# settings that were applied.
+def configure_runtime(cfg, workers=1, worker_index=0):
+    if cfg.RUNTIME.PINNING not in PINNING_STRATEGIES:
+        raise ValueError(f"Unknown pinning strategy: {cfg.RUNTIME.PINNING}")
+
+    cores = available_cores()
+    intra_op_threads = cfg.RUNTIME.INTRA_OP_THREADS or max(1, len(cores) // workers)
+
+    # Every worker runs on its own slice of the cores, so their thread pools do not compete for the same cores.
+    # Threads started afterwards inherit the affinity of the thread calling this.
+    if cfg.RUNTIME.PINNING == "worker":
+        first = worker_index * intra_op_threads % len(cores)
+        cores = [cores[(first + i) % len(cores)] for i in range(min(intra_op_threads, len(cores)))]
+        os.sched_setaffinity(0, cores)
+
+    torch.set_num_threads(intra_op_threads)
+    if cfg.RUNTIME.INTER_OP_THREADS:
+        try:
+            torch.set_num_interop_threads(cfg.RUNTIME.INTER_OP_THREADS)
+        except RuntimeError as e:
+            # PyTorch only accepts this before the inter-op pool started
+            logger.warning(f"Inter-op threads left at {torch.get_num_interop_threads()}: {str(e)}")
+
+    settings = {
+        "intra_op_threads": torch.get_num_threads(),
+        "inter_op_threads": torch.get_num_interop_threads(),
+        "pinning": cfg.RUNTIME.PINNING,
+        "cores": cores,
+    }
+    logger.info(f"Runtime settings: {settings}")
+    return settings
+
+
+class WorkerSlots:
+    """
+    Worker indices of a pre-forking server, for configure_runtime. A restarted worker gets the index its predecessor
+    freed, so the live workers always have distinct indices and, with pinning, distinct cores.
+    """
+    def __init__(self):
+        self._slots = {}
+
+    def acquire(self, worker_id):
+        used = set(self._slots.values())
+        index = next(index for index in range(len(used) + 1) if index not in used)
+        self._slots[worker_id] = index
+        return index
+
+    def release(self, worker_id):
+        self._slots.pop(worker_id, None)
+
+
+class InferenceLimiter:
+    """
+    Callable like the model it wraps, runs at most max_concurrent forward passes at the same time.
+
+    Requests beyond the limit wait for a running pass to finish instead of splitting the cores between more passes.
+    """
+    def __init__(self, model, max_concurrent=1):
+        self.model = model
+        self.max_concurrent = max_concurrent
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def __call__(self, images_tensor):
+        with self._semaphore:
+            return self.model(images_tensor)
@@ -0,0 +1,142 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import torch
+from lib.tracing import tracer
+
+logger = logging.getLogger("root")
+
+
+class MicroBatchScheduler:
+    """
+    Queues reconstruction jobs from concurrent requests and runs them through the model together.
+
+    A single worker thread owns the model. It waits for a job, then keeps collecting jobs until it has
+    max_batch_size objects or max_wait_ms have passed, and runs one forward pass per view count. Jobs with
+    different view counts cannot share a forward pass because the merger fuses the views of an object.
+
+    The scheduler is callable like the model it wraps, so it can be passed to generate_3d_model.
+    """
+    def __init__(self, model, max_batch_size=8, max_wait_ms=5):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "jobs_submitted": 0,
+            "jobs_completed": 0,
+            "jobs_failed": 0,
+            "forward_passes": 0,
+            "max_queue_depth": 0,
+            "batch_sizes": {},
+        }
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="swinvox-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        # Jobs already in the queue are processed before the worker exits
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, images_tensor):
+        # images_tensor: [batch_size, n_views, img_c, img_h, img_w]. The future resolves to the model output
+        # for these objects, [batch_size, 32, 32, 32].
+        if self._thread is None:
+            raise RuntimeError("Scheduler is not running.")
+
+        future = Future()
+        # The stages of the batched forward pass are added to the trace of the request
+        future.trace = tracer.current_trace()
+        with self._lock:
+            self._stats["jobs_submitted"] += 1
+        self._queue.put((images_tensor, future))
+
+        with self._lock:
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue.qsize())
+        return future
+
+    def __call__(self, images_tensor):
+        return self.submit(images_tensor).result()
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats, batch_sizes=dict(self._stats["batch_sizes"]))
+
+        n_objects = sum(size * count for size, count in stats["batch_sizes"].items())
+        stats["queue_depth"] = self._queue.qsize()
+        stats["mean_batch_size"] = n_objects / stats["forward_passes"] if stats["forward_passes"] else 0.0
+        return stats
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            job = self._queue.get()
+            if job is None:
+                break
+
+            # Collect more jobs until the batch is full or the oldest job has waited long enough
+            jobs = [job]
+            n_objects = job[0].size(0)
+            deadline = time.monotonic() + self.max_wait
+            while n_objects < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                jobs.append(job)
+                n_objects += job[0].size(0)
+
+            self._run_jobs(jobs)
+
+    def _run_jobs(self, jobs):
+        # Skip jobs whose caller cancelled the future while it was queued
+        jobs = [(images_tensor, future) for images_tensor, future in jobs if future.set_running_or_notify_cancel()]
+
+        # One forward pass per input shape, i.e. per view count
+        groups = {}
+        for images_tensor, future in jobs:
+            groups.setdefault(tuple(images_tensor.shape[1:]), []).append((images_tensor, future))
+
+        for group in groups.values():
+            images_tensors = [images_tensor for images_tensor, _ in group]
+            futures = [future for _, future in group]
+            batch_sizes = [images_tensor.size(0) for images_tensor in images_tensors]
+
+            try:
+                with tracer.trace() as trace:
+                    voxel_output = self.model(torch.cat(images_tensors))
+            except Exception as e:
+                logger.error(f"Batched forward pass failed: {str(e)}")
+                for future in futures:
+                    future.set_exception(e)
+                with self._lock:
+                    self._stats["jobs_failed"] += len(futures)
+                continue
+
+            for future, output in zip(futures, torch.split(voxel_output, batch_sizes)):
+                if trace is not None and future.trace is not None:
+                    future.trace.merge(trace)
+                future.set_result(output)
+
+            batch_size = sum(batch_sizes)
+            with self._lock:
+                self._stats["forward_passes"] += 1
+                self._stats["jobs_completed"] += len(futures)
+                self._stats["batch_sizes"][batch_size] = self._stats["batch_sizes"].get(batch_size, 0) + 1
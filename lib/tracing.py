@@ -0,0 +1,155 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Upper bounds of the latency histogram buckets, in seconds
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Trace of the request handled by the current thread, if any
+_current_trace = contextvars.ContextVar("swinvox_trace", default=None)
+
+# Returned for every stage while tracing is disabled, entering and leaving it does nothing
+_NO_STAGE = nullcontext()
+
+
+class Histogram:
+    """
+    Cumulative latency histogram with fixed buckets, in the layout of a Prometheus histogram.
+    """
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative_counts(self):
+        # Observations at or below each bucket bound, the last one for +Inf
+        counts, total = [], 0
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+class Trace:
+    """
+    Stage durations of one request. A stage that runs several times, for every image or view chunk, is summed.
+    """
+    def __init__(self):
+        self.stages = {}
+        self.start = time.perf_counter()
+        self.token = None
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def merge(self, other):
+        for name, seconds in list(other.stages.items()):
+            self.add(name, seconds)
+
+    def server_timing(self):
+        # Server-Timing header value, durations in milliseconds
+        with self._lock:
+            stages = list(self.stages.items())
+        stages.append(("total", time.perf_counter() - self.start))
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages)
+
+
+class _Stage:
+    __slots__ = ("tracer", "name", "trace", "start")
+
+    def __init__(self, tracer, name, trace):
+        self.tracer = tracer
+        self.name = name
+        self.trace = trace if trace is not None else _current_trace.get()
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.name, time.perf_counter() - self.start, self.trace)
+        return False
+
+
+class Tracer:
+    """
+    Per-stage timers of the reconstruction pipeline, feeding one latency histogram per stage.
+
+    Stages run inside a trace, started per request, also add their duration to it for the Server-Timing header.
+    Threads working for a request get its trace passed explicitly. While disabled, stage returns a shared context
+    manager that does nothing and no trace is started.
+    """
+    def __init__(self, enabled=False, buckets=STAGE_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name, trace=None):
+        if not self.enabled:
+            return _NO_STAGE
+        return _Stage(self, name, trace)
+
+    def record(self, name, seconds, trace=None):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+        if trace is not None:
+            trace.add(name, seconds)
+
+    def current_trace(self):
+        return _current_trace.get() if self.enabled else None
+
+    def start_trace(self):
+        trace = Trace()
+        trace.token = _current_trace.set(trace)
+        return trace
+
+    def end_trace(self, trace):
+        _current_trace.reset(trace.token)
+
+    @contextmanager
+    def trace(self):
+        # Trace of the stages run in this block, None while tracing is disabled
+        if not self.enabled:
+            yield None
+            return
+        trace = self.start_trace()
+        try:
+            yield trace
+        finally:
+            self.end_trace(trace)
+
+    def prometheus(self):
+        # Histograms in the Prometheus text exposition format
+        lines = [
+            "# HELP swinvox_stage_duration_seconds Duration of the stages of the reconstruction pipeline.",
+            "# TYPE swinvox_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            histograms = [
+                (name, histogram.cumulative_counts(), histogram.sum, histogram.count)
+                for name, histogram in sorted(self._histograms.items())
+            ]
+        for name, counts, total, count in histograms:
+            for bound, bucket_count in zip([str(bound) for bound in self.buckets] + ["+Inf"], counts):
+                lines.append(f'swinvox_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {bucket_count}')
+            lines.append(f'swinvox_stage_duration_seconds_sum{{stage="{name}"}} {total}')
+            lines.append(f'swinvox_stage_duration_seconds_count{{stage="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+# Tracer of the application, enabled with cfg.TRACING.ENABLED
+tracer = Tracer()
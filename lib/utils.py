@@ -2,41 +2,62 @@ import torch
 from PIL import Image
 import numpy as np
 from io import BytesIO
-from lib.helpers import visualize_transformed_image
-from model.model_architecture import SwinVoxModel
 import logging
-import trimesh
-from lib.data_transforms import Compose, Normalize, ToTensor, ResizeAndPad
+from concurrent.futures import ThreadPoolExecutor
+from lib.data_transforms import ResizePadNormalize
+from lib.helpers import count_parameters
+from lib.meshing import MESH_MODES, volume_to_glb, voxel_to_mesh, voxel_to_greedy_mesh, volume_to_smooth_mesh
+from lib.feature_cache import checkpoint_fingerprint
+from lib.flat_checkpoint import is_flat_checkpoint, load_flat_checkpoint
+from lib.quantization import quantize_model
+from lib.graph_optimization import optimize_model
+from lib.onnx_backend import OnnxRuntimeModel
+from lib.tracing import tracer
 
 logger = logging.getLogger("root")
 
 # Load the SwinVox model
 def load_model(cfg):
+    # The model imports torchvision, which is slow to import, so it is only imported when the model is loaded
+    from model.model_architecture import SwinVoxModel
+
     logger.info("Loading model...")
-    model = SwinVoxModel(cfg)
+    # A flat checkpoint written by helpers.save_checkpoint_flat is mapped into memory instead of read. The model is
+    # then built without weights and its parameters are assigned the mapped tensors rather than copies of them, so
+    # the workers of a deployment share one copy of the weights in the page cache.
+    checkpoint_path = cfg.INFERENCE.CHECKPOINT_PATH
+    flat = is_flat_checkpoint(checkpoint_path)
+    if flat:
+        with torch.device("meta"):
+            model = SwinVoxModel(cfg)
+    else:
+        model = SwinVoxModel(cfg)
 
     try:
         # Load the checkpoint. If Dataparallel used for training the weight, use helpers.save_checkpoint_for_cpu to save a .pth weight for CPU. 
-        checkpoint = torch.load("pre_trained_weights/Pix2Vox-A-ShapeNet_cpu.pth", map_location=torch.device("cpu"), weights_only = False)
+        if flat:
+            checkpoint = load_flat_checkpoint(checkpoint_path)
+        else:
+            checkpoint = torch.load(checkpoint_path, map_location=torch.device("cpu"), weights_only = False)
 
         # Load state dictionaries for each component
         if "encoder_state_dict" in checkpoint:
-            model.encoder.load_state_dict(checkpoint["encoder_state_dict"])
+            model.encoder.load_state_dict(checkpoint["encoder_state_dict"], assign=flat)
         else:
             raise RuntimeError("Checkpoint does not contain 'encoder_state_dict'.")
 
         if "decoder_state_dict" in checkpoint:
-            model.decoder.load_state_dict(checkpoint["decoder_state_dict"])
+            model.decoder.load_state_dict(checkpoint["decoder_state_dict"], assign=flat)
         else:
             raise RuntimeError("Checkpoint does not contain 'decoder_state_dict'.")
         
         if "refiner_state_dict" in checkpoint:
-            model.refiner.load_state_dict(checkpoint["refiner_state_dict"])
+            model.refiner.load_state_dict(checkpoint["refiner_state_dict"], assign=flat)
         else:
             raise RuntimeError("Checkpoint does not contain 'refiner_state_dict'.")
 
         if "merger_state_dict" in checkpoint:
-            model.merger.load_state_dict(checkpoint["merger_state_dict"])
+            model.merger.load_state_dict(checkpoint["merger_state_dict"], assign=flat)
         else:
             raise RuntimeError("Checkpoint does not contain 'merger_state_dict'.")
 
@@ -45,17 +66,125 @@ def load_model(cfg):
         model.merger.eval()
         model.refiner.eval()
 
+        # The parameters are counted once for the metadata, before quantization and freezing turn them into packed
+        # weights and graph constants
+        parameters = {name: count_parameters(module) for name, module in model.named_children()}
+        dtype = str(next(model.parameters()).dtype).replace("torch.", "")
+
+        # Optional int8 variant of the model, see cfg.QUANTIZATION
+        quantize_model(model, cfg)
+
+        # Optional BatchNorm folding and graph freezing, see cfg.INFERENCE.OPTIMIZE
+        optimize_model(model, cfg)
+
+        # Cached results of this model are only valid for this checkpoint and quantization
+        model.checkpoint_fingerprint = checkpoint_fingerprint(checkpoint_path)
+        if cfg.QUANTIZATION.MODE != "none":
+            model.checkpoint_fingerprint += f"-{cfg.QUANTIZATION.MODE}"
+            if cfg.QUANTIZATION.MODE == "static":
+                model.checkpoint_fingerprint += f"-{checkpoint_fingerprint(cfg.QUANTIZATION.CALIBRATION_PATH)[:8]}"
+
+        # Computed once here, see /api/model/info
+        model.metadata = {
+            "backend": "torch",
+            "checkpoint": checkpoint_path,
+            "checkpoint_format": "flat" if flat else "torch",
+            "checkpoint_fingerprint": model.checkpoint_fingerprint,
+            "dtype": dtype,
+            "parameters": dict(parameters, total=sum(parameters.values())),
+            "quantization": cfg.QUANTIZATION.MODE,
+            "optimize": cfg.INFERENCE.OPTIMIZE,
+        }
+        logger.info(f"Loaded the model: {model.metadata}")
         return model
 
     except Exception as e:
         raise RuntimeError(f"An error occurred while loading the model: {str(e)}")
 
-# Preprocess uploaded images
-def process_images(images, cfg):
+# Load the model exported to cfg.INFERENCE.ONNX_PATH by export_onnx.py into ONNX Runtime
+def load_onnx_model(cfg):
+    logger.info("Loading ONNX model...")
+    try:
+        model = OnnxRuntimeModel(cfg.INFERENCE.ONNX_PATH, inter_op_threads=cfg.RUNTIME.INTER_OP_THREADS)
+        exported = model.exported_metadata()
+    except ImportError:
+        raise RuntimeError("The onnxruntime backend needs the onnxruntime package: pip install onnxruntime")
+    except Exception as e:
+        raise RuntimeError(f"An error occurred while loading the ONNX model: {str(e)}")
+
+    model.checkpoint_fingerprint = checkpoint_fingerprint(cfg.INFERENCE.ONNX_PATH)
+    # The exported graph is the float model, without quantization or graph optimization
+    model.metadata = {
+        "backend": "onnxruntime",
+        "checkpoint": cfg.INFERENCE.ONNX_PATH,
+        "checkpoint_format": "onnx",
+        "checkpoint_fingerprint": model.checkpoint_fingerprint,
+        "dtype": exported.get("dtype"),
+        "parameters": exported.get("parameters"),
+        "quantization": "none",
+        "optimize": "none",
+    }
+    logger.info(f"Loaded the ONNX model: {model.metadata}")
+    return model
+
+
+# Inference backends selectable with cfg.INFERENCE.BACKEND. A backend is called like SwinVoxModel, images
+# [batch_size, n_views, 3, H, W] in and volumes [batch_size, 32, 32, 32] out. It has the checkpoint_fingerprint the
+# caches are namespaced with and the metadata of /api/model/info, so generate_3d_model and reconstruct_batch run on
+# any of them.
+INFERENCE_BACKENDS = {
+    "torch": load_model,
+    "onnxruntime": load_onnx_model,
+}
+
+
+# Load the model with the inference backend set in cfg.INFERENCE.BACKEND
+def load_inference_backend(cfg):
+    if cfg.INFERENCE.BACKEND not in INFERENCE_BACKENDS:
+        raise ValueError(
+            f"Unknown inference backend '{cfg.INFERENCE.BACKEND}'. Available backends: {', '.join(INFERENCE_BACKENDS)}"
+        )
+    return INFERENCE_BACKENDS[cfg.INFERENCE.BACKEND](cfg)
+
+_inference_transforms = {}
+
+# Fused resize, pad and normalize step of the inference preprocessing, built once per configuration
+def get_inference_transform(cfg):
+    key = (
+        cfg.CONST.IMG_H, cfg.CONST.IMG_W, tuple(cfg.DATASET.MEAN), tuple(cfg.DATASET.STD),
+        tuple(tuple(channel_range) for channel_range in cfg.TEST.RANDOM_BG_COLOR_RANGE or ()),
+    )
+    if key not in _inference_transforms:
+        _inference_transforms[key] = ResizePadNormalize(
+            (cfg.CONST.IMG_H, cfg.CONST.IMG_W), mean=cfg.DATASET.MEAN, std=cfg.DATASET.STD,
+            bg_color_range=cfg.TEST.RANDOM_BG_COLOR_RANGE,
+        )
+    return _inference_transforms[key]
+
+# Decode uploaded image bytes to an H x W x 3 uint8 array. With draft, JPEG files much bigger than target_size
+# (width, height) are decoded at 1/2, 1/4 or 1/8 scale, never below target_size, since they are downscaled right after.
+def decode_image(image, target_size, draft=True):
+    pil_image = Image.open(BytesIO(image))
+    if draft and pil_image.format == "JPEG":
+        pil_image.draft("RGB", target_size)
+    return np.asarray(pil_image.convert("RGB"))
+
+_decode_pool = None
+
+# Thread pool shared by all requests to decode and resize the images of an upload in parallel, PIL and OpenCV
+# release the GIL while they work. None when cfg.INFERENCE.DECODE_WORKERS is 1 or less.
+def get_decode_pool(cfg):
+    global _decode_pool
+    if cfg.INFERENCE.DECODE_WORKERS <= 1:
+        return None
+    if _decode_pool is None:
+        _decode_pool = ThreadPoolExecutor(max_workers=cfg.INFERENCE.DECODE_WORKERS, thread_name_prefix="swinvox-decode")
+    return _decode_pool
+
+# Preprocess uploaded images. A sample of the results goes to the optional lib.diagnostics.DiagnosticSink.
+def process_images(images, cfg, diagnostic_sink=None):
     logger.info("--------------------------- starting process images ---------------------------")
 
-    np_images = []
-
     # Set up data augmentation
     IMG_SIZE = cfg.CONST.IMG_H, cfg.CONST.IMG_W
     CROP_SIZE = cfg.CONST.CROP_IMG_H, cfg.CONST.CROP_IMG_W
@@ -67,40 +196,51 @@ def process_images(images, cfg):
     logger.info(f"MEAN: {cfg.DATASET.MEAN}")
     logger.info(f"STD: {cfg.DATASET.STD}")
 
-    transformation = Compose([
-        ResizeAndPad(IMG_SIZE, bg_color_range=cfg.TEST.RANDOM_BG_COLOR_RANGE),
-        Normalize(mean=cfg.DATASET.MEAN, std=cfg.DATASET.STD),
-        ToTensor(),
-    ])
-    
-    for image in images:
+    transformation = get_inference_transform(cfg)
+
+    # Every image is decoded, resized, padded and normalized straight into its slice of the output tensor
+    transformed_images = torch.empty((len(images), 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W), dtype=torch.float32)
+    out = transformed_images.numpy()
+
+    # The decode pool threads time their stages into the trace of the request
+    trace = tracer.current_trace()
+
+    def process_image(index):
         try:
-            pil_image = Image.open(BytesIO(image)).convert("RGB")
-            np_image = np.array(pil_image)
+            with tracer.stage("decode", trace):
+                np_image = decode_image(images[index], (cfg.CONST.IMG_W, cfg.CONST.IMG_H), cfg.INFERENCE.DRAFT_DECODE)
             logger.info(f"Image shape: {np_image.shape}")
-            np_images.append(np_image) 
         except Exception as e:
-            raise ValueError(f"Error processing image:{str(e)}") 
+            raise ValueError(f"Error processing image:{str(e)}")
+        with tracer.stage("resize", trace):
+            transformation.transform_into(np_image, out[index])
 
-    try:
-        transformed_images = transformation(np_images)  
+    decode_pool = get_decode_pool(cfg)
+    if decode_pool is None or len(images) < 2:
+        for index in range(len(images)):
+            process_image(index)
+    else:
+        list(decode_pool.map(process_image, range(len(images))))
 
+    try:
         logger.info(f"Transformed images shape: {transformed_images.shape}")
         logger.info(f"Tensor dtype: {transformed_images.dtype}")
         logger.info(f"Tensor min value: {transformed_images.min().item()}")
         logger.info(f"Tensor max value: {transformed_images.max().item()}")
-        logger.info(f"length: {len(np_images)}")
-
-        # Visualize the first transformed image
-        visualize_transformed_image(transformed_images[0], cfg)
+        logger.info(f"length: {len(images)}")
 
+        # Keep the first transformed image for the debug endpoint, encoded off the request thread
+        if diagnostic_sink is not None:
+            diagnostic_sink.capture(transformed_images)
 
         return transformed_images.unsqueeze(0)
     except Exception as e:
         raise ValueError(f"Error processing images:{str(e)}")
     
 
-def generate_3d_model(images_tensor, model):
+def generate_3d_model(
+    images_tensor, model, mesh_mode="cubes", iso_level=0.5, smoothing_iterations=0, step_size=1, mesh_pool=None
+):
     # The use of torch.nn.Sigmoid() in the final layer indicates that the output will be in the range of [0, 1]. 
     # This means that each voxel's output can be interpreted as the probability of that voxel being occupied.
 
@@ -112,48 +252,56 @@ def generate_3d_model(images_tensor, model):
     # ground truth volumes. This means that the model learns to output values that represent the likelihood (probability) 
     # of each voxel being occupied.
 
-    # Model generates 3D voxel grid
-    voxel_output = model(images_tensor)  
-
-    #logger.info(f"Voxel Data : {voxel_output}")
-
-    # Convert probabilities to binary values
-    # Apply threshold of 0.5 to get binary values
-    binary_voxel_output = (voxel_output > 0.5).float() 
-
-    #logger.info(f"Binary Voxel Data : {binary_voxel_output}")
-
-    # Convert the binary voxel output to a NumPy array
-    voxel_array = binary_voxel_output[0].cpu().numpy()  # Get the first voxel output and convert to NumPy
+    if mesh_mode not in MESH_MODES:
+        raise ValueError(f"Unknown mesh mode '{mesh_mode}'. Available modes: {', '.join(MESH_MODES)}")
 
-    # np.save(f"output/voxel_array{timestamp}.npy", voxel_array)
-
-    #logger.info(f"voxel_array : {voxel_array}")
-
-    # Convert voxel grid to a mesh
-    mesh = voxel_to_mesh(voxel_array, voxel_size=1.0)
-
-    # Export the mesh to a GLB file (in memory)
-    glb_data = mesh.export(file_type='glb')
-        
-    # Convert GLB data to a byte stream for sending to the frontend
-    return glb_data
-    
-    
-def voxel_to_mesh(voxel_grid, voxel_size=1.0):
-    # Get the indices of the non-empty voxels (True values in the voxel grid)
-    filled_voxels = np.array(np.nonzero(voxel_grid))
-    
-    # Create cubes for all filled voxels by applying their translations
-    cubes = []
-    for voxel in filled_voxels.T:  # Iterate over the voxel indices (x, y, z)
-        x, y, z = voxel
-        cube = trimesh.primitives.Box(extents=[voxel_size, voxel_size, voxel_size])
-        cube.apply_translation([x * voxel_size, y * voxel_size, z * voxel_size])
-        cubes.append(cube)
-    
-    # Combine the meshes into a single mesh using trimesh's concatenate
-    combined_mesh = trimesh.util.concatenate(cubes)
-    return combined_mesh
+    # Model generates 3D voxel grid. With the micro-batching scheduler this includes the wait for the batch.
+    with tracer.stage("inference"):
+        voxel_output = model(images_tensor)
 
+    #logger.info(f"Voxel Data : {voxel_output}")
 
+    # Convert the first voxel output to a NumPy array and mesh it
+    volume = voxel_output[0].cpu().numpy()
+    mesh_options = {"iso_level": iso_level, "smoothing_iterations": smoothing_iterations, "step_size": step_size}
+
+    # With a meshing pool this thread only waits for the worker process, leaving the GIL to inference
+    if mesh_pool is not None:
+        return mesh_pool.submit(volume, mesh_mode, **mesh_options).result()
+    return volume_to_glb(volume, mesh_mode, **mesh_options)
+
+
+# Reconstruct several objects, each given as a list of image bytes, with as few forward passes as possible.
+def reconstruct_batch(
+    image_groups, model, cfg, mesh_mode="cubes", max_batch_size=8, mesh_pool=None, diagnostic_sink=None, **mesh_options
+):
+    if mesh_mode not in MESH_MODES:
+        raise ValueError(f"Unknown mesh mode '{mesh_mode}'. Available modes: {', '.join(MESH_MODES)}")
+
+    images_tensors = [process_images(images, cfg, diagnostic_sink) for images in image_groups]
+
+    # The merger fuses the views of an object with a softmax over the view axis, so padding an object with
+    # extra views would change its reconstruction. Objects are grouped by view count instead.
+    groups = {}
+    for index, images_tensor in enumerate(images_tensors):
+        groups.setdefault(images_tensor.size(1), []).append(index)
+
+    glb_models = [None] * len(images_tensors)
+    for n_views, indices in groups.items():
+        for start in range(0, len(indices), max_batch_size):
+            batch_indices = indices[start:start + max_batch_size]
+            logger.info(f"Reconstructing {len(batch_indices)} objects with {n_views} views in one batch")
+
+            # [batch_size, n_views, 3, H, W] -> [batch_size, 32, 32, 32]
+            with tracer.stage("inference"):
+                voxel_output = model(torch.cat([images_tensors[i] for i in batch_indices]))
+            for index, volume in zip(batch_indices, voxel_output.cpu().numpy()):
+                if mesh_pool is not None:
+                    # Mesh the objects in parallel while the next batch runs through the model
+                    glb_models[index] = mesh_pool.submit(volume, mesh_mode, **mesh_options)
+                else:
+                    glb_models[index] = volume_to_glb(volume, mesh_mode, **mesh_options)
+
+    if mesh_pool is not None:
+        glb_models = [future.result() for future in glb_models]
+    return glb_models
@@ -1,10 +1,22 @@
 import base64
+import os
+import re
+import torch
 from io import BytesIO
-from flask import Flask, jsonify, request, render_template, send_file, Response
-from lib.utils import process_images, generate_3d_model, load_model
+from flask import Flask, jsonify, request, render_template, send_file, Response, g
+from lib.utils import process_images, generate_3d_model, load_inference_backend, reconstruct_batch, MESH_MODES
 from logging.config import dictConfig
 from model.config import cfg
 from lib.models import db, Model3D
+from lib.scheduler import MicroBatchScheduler
+from lib.meshing import MeshingPool
+from lib.jobs import JobQueue, JOB_STORES, DONE, FAILED
+from lib.feature_cache import FeatureCache
+from lib.result_cache import ResultCache, RESULT_STORES, result_key
+from lib.diagnostics import DiagnosticSink
+from lib.model_loader import ModelLoader, LOADING
+from lib.runtime import configure_runtime, InferenceLimiter
+from lib.tracing import tracer
 from flask import jsonify, request
 
 # app.logger.debug("A debug message")
@@ -14,6 +26,9 @@ from flask import jsonify, request
 # app.logger.critical("A critical message")
 
 
+# The log directory is not part of the repository
+os.makedirs("logs", exist_ok=True)
+
 dictConfig(
     {
         "version": 1,
@@ -50,9 +65,126 @@ db.init_app(app)
 with app.app_context():
     db.create_all()
 
-# Load the model once at startup
+# Per-stage timers of the pipeline, see /api/metrics
+tracer.enabled = cfg.TRACING.ENABLED
+
+# Meshing and GLB export run in worker processes, forked before the model loader and other threads start
+mesh_pool = None
+
+def start_mesh_pool():
+    global mesh_pool
+    if cfg.MESH.POOL_WORKERS > 0:
+        # Run as python main.py, this module is the main script, which forkserver would import again in the
+        # workers that replace a dead one, starting the application there
+        restart_method = "fork" if __name__ == "__main__" else None
+        mesh_pool = MeshingPool(max_workers=cfg.MESH.POOL_WORKERS, restart_method=restart_method).start()
+
+# Under the pre-forking server of gunicorn.conf.py the master process imports this module and forks the workers,
+# which set their threads and start their own processes and threads in start_worker
+if not cfg.SERVER.PREFORK:
+    configure_runtime(cfg)
+    start_mesh_pool()
+
+# Identical uploads get the stored GLB model back without running the pipeline
+result_cache = None
+if cfg.CACHE.RESULTS:
+    result_cache = ResultCache(cfg.CACHE.RESULTS_MAX_BYTES, RESULT_STORES[cfg.CACHE.RESULTS_STORE](cfg))
+
+# Set by init_model once the model is loaded
 model = None
-model = load_model(cfg)
+feature_cache = None
+scheduler = None
+inference_model = None
+
+# Load the model once and warm it up. Under the pre-forking server this runs in the master process, and the workers
+# share the weights copy-on-write.
+def init_model():
+    global model, inference_model
+    loaded_model = load_inference_backend(cfg)
+
+    # The first forward pass initializes the kernels and allocator, run it before the first request does
+    if cfg.STARTUP.WARM_UP:
+        loaded_model(torch.zeros(1, 1, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W))
+
+    model = loaded_model
+    inference_model = model
+    if not cfg.SERVER.PREFORK:
+        start_model_services()
+
+# Start the components that depend on the model and run threads, in every worker of the pre-forking server
+def start_model_services():
+    global feature_cache, scheduler, inference_model
+
+    # Views that were uploaded before skip the encoder. ONNX Runtime runs the whole model as one graph, without it.
+    if cfg.CACHE.FEATURES and cfg.INFERENCE.BACKEND == "torch":
+        feature_cache = FeatureCache(
+            cfg.CACHE.FEATURES_MAX_BYTES, namespace=model.checkpoint_fingerprint,
+            cache_dir=cfg.CACHE.FEATURES_DIR or None, max_disk_bytes=cfg.CACHE.FEATURES_DIR_MAX_BYTES
+        )
+        model.feature_cache = feature_cache
+
+    # Concurrent requests share forward passes through the micro-batching scheduler, which runs one pass at a time.
+    # Without it, the number of passes splitting the cores between them is limited.
+    if cfg.INFERENCE.MICRO_BATCHING:
+        scheduler = MicroBatchScheduler(
+            model, max_batch_size=cfg.INFERENCE.MAX_BATCH_SIZE, max_wait_ms=cfg.INFERENCE.MAX_WAIT_MS
+        ).start()
+        inference_model = scheduler
+    elif cfg.RUNTIME.MAX_CONCURRENT_INFERENCE > 0:
+        inference_model = InferenceLimiter(model, cfg.RUNTIME.MAX_CONCURRENT_INFERENCE)
+    else:
+        inference_model = model
+
+# With lazy loading the server starts answering right away and /api/ready reports when the model is warm. The
+# pre-forking master always loads the model before it forks.
+model_loader = ModelLoader(init_model).start(
+    background=cfg.STARTUP.LAZY_MODEL_LOADING and not cfg.SERVER.PREFORK
+)
+
+# Called by gunicorn.conf.py in every worker right after the fork, worker_index is the position of the worker
+def start_worker(worker_index=0):
+    # The workers split the cores instead of each running as many threads as there are cores
+    configure_runtime(cfg, workers=cfg.SERVER.WORKERS, worker_index=worker_index)
+
+    # SQLite connections opened by the master must not be shared with the workers
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    start_mesh_pool()
+    if model_loader.ready:
+        start_model_services()
+
+# Opt-in sample of the preprocessed images, for debugging the preprocessing
+diagnostic_sink = None
+if cfg.DIAGNOSTICS.PREPROCESSING:
+    diagnostic_sink = DiagnosticSink(
+        cfg.DATASET.MEAN, cfg.DATASET.STD, sample_rate=cfg.DIAGNOSTICS.SAMPLE_RATE,
+        capacity=cfg.DIAGNOSTICS.CAPACITY, mode=cfg.DIAGNOSTICS.SINK, directory=cfg.DIAGNOSTICS.DIR
+    )
+
+# Worker pool and state of asynchronous reconstruction jobs
+job_queue = JobQueue(
+    JOB_STORES[cfg.JOBS.STORE](cfg), max_workers=cfg.JOBS.MAX_WORKERS, result_ttl=cfg.JOBS.RESULT_TTL
+)
+
+# Every request gets a trace of the pipeline stages it runs, returned in the Server-Timing header
+@app.before_request
+def start_request_trace():
+    if tracer.enabled:
+        g.trace = tracer.start_trace()
+
+@app.after_request
+def add_server_timing(response):
+    trace = g.get("trace")
+    if trace is not None and cfg.TRACING.SERVER_TIMING and trace.stages:
+        response.headers['Server-Timing'] = trace.server_timing()
+    return response
+
+@app.teardown_request
+def end_request_trace(exception=None):
+    trace = g.pop("trace", None)
+    if trace is not None:
+        tracer.end_trace(trace)
 
 @app.route('/')
 def root():
@@ -62,6 +194,62 @@ def root():
         app.logger.error("Error in app initialization: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
+# Run the reconstruction pipeline for the bytes of the uploaded images and return the GLB data,
+# storing it in the result cache under cache_key
+def reconstruct(images, mesh_mode, mesh_options, cache_key=None):
+    # Process uploaded images
+    processed_images = process_images(images, cfg, diagnostic_sink)
+    app.logger.info("Processed images shape: %s", processed_images.shape)
+
+    # Generate 3D model
+    glb_data = generate_3d_model(processed_images, inference_model, mesh_mode, mesh_pool=mesh_pool, **mesh_options)
+    if cache_key is not None:
+        result_cache.put(cache_key, glb_data)
+    return glb_data
+
+# Error response for requests that need the model while it is loading or after it failed to load,
+# None once it is ready
+def model_unavailable():
+    if model_loader.ready:
+        return None
+    status = model_loader.status()
+    if status["status"] == LOADING:
+        response = jsonify({"error": "The model is loading, try again shortly"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    return jsonify({"error": f"The model failed to load: {status['error']}"}), 500
+
+# Coarsest marching cubes sampling a client can ask for, beyond it the 32^3 volume loses its shape
+MAX_STEP_SIZE = 4
+
+# Most Taubin smoothing passes a client can ask for, every pass keeps a meshing worker busy for the whole mesh
+MAX_SMOOTHING_ITERATIONS = 50
+
+# Read the mesh generation mode (cubes, greedy, smooth) and the options of the smooth mode from a request form,
+# falling back to cfg.MESH. Raises ValueError for invalid values.
+def get_mesh_options(form):
+    mesh_mode = form.get("mesh_mode", cfg.MESH.MODE)
+    if mesh_mode not in MESH_MODES:
+        raise ValueError(f"Unknown mesh mode: {mesh_mode}")
+    try:
+        iso_level = float(form.get("iso_level", cfg.MESH.ISO_LEVEL))
+        smoothing_iterations = int(form.get("smoothing_iterations", cfg.MESH.SMOOTHING_ITERATIONS))
+        step_size = int(form.get("step_size", cfg.MESH.STEP_SIZE))
+    except ValueError:
+        raise ValueError("iso_level must be a number, smoothing_iterations and step_size integers")
+    if not 0 < iso_level < 1:
+        raise ValueError("iso_level must be between 0 and 1")
+    if not 0 <= smoothing_iterations <= MAX_SMOOTHING_ITERATIONS:
+        raise ValueError(f"smoothing_iterations must be between 0 and {MAX_SMOOTHING_ITERATIONS}")
+    if not 1 <= step_size <= MAX_STEP_SIZE:
+        raise ValueError(f"step_size must be between 1 and {MAX_STEP_SIZE}")
+
+    return mesh_mode, {
+        "iso_level": iso_level,
+        "smoothing_iterations": smoothing_iterations,
+        "step_size": step_size,
+    }
+
 @app.route('/upload', methods=['POST'])
 def upload_images():
     try:
@@ -72,26 +260,179 @@ def upload_images():
         if not files:
             return jsonify({"error": "No images uploaded"}), 400
 
-        # Process uploaded images
+        unavailable = model_unavailable()
+        if unavailable is not None:
+            return unavailable
+
+        # Mesh generation mode and options
+        try:
+            mesh_mode, mesh_options = get_mesh_options(request.form)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         images = [file.read() for file in files]
-        processed_images = process_images(images, cfg)
-        app.logger.info("Processed images shape: %s", processed_images.shape)
 
-        # Generate 3D model
-        model_output = generate_3d_model(processed_images, model)
+        # Result of an earlier upload of the same images, in any order, with the same settings
+        cache_key, cached_output = None, None
+        if result_cache is not None:
+            cache_key = result_key(images, cfg, mesh_mode, mesh_options, model.checkpoint_fingerprint)
+            cached_output = result_cache.get(cache_key)
+
+        # In async mode the reconstruction runs on the job queue and the client polls /api/jobs/<id>
+        if request.form.get("async", "false").lower() in ("1", "true"):
+            if cached_output is not None:
+                job_id = job_queue.submit(lambda: cached_output)
+            else:
+                job_id = job_queue.submit(reconstruct, images, mesh_mode, mesh_options, cache_key)
+            app.logger.info("Queued reconstruction job %s", job_id)
+            return jsonify({"job_id": job_id, "status_url": f"/api/jobs/{job_id}"}), 202
+
+        if cached_output is not None:
+            app.logger.info("Returning cached result %s", cache_key)
+            model_output = cached_output
+        else:
+            model_output = reconstruct(images, mesh_mode, mesh_options, cache_key)
 
         # Ensure model_output is in the correct format
-        if not isinstance(model_output, bytes):
+        if not isinstance(model_output, (bytes, bytearray)):
             app.logger.error("Model output is not in bytes format.")
             return jsonify({"error": "Model generation failed, output is not in bytes."}), 500
 
         # Send the GLB model as a response
-        return send_file(BytesIO(model_output), mimetype='model/gltf-binary', as_attachment=False, download_name='model.glb')
+        response = send_file(BytesIO(model_output), mimetype='model/gltf-binary', as_attachment=False, download_name='model.glb')
+        if cache_key is not None:
+            response.headers['X-Cache'] = 'HIT' if cached_output is not None else 'MISS'
+            response.headers['X-Cache-Key'] = cache_key
+        return response
 
     except Exception as e:
         app.logger.error("Error in upload_images: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
+# Reconstruct several objects in one request. The images of object i are sent as images[i][],
+# objects with the same number of views share a forward pass.
+@app.route('/api/reconstruct/batch', methods=['POST'])
+def reconstruct_batch_images():
+    try:
+        image_groups = {}
+        for key in request.files:
+            match = re.fullmatch(r"images\[(\d+)\]\[\]", key)
+            if match:
+                image_groups[int(match.group(1))] = [file.read() for file in request.files.getlist(key)]
+
+        app.logger.info("Received objects: %s", {i: len(images) for i, images in image_groups.items()})
+        if not image_groups:
+            return jsonify({"error": "No images uploaded"}), 400
+        if len(image_groups) > cfg.INFERENCE.MAX_BATCH_OBJECTS:
+            return jsonify({"error": f"At most {cfg.INFERENCE.MAX_BATCH_OBJECTS} objects per request"}), 400
+
+        unavailable = model_unavailable()
+        if unavailable is not None:
+            return unavailable
+
+        try:
+            mesh_mode, mesh_options = get_mesh_options(request.form)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        object_ids = sorted(image_groups)
+        glb_models = reconstruct_batch(
+            [image_groups[i] for i in object_ids], inference_model, cfg, mesh_mode,
+            max_batch_size=cfg.INFERENCE.MAX_BATCH_SIZE, mesh_pool=mesh_pool, diagnostic_sink=diagnostic_sink,
+            **mesh_options
+        )
+
+        return jsonify({"models": [{
+            'object': object_id,
+            'n_views': len(image_groups[object_id]),
+            'glb': base64.b64encode(glb_model).decode('utf-8')
+        } for object_id, glb_model in zip(object_ids, glb_models)]})
+
+    except Exception as e:
+        app.logger.error("Error in reconstruct_batch_images: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
+# Status of an asynchronous reconstruction job, or its GLB model once it is done
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    try:
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+
+        if job["status"] == DONE:
+            return send_file(BytesIO(job["result"]), mimetype='model/gltf-binary', as_attachment=False, download_name='model.glb')
+
+        response = {"job_id": job_id, "status": job["status"]}
+        if job["status"] == FAILED:
+            response["error"] = job["error"]
+            return jsonify(response), 500
+        return jsonify(response), 202
+    except Exception as e:
+        app.logger.error(f"Error fetching job {job_id}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+# Readiness of the server: 200 once the model is loaded and warmed up, 503 while it is loading
+@app.route('/api/ready', methods=['GET'])
+def get_readiness():
+    status = model_loader.status()
+    unavailable = model_unavailable()
+    if unavailable is not None:
+        return jsonify(status), unavailable[1]
+    return jsonify(status)
+
+# Metadata of the loaded model: backend, checkpoint, dtype, parameter counts, quantization and optimization modes
+@app.route('/api/model/info', methods=['GET'])
+def get_loaded_model_info():
+    unavailable = model_unavailable()
+    if unavailable is not None:
+        return unavailable
+    return jsonify(model.metadata)
+
+# Queue depth and batch size metrics of the micro-batching scheduler
+@app.route('/api/scheduler/metrics', methods=['GET'])
+def get_scheduler_metrics():
+    unavailable = model_unavailable()
+    if unavailable is not None:
+        return unavailable
+    if scheduler is None:
+        return jsonify({"error": "Micro-batching is disabled"}), 404
+    return jsonify(scheduler.metrics())
+
+# Latency histograms of the pipeline stages in the Prometheus text format
+@app.route('/api/metrics', methods=['GET'])
+def get_stage_metrics():
+    if not tracer.enabled:
+        return jsonify({"error": "Tracing is disabled"}), 404
+    return Response(tracer.prometheus(), mimetype='text/plain; version=0.0.4')
+
+# Hit and miss counters of the caches
+@app.route('/api/cache/metrics', methods=['GET'])
+def get_cache_metrics():
+    return jsonify({
+        "features": feature_cache.metrics() if feature_cache is not None else None,
+        "results": result_cache.metrics() if result_cache is not None else None,
+    })
+
+# Sampled preprocessed images, when cfg.DIAGNOSTICS.PREPROCESSING is enabled
+@app.route('/api/debug/preprocessing', methods=['GET'])
+def get_preprocessing_captures():
+    if diagnostic_sink is None:
+        return jsonify({"error": "Preprocessing diagnostics are disabled"}), 404
+    return jsonify({"metrics": diagnostic_sink.metrics(), "captures": [
+        dict(capture, image_url=f"/api/debug/preprocessing/{capture['id']}.png")
+        for capture in diagnostic_sink.captures()
+    ]})
+
+@app.route('/api/debug/preprocessing/<capture_id>.png', methods=['GET'])
+def get_preprocessing_capture(capture_id):
+    if diagnostic_sink is None:
+        return jsonify({"error": "Preprocessing diagnostics are disabled"}), 404
+    png = diagnostic_sink.get_png(capture_id)
+    if png is None:
+        return jsonify({"error": "Capture not found"}), 404
+    return send_file(BytesIO(png), mimetype='image/png')
+
 # get all models 
 @app.route('/api/models', methods=['GET'])
 def get_models():
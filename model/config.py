@@ -2,6 +2,7 @@
 #
 # Developed by Haozhe Xie <cshzxie@gmail.com>
 
+import os
 from easydict import EasyDict as edict
 
 __C                                         = edict()
@@ -69,6 +70,109 @@ __C.NETWORK.TCONV_USE_BIAS                  = False
 __C.NETWORK.USE_REFINER                     = True
 __C.NETWORK.USE_MERGER                      = True
 
+#
+# Startup
+#
+__C.STARTUP                                 = edict()
+__C.STARTUP.LAZY_MODEL_LOADING              = True      # load the model on a background thread, see /api/ready
+__C.STARTUP.WARM_UP                         = True      # run one forward pass before accepting reconstructions
+
+#
+# Production server, see gunicorn.conf.py
+#
+__C.SERVER                                  = edict()
+__C.SERVER.PREFORK                          = False     # set by gunicorn.conf.py: the master loads the model and forks the workers
+__C.SERVER.WORKERS                          = 2         # worker processes
+__C.SERVER.THREADS                          = 4         # request threads per worker
+
+#
+# Quantization, calibrate the static mode with calibrate.py
+#
+__C.QUANTIZATION                            = edict()
+__C.QUANTIZATION.MODE                       = 'none'    # available options: none, dynamic (int8 refiner Linear layers), static (dynamic and int8 encoder)
+__C.QUANTIZATION.ENGINE                     = ''        # quantized kernels: x86, fbgemm or qnnpack, empty for the first available
+__C.QUANTIZATION.CALIBRATION_PATH           = './pre_trained_weights/encoder_int8.pth'  # int8 encoder written by calibrate.py
+
+#
+# Inference runtime, every key can be overridden with an environment variable SWINVOX_RUNTIME_<KEY>
+#
+__C.RUNTIME                                 = edict()
+__C.RUNTIME.INTRA_OP_THREADS                = 0         # threads of one operator per worker, 0 divides the cores between the workers
+__C.RUNTIME.INTER_OP_THREADS                = 0         # threads running independent operators, 0 keeps the PyTorch default
+__C.RUNTIME.PINNING                         = 'none'    # available options: none, worker (every worker on its own cores)
+__C.RUNTIME.MAX_CONCURRENT_INFERENCE        = 1         # forward passes at the same time per worker without micro-batching, 0 for no limit
+
+for key, value in __C.RUNTIME.items():
+    if f'SWINVOX_RUNTIME_{key}' in os.environ:
+        __C.RUNTIME[key] = type(value)(os.environ[f'SWINVOX_RUNTIME_{key}'])
+
+#
+# Mesh generation
+#
+__C.MESH                                    = edict()
+__C.MESH.MODE                               = 'cubes'   # available options: cubes, greedy, smooth
+__C.MESH.ISO_LEVEL                          = .5        # surface level of the smooth mode
+__C.MESH.SMOOTHING_ITERATIONS               = 0         # Taubin smoothing passes of the smooth mode
+__C.MESH.STEP_SIZE                          = 2         # marching cubes step size of the smooth mode, 1 gives as many triangles as cubes
+__C.MESH.POOL_WORKERS                       = 2         # meshing worker processes, 0 meshes on the request thread
+
+#
+# Inference
+#
+__C.INFERENCE                               = edict()
+__C.INFERENCE.MAX_BATCH_SIZE                = 8         # objects per forward pass (batch API and scheduler)
+__C.INFERENCE.MICRO_BATCHING                = True      # batch concurrent requests through lib.scheduler
+__C.INFERENCE.MAX_WAIT_MS                   = 5         # time the scheduler waits to fill a batch
+__C.INFERENCE.MAX_BATCH_OBJECTS             = 32        # objects per request of the batch API
+__C.INFERENCE.DECODE_WORKERS                = 4         # threads decoding and resizing uploaded images, 1 to decode serially
+__C.INFERENCE.DRAFT_DECODE                  = True      # decode large JPEG files at reduced size
+__C.INFERENCE.VIEW_CHUNK_SIZE               = 8         # views fused at a time with bounded memory, 0 for all at once
+__C.INFERENCE.OPTIMIZE                      = 'none'    # available options: none, fold (BatchNorm folded into the convolutions), freeze (fold, then frozen TorchScript graphs)
+__C.INFERENCE.CHECKPOINT_PATH               = os.environ.get('SWINVOX_CHECKPOINT_PATH', './pre_trained_weights/Pix2Vox-A-ShapeNet_cpu.pth')  # torch or flat checkpoint, see helpers.save_checkpoint_flat
+__C.INFERENCE.BACKEND                       = 'torch'   # available options: torch, onnxruntime (the model exported by export_onnx.py)
+__C.INFERENCE.ONNX_PATH                     = './pre_trained_weights/Pix2Vox-A-ShapeNet_cpu.onnx'  # model written by export_onnx.py
+
+#
+# Caches
+#
+__C.CACHE                                   = edict()
+__C.CACHE.FEATURES                          = True      # cache the per-view encoder output
+__C.CACHE.FEATURES_MAX_BYTES                = 64 * 1024 * 1024   # in-memory budget of all cached views, 64 KB each (1024 views)
+__C.CACHE.FEATURES_DIR                      = ''        # on-disk tier of the feature cache, '' to disable
+__C.CACHE.FEATURES_DIR_MAX_BYTES            = 1024 * 1024 * 1024
+__C.CACHE.RESULTS                           = True      # return the stored GLB model for identical uploads
+__C.CACHE.RESULTS_MAX_BYTES                 = 64 * 1024 * 1024   # in-memory tier
+__C.CACHE.RESULTS_STORE                     = 'memory'  # backing store of the result cache: memory, or sqlite and directory to keep results across restarts
+__C.CACHE.RESULTS_SQLITE_PATH               = './instance/results.db'
+__C.CACHE.RESULTS_DIR                       = './instance/results'
+__C.CACHE.RESULTS_STORE_MAX_BYTES           = 1024 * 1024 * 1024
+
+#
+# Diagnostics
+#
+__C.DIAGNOSTICS                             = edict()
+__C.DIAGNOSTICS.PREPROCESSING               = False     # keep a sample of preprocessed images for /api/debug/preprocessing
+__C.DIAGNOSTICS.SAMPLE_RATE                 = 0.1       # fraction of uploads captured
+__C.DIAGNOSTICS.SINK                        = 'memory'  # memory ring buffer or file
+__C.DIAGNOSTICS.CAPACITY                    = 32        # captures kept
+__C.DIAGNOSTICS.DIR                         = './logs/diagnostics'
+
+#
+# Tracing, see /api/metrics
+#
+__C.TRACING                                 = edict()
+__C.TRACING.ENABLED                         = False     # time the pipeline stages into histograms
+__C.TRACING.SERVER_TIMING                   = True      # stage durations of a request in its Server-Timing response header
+
+#
+# Asynchronous reconstruction jobs
+#
+__C.JOBS                                    = edict()
+__C.JOBS.STORE                              = 'sqlite'  # available options: sqlite, memory
+__C.JOBS.SQLITE_PATH                        = './instance/jobs.db'
+__C.JOBS.MAX_WORKERS                        = 2
+__C.JOBS.RESULT_TTL                         = 3600      # seconds a job and its result are kept
+
 #
 # Training
 #
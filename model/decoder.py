@@ -37,33 +37,28 @@ class Decoder(torch.nn.Module):
         )
 
     def forward(self, image_features):
-        image_features = image_features.permute(1, 0, 2, 3, 4).contiguous()
-        image_features = torch.split(image_features, 1, dim=0)
-        gen_volumes = []
-        raw_features = []
+        # print(image_features.size())   # torch.Size([batch_size, n_views, 256, 8, 8])
+        batch_size, n_views = image_features.size(0), image_features.size(1)
 
-        for features in image_features:
-            gen_volume = features.view(-1, 2048, 2, 2, 2)
-            # print(gen_volume.size())   # torch.Size([batch_size, 2048, 2, 2, 2])
-            gen_volume = self.layer1(gen_volume)
-            # print(gen_volume.size())   # torch.Size([batch_size, 512, 4, 4, 4])
-            gen_volume = self.layer2(gen_volume)
-            # print(gen_volume.size())   # torch.Size([batch_size, 128, 8, 8, 8])
-            gen_volume = self.layer3(gen_volume)
-            # print(gen_volume.size())   # torch.Size([batch_size, 32, 16, 16, 16])
-            gen_volume = self.layer4(gen_volume)
-            raw_feature = gen_volume
-            # print(gen_volume.size())   # torch.Size([batch_size, 8, 32, 32, 32])
-            gen_volume = self.layer5(gen_volume)
-            # print(gen_volume.size())   # torch.Size([batch_size, 1, 32, 32, 32])
-            raw_feature = torch.cat((raw_feature, gen_volume), dim=1)
-            # print(raw_feature.size())  # torch.Size([batch_size, 9, 32, 32, 32])
+        # Fold the views into the batch dimension so all views go through the layers in one call
+        gen_volume = image_features.reshape(batch_size * n_views, 2048, 2, 2, 2)
+        # print(gen_volume.size())   # torch.Size([batch_size * n_views, 2048, 2, 2, 2])
+        gen_volume = self.layer1(gen_volume)
+        # print(gen_volume.size())   # torch.Size([batch_size * n_views, 512, 4, 4, 4])
+        gen_volume = self.layer2(gen_volume)
+        # print(gen_volume.size())   # torch.Size([batch_size * n_views, 128, 8, 8, 8])
+        gen_volume = self.layer3(gen_volume)
+        # print(gen_volume.size())   # torch.Size([batch_size * n_views, 32, 16, 16, 16])
+        gen_volume = self.layer4(gen_volume)
+        raw_feature = gen_volume
+        # print(gen_volume.size())   # torch.Size([batch_size * n_views, 8, 32, 32, 32])
+        gen_volume = self.layer5(gen_volume)
+        # print(gen_volume.size())   # torch.Size([batch_size * n_views, 1, 32, 32, 32])
+        raw_feature = torch.cat((raw_feature, gen_volume), dim=1)
+        # print(raw_feature.size())  # torch.Size([batch_size * n_views, 9, 32, 32, 32])
 
-            gen_volumes.append(torch.squeeze(gen_volume, dim=1))
-            raw_features.append(raw_feature)
-
-        gen_volumes = torch.stack(gen_volumes).permute(1, 0, 2, 3, 4).contiguous()
-        raw_features = torch.stack(raw_features).permute(1, 0, 2, 3, 4, 5).contiguous()
+        gen_volumes = gen_volume.view(batch_size, n_views, *gen_volume.shape[2:])
+        raw_features = raw_feature.view(batch_size, n_views, *raw_feature.shape[1:])
         # print(gen_volumes.size())      # torch.Size([batch_size, n_views, 32, 32, 32])
         # print(raw_features.size())     # torch.Size([batch_size, n_views, 9, 32, 32, 32])
         return raw_features, gen_volumes
\ No newline at end of file
@@ -15,8 +15,9 @@ class Encoder(torch.nn.Module):
         self.cfg = cfg
 
         # Layer Definition
-        # Set pretrained=False to avoid loading standard VGG weights and load our custom weight
-        vgg16_bn = torchvision.models.vgg16_bn(weights='VGG16_BN_Weights.DEFAULT')
+        # weights=None builds VGG16 without downloading the ImageNet weights, the checkpoint loaded by
+        # lib.utils.load_model overwrites all of them
+        vgg16_bn = torchvision.models.vgg16_bn(weights=None)
         self.vgg = torch.nn.Sequential(*list(vgg16_bn.features.children()))[:27]
         self.layer1 = torch.nn.Sequential(
             torch.nn.Conv2d(512, 512, kernel_size=3),
@@ -41,21 +42,29 @@ class Encoder(torch.nn.Module):
 
     def forward(self, rendering_images):
         # print(rendering_images.size())  # torch.Size([batch_size, n_views, img_c, img_h, img_w])
-        rendering_images = rendering_images.permute(1, 0, 2, 3, 4).contiguous()
-        rendering_images = torch.split(rendering_images, 1, dim=0)
-        image_features = []
+        batch_size, n_views = rendering_images.size(0), rendering_images.size(1)
 
-        for img in rendering_images:
-            features = self.vgg(img.squeeze(dim=0))
-            # print(features.size())    # torch.Size([batch_size, 512, 28, 28])
-            features = self.layer1(features)
-            # print(features.size())    # torch.Size([batch_size, 512, 26, 26])
-            features = self.layer2(features)
-            # print(features.size())    # torch.Size([batch_size, 512, 24, 24])
-            features = self.layer3(features)
-            # print(features.size())    # torch.Size([batch_size, 256, 8, 8])
-            image_features.append(features)
+        # Fold the views into the batch dimension so all views go through the network in one call
+        features = rendering_images.reshape(batch_size * n_views, *rendering_images.shape[2:])
+        features = self.vgg(features)
+        # print(features.size())    # torch.Size([batch_size * n_views, 512, 28, 28])
+        features = self.layer1(features)
+        # print(features.size())    # torch.Size([batch_size * n_views, 512, 26, 26])
+        features = self.layer2(features)
+        # print(features.size())    # torch.Size([batch_size * n_views, 512, 24, 24])
+        features = self.layer3(features)
+        # print(features.size())    # torch.Size([batch_size * n_views, 256, 8, 8])
 
-        image_features = torch.stack(image_features).permute(1, 0, 2, 3, 4).contiguous()
+        image_features = features.view(batch_size, n_views, *features.shape[1:])
         # print(image_features.size())  # torch.Size([batch_size, n_views, 256, 8, 8])
-        return image_features
\ No newline at end of file
+        return image_features
+
+    def forward_per_view(self, rendering_images):
+        # The previous implementation of forward, one VGG and layer1 to layer3 call per view. Same output as forward,
+        # kept as the reference of the encoder tests and of benchmarks/bench_encoder.py.
+        image_features = []
+        for img in torch.split(rendering_images.permute(1, 0, 2, 3, 4), 1, dim=0):
+            features = self.vgg(img.squeeze(dim=0))
+            features = self.layer3(self.layer2(self.layer1(features)))
+            image_features.append(features)
+        return torch.stack(image_features).permute(1, 0, 2, 3, 4).contiguous()
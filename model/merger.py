@@ -37,35 +37,71 @@ class Merger(torch.nn.Module):
             torch.nn.LeakyReLU(cfg.NETWORK.LEAKY_VALUE)
         )
 
+    def score(self, raw_features):
+        # Unnormalised fusion weight of every voxel of every view, the softmax over the views is left to the caller
+        batch_size, n_views_rendering = raw_features.size(0), raw_features.size(1)
+
+        # Fold the views into the batch dimension so all views go through the layers in one call
+        raw_feature = raw_features.reshape(batch_size * n_views_rendering, *raw_features.shape[2:])
+        # print(raw_feature.size())       # torch.Size([batch_size * n_views, 9, 32, 32, 32])
+
+        volume_weight = self.layer1(raw_feature)
+        # print(volume_weight.size())     # torch.Size([batch_size * n_views, 16, 32, 32, 32])
+        volume_weight = self.layer2(volume_weight)
+        # print(volume_weight.size())     # torch.Size([batch_size * n_views, 8, 32, 32, 32])
+        volume_weight = self.layer3(volume_weight)
+        # print(volume_weight.size())     # torch.Size([batch_size * n_views, 4, 32, 32, 32])
+        volume_weight = self.layer4(volume_weight)
+        # print(volume_weight.size())     # torch.Size([batch_size * n_views, 2, 32, 32, 32])
+        volume_weight = self.layer5(volume_weight)
+        # print(volume_weight.size())     # torch.Size([batch_size * n_views, 1, 32, 32, 32])
+
+        return volume_weight.view(batch_size, n_views_rendering, *volume_weight.shape[2:])
+
     def forward(self, raw_features, coarse_volumes):
-        n_views_rendering = coarse_volumes.size(1)
-        raw_features = torch.split(raw_features, 1, dim=1)
-        volume_weights = []
-
-        for i in range(n_views_rendering):
-            raw_feature = torch.squeeze(raw_features[i], dim=1)
-            # print(raw_feature.size())       # torch.Size([batch_size, 9, 32, 32, 32])
-
-            volume_weight = self.layer1(raw_feature)
-            # print(volume_weight.size())     # torch.Size([batch_size, 16, 32, 32, 32])
-            volume_weight = self.layer2(volume_weight)
-            # print(volume_weight.size())     # torch.Size([batch_size, 8, 32, 32, 32])
-            volume_weight = self.layer3(volume_weight)
-            # print(volume_weight.size())     # torch.Size([batch_size, 4, 32, 32, 32])
-            volume_weight = self.layer4(volume_weight)
-            # print(volume_weight.size())     # torch.Size([batch_size, 2, 32, 32, 32])
-            volume_weight = self.layer5(volume_weight)
-            # print(volume_weight.size())     # torch.Size([batch_size, 1, 32, 32, 32])
-
-            volume_weight = torch.squeeze(volume_weight, dim=1)
-            # print(volume_weight.size())     # torch.Size([batch_size, 32, 32, 32])
-            volume_weights.append(volume_weight)
-
-        volume_weights = torch.stack(volume_weights).permute(1, 0, 2, 3, 4).contiguous()
-        volume_weights = torch.softmax(volume_weights, dim=1)
+        volume_weights = torch.softmax(self.score(raw_features), dim=1)
         # print(volume_weights.size())        # torch.Size([batch_size, n_views, 32, 32, 32])
         # print(coarse_volumes.size())        # torch.Size([batch_size, n_views, 32, 32, 32])
         coarse_volumes = coarse_volumes * volume_weights
         coarse_volumes = torch.sum(coarse_volumes, dim=1)
 
-        return torch.clamp(coarse_volumes, min=0, max=1)
\ No newline at end of file
+        return torch.clamp(coarse_volumes, min=0, max=1)
+
+
+class StreamingFusion:
+    """
+    Online softmax over the views, fed one chunk of views at a time.
+
+    Keeps the running maximum of the fusion weights, the sum of their exponentials and the exponential-weighted
+    sum of the coarse volumes, so memory does not depend on the number of views. result() gives the same volume
+    as Merger.forward on all the views at once.
+    """
+    def __init__(self):
+        self.running_max = None
+        self.exp_sum = None
+        self.weighted_sum = None
+
+    def update(self, volume_weights, coarse_volumes):
+        # volume_weights are Merger.score outputs, both tensors are [batch_size, n_views, 32, 32, 32]
+        chunk_max = torch.max(volume_weights, dim=1).values
+        if self.running_max is None:
+            new_max = chunk_max
+        else:
+            new_max = torch.maximum(self.running_max, chunk_max)
+
+        exp_weights = torch.exp(volume_weights - new_max.unsqueeze(dim=1))
+        exp_sum = torch.sum(exp_weights, dim=1)
+        weighted_sum = torch.sum(exp_weights * coarse_volumes, dim=1)
+
+        if self.running_max is not None:
+            # Rescale what was accumulated against the previous maximum
+            scale = torch.exp(self.running_max - new_max)
+            exp_sum += self.exp_sum * scale
+            weighted_sum += self.weighted_sum * scale
+
+        self.running_max, self.exp_sum, self.weighted_sum = new_max, exp_sum, weighted_sum
+
+    def result(self):
+        if self.running_max is None:
+            raise ValueError("No views were fused")
+        return torch.clamp(self.weighted_sum / self.exp_sum, min=0, max=1)
\ No newline at end of file
@@ -1,12 +1,11 @@
 # File: model_architecture.py
 import logging
 import torch
-import lib.helpers as helpers
-from datetime import datetime as dt
 import torch.nn as nn
+from lib.tracing import tracer
 from model.encoder import Encoder
 from model.decoder import Decoder
-from model.merger import Merger
+from model.merger import Merger, StreamingFusion
 from model.refiner import Refiner
 
 logger = logging.getLogger("root")
@@ -18,18 +17,58 @@ class SwinVoxModel(nn.Module):
         self.decoder = Decoder(cfg)
         self.merger = Merger(cfg)
         self.refiner = Refiner(cfg)
+        # Views per chunk of the streaming fusion, 0 runs all the views of an object at once
+        self.view_chunk_size = cfg.INFERENCE.VIEW_CHUNK_SIZE
+        # Optional lib.feature_cache.FeatureCache of the per-view encoder output
+        self.feature_cache = None
 
     def forward(self, rendering_images):
-        # Forward pass through the model components
-        logger.debug('[DEBUG] %s Parameters in Encoder: %d.' % (dt.now(), helpers.count_parameters(self.encoder)))
-        logger.debug('[DEBUG] %s Parameters in Decoder: %d.' % (dt.now(), helpers.count_parameters(self.decoder)))
-        logger.debug('[DEBUG] %s Parameters in Merger: %d.' % (dt.now(), helpers.count_parameters(self.merger)))
-        logger.debug('[DEBUG] %s Parameters in Refiner: %d.' % (dt.now(), helpers.count_parameters(self.refiner)))
-
+        # Forward pass through the model components. The parameter counts are in the metadata load_model computes.
         with torch.no_grad():
-            encoded_features = self.encoder(rendering_images)
-            raw_features, decoded_volumes = self.decoder(encoded_features)
-            generated_volume = self.merger(raw_features, decoded_volumes)
-            generated_volume = self.refiner(generated_volume)
+            if 0 < self.view_chunk_size < rendering_images.size(1):
+                generated_volume = self.fuse_views(rendering_images, self.view_chunk_size)
+            else:
+                with tracer.stage("encoder"):
+                    encoded_features = self.encode(rendering_images)
+                with tracer.stage("decoder"):
+                    raw_features, decoded_volumes = self.decoder(encoded_features)
+                with tracer.stage("merger"):
+                    generated_volume = self.merger(raw_features, decoded_volumes)
+            with tracer.stage("refiner"):
+                generated_volume = self.refiner(generated_volume)
         # helpers.get_volume_views(generated_volume, "sample_test_images")
-        return generated_volume
\ No newline at end of file
+        return generated_volume
+
+    def fuse_views(self, rendering_images, chunk_size):
+        # Encode, decode and score chunk_size views at a time, only the fusion accumulators outlive a chunk
+        fusion = StreamingFusion()
+        for views in torch.split(rendering_images, chunk_size, dim=1):
+            with tracer.stage("encoder"):
+                encoded_features = self.encode(views)
+            with tracer.stage("decoder"):
+                raw_features, decoded_volumes = self.decoder(encoded_features)
+            with tracer.stage("merger"):
+                fusion.update(self.merger.score(raw_features), decoded_volumes)
+            del encoded_features, raw_features, decoded_volumes
+        with tracer.stage("merger"):
+            return fusion.result()
+
+    def encode(self, rendering_images):
+        # Encoder output of every view, only the views missing from the feature cache go through the encoder
+        if self.feature_cache is None:
+            return self.encoder(rendering_images)
+
+        batch_size, n_views = rendering_images.size(0), rendering_images.size(1)
+        views = rendering_images.reshape(batch_size * n_views, *rendering_images.shape[2:])
+        keys = [self.feature_cache.key(view) for view in views]
+        features = [self.feature_cache.get(key) for key in keys]
+
+        missing = [index for index, view_features in enumerate(features) if view_features is None]
+        if missing:
+            encoded = self.encoder(views[missing].unsqueeze(dim=0))[0]
+            for index, view_features in zip(missing, encoded):
+                self.feature_cache.put(keys[index], view_features)
+                features[index] = view_features
+
+        image_features = torch.stack(features)
+        return image_features.view(batch_size, n_views, *image_features.shape[1:])
@@ -0,0 +1,3 @@
+#!/bin/sh
+source .venv/bin/activate
+gunicorn -c gunicorn.conf.py main:app
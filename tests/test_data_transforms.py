@@ -7,7 +7,7 @@ from PIL import Image
 from io import BytesIO
 
 # Import the classes to be tested
-from lib.data_transforms import Compose, ToTensor, Normalize, CenterCrop, RandomBackground
+from lib.data_transforms import Compose, ToTensor, Normalize, CenterCrop, RandomBackground, ResizeAndPad, ResizePadNormalize
 
 class TestDataTransforms(unittest.TestCase):
     def setUp(self):
@@ -175,5 +175,35 @@ class TestDataTransforms(unittest.TestCase):
         self.assertIsInstance(processed_images, np.ndarray)
         self.assertEqual(processed_images.shape, (2, 100, 100, 3))  # Batch size 2, 100x100, 3 channels
 
+    def test_resize_pad_normalize_matches_compose(self):
+        # The fused step gives the same tensor as ResizeAndPad, Normalize and ToTensor
+        images = [
+            np.random.randint(0, 255, size=size, dtype=np.uint8)
+            for size in [(480, 640, 3), (100, 100, 3), (300, 90, 3)]
+        ]
+        bg_color_range = [[240, 240], [240, 240], [240, 240]]
+        transform = Compose([
+            ResizeAndPad((224, 224), bg_color_range=bg_color_range),
+            Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5]),
+            ToTensor()
+        ])
+        fused_transform = ResizePadNormalize((224, 224), mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5], bg_color_range=bg_color_range)
+
+        transformed_images = fused_transform(images)
+
+        # Check the output type and shape, and that it is identical
+        self.assertIsInstance(transformed_images, torch.Tensor)
+        self.assertEqual(transformed_images.dtype, torch.float32)
+        self.assertEqual(transformed_images.shape, (3, 3, 224, 224))
+        self.assertTrue(torch.equal(transformed_images, transform(images)))
+
+    def test_resize_pad_normalize_is_deterministic(self):
+        # A background color range gives its centre color, the same on every call
+        fused_transform = ResizePadNormalize((224, 224), mean=[0, 0, 0], std=[1, 1, 1], bg_color_range=[[0, 254], [0, 0], [255, 255]])
+        transformed_images = fused_transform([np.zeros((224, 112, 3), dtype=np.uint8)])
+
+        self.assertTrue(torch.equal(transformed_images, fused_transform([np.zeros((224, 112, 3), dtype=np.uint8)])))
+        np.testing.assert_allclose(transformed_images[0, :, 0, 0].numpy(), [127 / 255, 0, 1], rtol=1e-6)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
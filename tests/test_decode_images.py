@@ -0,0 +1,65 @@
+import unittest
+import copy
+from io import BytesIO
+import numpy as np
+import torch
+from PIL import Image
+from lib.utils import decode_image, process_images
+from model.config import cfg
+
+
+def encode(image, format):
+    # Bytes of a PIL image saved in the given format
+    image_bytes = BytesIO()
+    image.save(image_bytes, format=format)
+    return image_bytes.getvalue()
+
+
+class TestDecodeImage(unittest.TestCase):
+
+    def setUp(self):
+        # Large photo-like image with a gradient
+        gradient = np.linspace(0, 255, 2000, dtype=np.uint8)
+        self.large_image = Image.fromarray(np.stack([np.tile(gradient, (1500, 1))] * 3, axis=2))
+
+    def test_draft_decodes_large_jpeg_at_reduced_size(self):
+        # The JPEG decoder downscales, but not below the target size
+        np_image = decode_image(encode(self.large_image, "JPEG"), (224, 224))
+        self.assertEqual(np_image.dtype, np.uint8)
+        self.assertEqual(np_image.shape, (375, 500, 3))
+
+        np_image = decode_image(encode(self.large_image, "JPEG"), (224, 224), draft=False)
+        self.assertEqual(np_image.shape, (1500, 2000, 3))
+
+    def test_other_formats_are_decoded_at_full_size(self):
+        np_image = decode_image(encode(self.large_image, "PNG"), (224, 224))
+        self.assertEqual(np_image.shape, (1500, 2000, 3))
+
+
+class TestParallelProcessImages(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.images = [
+            encode(Image.fromarray(rng.integers(0, 255, size=(300 + 20 * index, 400, 3), dtype=np.uint8)), "PNG")
+            for index in range(6)
+        ]
+        self.serial_cfg = copy.deepcopy(cfg)
+        self.serial_cfg.INFERENCE.DECODE_WORKERS = 1
+        self.parallel_cfg = copy.deepcopy(cfg)
+        self.parallel_cfg.INFERENCE.DECODE_WORKERS = 4
+
+    def test_same_tensor_as_serial_decoding(self):
+        # The thread pool gives the views in upload order, identical to decoding them one by one
+        processed_images = process_images(self.images, self.parallel_cfg)
+        self.assertEqual(processed_images.shape, (1, 6, 3, 224, 224))
+        self.assertTrue(torch.equal(processed_images, process_images(self.images, self.serial_cfg)))
+
+    def test_invalid_image(self):
+        # A corrupt file among valid ones is reported as a ValueError
+        with self.assertRaises(ValueError) as context:
+            process_images(self.images + [b"not an image"], self.parallel_cfg)
+        self.assertIn("Error processing image", str(context.exception))
+
+if __name__ == '__main__':
+    unittest.main()
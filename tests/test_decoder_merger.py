@@ -0,0 +1,79 @@
+import unittest
+import torch
+from model.config import cfg
+from model.decoder import Decoder
+from model.merger import Merger
+
+
+def per_view_decoder_forward(decoder, image_features):
+    # Reference implementation that runs the views one at a time
+    gen_volumes = []
+    raw_features = []
+    for features in torch.split(image_features.permute(1, 0, 2, 3, 4), 1, dim=0):
+        gen_volume = features.reshape(-1, 2048, 2, 2, 2)
+        raw_feature = decoder.layer4(decoder.layer3(decoder.layer2(decoder.layer1(gen_volume))))
+        gen_volume = decoder.layer5(raw_feature)
+        raw_features.append(torch.cat((raw_feature, gen_volume), dim=1))
+        gen_volumes.append(torch.squeeze(gen_volume, dim=1))
+    gen_volumes = torch.stack(gen_volumes).permute(1, 0, 2, 3, 4).contiguous()
+    raw_features = torch.stack(raw_features).permute(1, 0, 2, 3, 4, 5).contiguous()
+    return raw_features, gen_volumes
+
+
+def per_view_merger_forward(merger, raw_features, coarse_volumes):
+    # Reference implementation that runs the views one at a time
+    volume_weights = []
+    for raw_feature in torch.split(raw_features, 1, dim=1):
+        volume_weight = torch.squeeze(raw_feature, dim=1)
+        for layer in (merger.layer1, merger.layer2, merger.layer3, merger.layer4, merger.layer5):
+            volume_weight = layer(volume_weight)
+        volume_weights.append(torch.squeeze(volume_weight, dim=1))
+    volume_weights = torch.softmax(torch.stack(volume_weights).permute(1, 0, 2, 3, 4), dim=1)
+    return torch.clamp(torch.sum(coarse_volumes * volume_weights, dim=1), min=0, max=1)
+
+
+class TestDecoder(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.decoder = Decoder(cfg).eval()
+
+    def test_matches_per_view_loop(self):
+        # Folding the views into the batch gives the same raw features and volumes as the per-view loop
+        image_features = torch.rand(2, 3, 256, 8, 8)
+        with torch.no_grad():
+            raw_features, gen_volumes = self.decoder(image_features)
+            expected_raw_features, expected_gen_volumes = per_view_decoder_forward(self.decoder, image_features)
+
+        self.assertEqual(raw_features.shape, (2, 3, 9, 32, 32, 32))
+        self.assertEqual(gen_volumes.shape, (2, 3, 32, 32, 32))
+        torch.testing.assert_close(raw_features, expected_raw_features, rtol=1e-5, atol=1e-5)
+        torch.testing.assert_close(gen_volumes, expected_gen_volumes, rtol=1e-5, atol=1e-5)
+
+
+class TestMerger(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.merger = Merger(cfg).eval()
+
+    def test_matches_per_view_loop(self):
+        # Folding the views into the batch gives the same fused volume as the per-view loop
+        raw_features = torch.rand(2, 3, 9, 32, 32, 32)
+        coarse_volumes = torch.rand(2, 3, 32, 32, 32)
+        with torch.no_grad():
+            fused_volume = self.merger(raw_features, coarse_volumes)
+            expected = per_view_merger_forward(self.merger, raw_features, coarse_volumes)
+
+        self.assertEqual(fused_volume.shape, (2, 32, 32, 32))
+        torch.testing.assert_close(fused_volume, expected, rtol=1e-5, atol=1e-5)
+
+    def test_single_view(self):
+        # With a single view the softmax weight is 1 and the coarse volume is returned clamped
+        coarse_volumes = torch.rand(1, 1, 32, 32, 32)
+        with torch.no_grad():
+            fused_volume = self.merger(torch.rand(1, 1, 9, 32, 32, 32), coarse_volumes)
+        torch.testing.assert_close(fused_volume, coarse_volumes[:, 0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+import numpy as np
+import torch
+from PIL import Image
+from lib.diagnostics import DiagnosticSink
+from lib.utils import process_images
+from model.config import cfg
+
+MEAN = [0.5, 0.5, 0.5]
+STD = [0.5, 0.5, 0.5]
+
+
+def views(value, n_views=2):
+    # Normalized [n_views, 3, 224, 224] tensor of one gray level in [0, 1]
+    return torch.full((n_views, 3, 224, 224), (value - 0.5) / 0.5)
+
+
+class TestDiagnosticSink(unittest.TestCase):
+
+    def test_memory_ring_buffer(self):
+        # The last captures are kept as PNG images of the first view, newest first
+        sink = DiagnosticSink(MEAN, STD, capacity=2)
+        for value in (0.0, 0.5, 1.0):
+            sink.capture(views(value))
+            sink.flush()
+
+        captures = sink.captures()
+        self.assertEqual(len(captures), 2)
+        self.assertEqual(captures[0]["n_views"], 2)
+        image = np.asarray(Image.open(BytesIO(sink.get_png(captures[0]["id"]))))
+        self.assertEqual(image.shape, (224, 224, 3))
+        self.assertTrue(np.all(image == 255))
+        self.assertIsNone(sink.get_png("missing"))
+        sink.shutdown()
+
+    def test_backlog_is_dropped(self):
+        # Captures arriving while the writer is capacity captures behind are dropped
+        sink = DiagnosticSink(MEAN, STD, capacity=1)
+        sink._executor.submit(time.sleep, 0.2)
+        sink.capture(views(0.0))
+        sink.capture(views(1.0))
+        sink.flush()
+        self.assertEqual(sink.metrics()["dropped"], 1)
+        self.assertEqual(len(sink.captures()), 1)
+        sink.shutdown()
+
+    def test_sampling(self):
+        # With a sample rate of 0 nothing is captured
+        sink = DiagnosticSink(MEAN, STD, sample_rate=0.0)
+        sink.capture(views(0.5))
+        sink.flush()
+        self.assertEqual(sink.captures(), [])
+        self.assertEqual(sink.metrics()["sampled"], 0)
+        sink.shutdown()
+
+    def test_file_sink(self):
+        # Captures are written to files, the files of captures leaving the ring buffer are removed
+        with tempfile.TemporaryDirectory() as directory:
+            sink = DiagnosticSink(MEAN, STD, capacity=2, mode="file", directory=directory)
+            for value in (0.0, 0.5, 1.0):
+                sink.capture(views(value))
+                sink.flush()
+
+            self.assertEqual(len(os.listdir(directory)), 2)
+            png = sink.get_png(sink.captures()[-1]["id"])
+            self.assertTrue(np.all(np.asarray(Image.open(BytesIO(png))) == 128))
+            sink.shutdown()
+
+    def test_process_images_capture(self):
+        # process_images hands its output to the sink
+        image_bytes = BytesIO()
+        Image.new('RGB', (224, 224), color='red').save(image_bytes, format='PNG')
+        sink = DiagnosticSink(cfg.DATASET.MEAN, cfg.DATASET.STD)
+        process_images([image_bytes.getvalue()], cfg, sink)
+        sink.flush()
+
+        image = np.asarray(Image.open(BytesIO(sink.get_png(sink.captures()[0]["id"]))))
+        np.testing.assert_array_equal(image[112, 112], [255, 0, 0])
+        sink.shutdown()
+
+    def test_matplotlib_is_not_imported(self):
+        # The inference code path does not load matplotlib
+        output = subprocess.check_output(
+            [sys.executable, "-c", "import sys, lib.utils; print('matplotlib' in sys.modules)"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        self.assertEqual(output.strip(), b"False")
+
+if __name__ == '__main__':
+    unittest.main()
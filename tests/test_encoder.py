@@ -0,0 +1,41 @@
+import unittest
+import torch
+from model.config import cfg
+from model.encoder import Encoder
+
+
+class TestEncoder(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(0)
+        cls.encoder = Encoder(cfg).eval()
+
+    def test_matches_per_view_loop(self):
+        # Folding the views into the batch gives the same features as the per-view loop
+        rendering_images = torch.rand(2, 3, 3, 224, 224)
+        with torch.no_grad():
+            image_features = self.encoder(rendering_images)
+            expected = self.encoder.forward_per_view(rendering_images)
+
+        self.assertEqual(image_features.shape, (2, 3, 256, 8, 8))
+        torch.testing.assert_close(image_features, expected, rtol=1e-4, atol=1e-4)
+
+    def test_single_view(self):
+        # A single view gives a [batch, 1, 256, 8, 8] tensor
+        with torch.no_grad():
+            image_features = self.encoder(torch.rand(1, 1, 3, 224, 224))
+        self.assertEqual(image_features.shape, (1, 1, 256, 8, 8))
+
+    def test_checkpoint_keys_unchanged(self):
+        # The encoder state dict keys still match the checkpoint layout read by load_model
+        keys = set(self.encoder.state_dict())
+        self.assertIn("vgg.0.weight", keys)
+        self.assertIn("layer1.0.weight", keys)
+        self.assertIn("layer3.1.running_var", keys)
+
+        encoder = Encoder(cfg)
+        encoder.load_state_dict(self.encoder.state_dict(), strict=True)
+
+if __name__ == '__main__':
+    unittest.main()
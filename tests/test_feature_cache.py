@@ -0,0 +1,110 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+import torch
+from lib.feature_cache import FeatureCache, checkpoint_fingerprint
+from model.config import cfg
+from model.model_architecture import SwinVoxModel
+
+# Size of one [256, 8, 8] float32 view feature
+FEATURE_BYTES = 256 * 8 * 8 * 4
+
+
+class TestFeatureCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key_depends_on_content_and_namespace(self):
+        # Equal views share a key, different views or checkpoints do not
+        view = torch.rand(3, 224, 224)
+        cache = FeatureCache(FEATURE_BYTES, namespace="a")
+        self.assertEqual(cache.key(view), cache.key(view.clone()))
+        self.assertNotEqual(cache.key(view), cache.key(view + 1))
+        self.assertNotEqual(cache.key(view), FeatureCache(FEATURE_BYTES, namespace="b").key(view))
+
+    def test_lru_eviction_by_bytes(self):
+        # With room for two features the least recently used one is evicted
+        cache = FeatureCache(2 * FEATURE_BYTES)
+        cache.put("a", torch.rand(256, 8, 8))
+        cache.put("b", torch.rand(256, 8, 8))
+        cache.get("a")
+        cache.put("c", torch.rand(256, 8, 8))
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        metrics = cache.metrics()
+        self.assertEqual(metrics["evictions"], 1)
+        self.assertEqual(metrics["bytes"], 2 * FEATURE_BYTES)
+        self.assertEqual((metrics["hits"], metrics["misses"]), (3, 1))
+
+    def test_disk_tier(self):
+        # Features evicted from memory, or written by a previous process, are read back from disk
+        features = torch.rand(256, 8, 8)
+        cache = FeatureCache(FEATURE_BYTES, namespace="a", cache_dir=self.temp_dir.name)
+        cache.put("a", features)
+        cache.put("b", torch.rand(256, 8, 8))
+        torch.testing.assert_close(cache.get("a"), features)
+        self.assertEqual(cache.metrics()["disk_hits"], 1)
+
+        cache = FeatureCache(FEATURE_BYTES, namespace="a", cache_dir=self.temp_dir.name)
+        torch.testing.assert_close(cache.get("a"), features)
+
+    def test_checkpoint_change_invalidates_disk_tier(self):
+        # Opening the cache for another checkpoint removes the entries of the previous one
+        FeatureCache(FEATURE_BYTES, namespace="a", cache_dir=self.temp_dir.name).put("a", torch.rand(256, 8, 8))
+        cache = FeatureCache(FEATURE_BYTES, namespace="b", cache_dir=self.temp_dir.name)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(os.listdir(self.temp_dir.name), ["b"])
+
+    def test_disk_budget(self):
+        # The disk tier is pruned when it grows over its budget
+        cache = FeatureCache(FEATURE_BYTES, cache_dir=self.temp_dir.name, max_disk_bytes=4 * FEATURE_BYTES)
+        for index in range(8):
+            cache.put(str(index), torch.rand(256, 8, 8))
+        self.assertLessEqual(cache.metrics()["disk_bytes"], 4 * FEATURE_BYTES)
+
+    def test_checkpoint_fingerprint(self):
+        # Replacing the checkpoint file changes its fingerprint
+        path = os.path.join(self.temp_dir.name, "checkpoint.pth")
+        with open(path, "wb") as file:
+            file.write(b"weights")
+        fingerprint = checkpoint_fingerprint(path)
+        with open(path, "wb") as file:
+            file.write(b"new weights")
+        self.assertNotEqual(checkpoint_fingerprint(path), fingerprint)
+
+
+class TestModelFeatureCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(0)
+        cls.model = SwinVoxModel(cfg).eval()
+
+    def test_repeated_views_skip_the_encoder(self):
+        # Resubmitting the same views with one more only encodes the new view
+        views = torch.rand(1, 3, 3, 224, 224)
+        expected = self.model(views)
+
+        self.model.feature_cache = FeatureCache(16 * FEATURE_BYTES)
+        try:
+            with patch.object(self.model.encoder, "forward", wraps=self.model.encoder.forward) as encoder_forward:
+                torch.testing.assert_close(self.model(views), expected)
+                more_views = torch.cat([views, torch.rand(1, 1, 3, 224, 224)], dim=1)
+                self.model(more_views)
+                torch.testing.assert_close(self.model(views), expected)
+
+            self.assertEqual([call.args[0].size(1) for call in encoder_forward.call_args_list], [3, 1])
+            metrics = self.model.feature_cache.metrics()
+            self.assertEqual((metrics["hits"], metrics["misses"]), (6, 4))
+        finally:
+            self.model.feature_cache = None
+
+if __name__ == '__main__':
+    unittest.main()
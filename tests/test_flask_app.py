@@ -1,4 +1,6 @@
 import unittest
+import unittest.mock
+import io
 import json
 from flask import Flask
 from main import app
@@ -42,5 +44,33 @@ class FlaskAppTests(unittest.TestCase):
                 data = json.loads(response.data)
                 self.assertEqual(data["voxel_plot_path"], "output/voxel_plot.png")
 
+    def test_model_info(self):
+        # The metadata computed when the model was loaded, without touching the model
+        metadata = {"backend": "torch", "parameters": {"total": 1}}
+        with unittest.mock.patch('main.model_unavailable', return_value=None), \
+                unittest.mock.patch('main.model', unittest.mock.MagicMock(metadata=metadata)):
+            response = self.app.get('/api/model/info')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), metadata)
+
+    def test_invalid_step_size(self):
+        # The marching cubes step size of the smooth mode is validated like iso_level
+        with unittest.mock.patch('main.model_unavailable', return_value=None):
+            for step_size in ("0", "5", "two"):
+                response = self.app.post('/upload', data={
+                    'images[]': (io.BytesIO(b"image"), "image.png"), 'mesh_mode': 'smooth', 'step_size': step_size,
+                })
+                self.assertEqual(response.status_code, 400)
+
+    def test_invalid_smoothing_iterations(self):
+        # Negative and unbounded smoothing passes are rejected before any meshing work
+        with unittest.mock.patch('main.model_unavailable', return_value=None):
+            for smoothing_iterations in ("-1", "51", "1000000000", "many"):
+                response = self.app.post('/upload', data={
+                    'images[]': (io.BytesIO(b"image"), "image.png"), 'mesh_mode': 'smooth',
+                    'smoothing_iterations': smoothing_iterations,
+                })
+                self.assertEqual(response.status_code, 400)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
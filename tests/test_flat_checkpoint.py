@@ -0,0 +1,63 @@
+import unittest
+import os
+import tempfile
+import torch
+from lib.flat_checkpoint import save_flat_checkpoint, load_flat_checkpoint, is_flat_checkpoint
+
+
+class TestFlatCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "model.flat")
+        self.module = torch.nn.Sequential(torch.nn.Conv2d(3, 8, 3), torch.nn.BatchNorm2d(8))
+        self.module.eval()
+        self.checkpoint = {"encoder_state_dict": self.module.state_dict(), "merger_state_dict": {"scale": torch.tensor(2.5)}}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        # Every tensor comes back with its name, dtype, shape and values
+        save_flat_checkpoint(self.checkpoint, self.path)
+        self.assertTrue(is_flat_checkpoint(self.path))
+        loaded = load_flat_checkpoint(self.path)
+
+        self.assertEqual(set(loaded), set(self.checkpoint))
+        for state_dict_name, state_dict in self.checkpoint.items():
+            self.assertEqual(list(loaded[state_dict_name]), list(state_dict))
+            for name, tensor in state_dict.items():
+                self.assertEqual(loaded[state_dict_name][name].dtype, tensor.dtype)
+                self.assertTrue(torch.equal(loaded[state_dict_name][name], tensor))
+
+    def test_assigned_module(self):
+        # A module assigned the mapped tensors computes the same output as the original
+        save_flat_checkpoint(self.checkpoint, self.path)
+        with torch.device("meta"):
+            module = torch.nn.Sequential(torch.nn.Conv2d(3, 8, 3), torch.nn.BatchNorm2d(8))
+        module.load_state_dict(load_flat_checkpoint(self.path)["encoder_state_dict"], assign=True)
+        module.eval()
+
+        x = torch.rand(2, 3, 16, 16)
+        self.assertTrue(torch.equal(module(x), self.module(x)))
+
+    def test_writes_stay_private(self):
+        # Changing a loaded tensor does not change the file
+        save_flat_checkpoint(self.checkpoint, self.path)
+        load_flat_checkpoint(self.path)["encoder_state_dict"]["0.weight"].zero_()
+
+        weight = load_flat_checkpoint(self.path)["encoder_state_dict"]["0.weight"]
+        self.assertTrue(torch.equal(weight, self.checkpoint["encoder_state_dict"]["0.weight"]))
+
+    def test_other_files(self):
+        # Regular torch checkpoints and missing files are not flat checkpoints
+        torch_path = os.path.join(self.temp_dir.name, "model.pth")
+        torch.save(self.checkpoint, torch_path)
+        self.assertFalse(is_flat_checkpoint(torch_path))
+        self.assertFalse(is_flat_checkpoint(os.path.join(self.temp_dir.name, "missing.flat")))
+        with self.assertRaises(ValueError):
+            load_flat_checkpoint(torch_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import os
+import io
+import struct
+import tempfile
+from contextlib import redirect_stdout
+import numpy as np
+import trimesh
+from pygltflib import GLTF2
+from lib.glb_writer import write_glb, COMPONENT_UNSIGNED_SHORT, COMPONENT_UNSIGNED_INT
+from lib.glb_opener import load_and_print_glb
+from lib.utils import voxel_to_mesh
+
+
+class TestWriteGLB(unittest.TestCase):
+
+    def setUp(self):
+        # Mesh of a random voxel grid
+        rng = np.random.default_rng(0)
+        self.mesh = voxel_to_mesh(rng.random((16, 16, 16)) > 0.5)
+
+        # Temporary directory for the round trip files
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def round_trip(self, glb_data):
+        # Write the GLB to disk and read it back with load_and_print_glb and pygltflib
+        path = os.path.join(self.temp_dir.name, "model.glb")
+        with open(path, "wb") as f:
+            f.write(glb_data)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            load_and_print_glb(path)
+
+        return output.getvalue(), GLTF2().load(path)
+
+    def read_accessor(self, gltf, accessor_index, dtype, width):
+        # Decode the data of an accessor from the binary blob
+        accessor = gltf.accessors[accessor_index]
+        buffer_view = gltf.bufferViews[accessor.bufferView]
+        data = gltf.binary_blob()[buffer_view.byteOffset:buffer_view.byteOffset + buffer_view.byteLength]
+        return np.frombuffer(data, dtype=dtype).reshape(-1, width)
+
+    def test_header(self):
+        # The file starts with the GLB header and its length matches the data
+        glb_data = write_glb(self.mesh.vertices, self.mesh.faces)
+        magic, version, length = struct.unpack("<4sII", glb_data[:12])
+
+        self.assertIsInstance(glb_data, bytearray)
+        self.assertEqual(magic, b"glTF")
+        self.assertEqual(version, 2)
+        self.assertEqual(length, len(glb_data))
+        self.assertEqual(length % 4, 0)
+
+    def test_round_trip(self):
+        # Positions and indices survive the round trip through load_and_print_glb and pygltflib
+        output, gltf = self.round_trip(write_glb(self.mesh.vertices, self.mesh.faces))
+
+        self.assertIn("Loaded GLB file", output)
+        self.assertIn("Number of meshes: 1", output)
+        self.assertIn("Number of accessors: 2", output)
+
+        primitive = gltf.meshes[0].primitives[0]
+        self.assertIsNone(primitive.attributes.NORMAL)
+        self.assertEqual(gltf.accessors[primitive.indices].componentType, COMPONENT_UNSIGNED_SHORT)
+
+        vertices = self.read_accessor(gltf, primitive.attributes.POSITION, np.float32, 3)
+        faces = self.read_accessor(gltf, primitive.indices, np.uint16, 3)
+        np.testing.assert_allclose(vertices, self.mesh.vertices)
+        np.testing.assert_array_equal(faces, self.mesh.faces)
+        np.testing.assert_allclose(gltf.accessors[primitive.attributes.POSITION].min, self.mesh.bounds[0])
+        np.testing.assert_allclose(gltf.accessors[primitive.attributes.POSITION].max, self.mesh.bounds[1])
+
+    def test_round_trip_with_normals(self):
+        # Normals are written as a separate attribute
+        output, gltf = self.round_trip(write_glb(self.mesh.vertices, self.mesh.faces, self.mesh.vertex_normals))
+
+        self.assertIn("Number of accessors: 3", output)
+        primitive = gltf.meshes[0].primitives[0]
+        normals = self.read_accessor(gltf, primitive.attributes.NORMAL, np.float32, 3)
+        np.testing.assert_allclose(normals, self.mesh.vertex_normals, rtol=1e-6)
+
+    def test_uint32_indices(self):
+        # Meshes with too many vertices for uint16 fall back to uint32 indices
+        n_vertices = 70000
+        vertices = np.random.rand(n_vertices, 3)
+        faces = np.arange(n_vertices - n_vertices % 3).reshape(-1, 3)
+        _, gltf = self.round_trip(write_glb(vertices, faces))
+
+        primitive = gltf.meshes[0].primitives[0]
+        self.assertEqual(gltf.accessors[primitive.indices].componentType, COMPONENT_UNSIGNED_INT)
+        np.testing.assert_array_equal(self.read_accessor(gltf, primitive.indices, np.uint32, 3), faces)
+
+    def test_unaligned_indices(self):
+        # A single uint16 triangle is 6 bytes and is padded to a 4 byte boundary
+        vertices = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0]], dtype=np.float32)
+        _, gltf = self.round_trip(write_glb(vertices, [[0, 1, 2]]))
+        self.assertEqual(gltf.buffers[0].byteLength, 36 + 8)
+
+    def test_trimesh_can_load(self):
+        # trimesh reads back the same mesh
+        glb_data = write_glb(self.mesh.vertices, self.mesh.faces)
+        loaded = trimesh.load(io.BytesIO(glb_data), file_type="glb", force="mesh", process=False)
+
+        np.testing.assert_allclose(loaded.vertices, self.mesh.vertices)
+        np.testing.assert_array_equal(loaded.faces, self.mesh.faces)
+
+    def test_empty_mesh(self):
+        # An empty mesh is a valid GLB without meshes
+        output, gltf = self.round_trip(write_glb(np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)))
+        self.assertIn("Number of meshes: 0", output)
+        self.assertEqual(len(gltf.nodes), 1)
+
+if __name__ == '__main__':
+    unittest.main()
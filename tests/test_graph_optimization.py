@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import patch
+import copy
+import torch
+from lib.graph_optimization import fold_batch_norms, freeze_model, optimize_model
+from model.config import cfg
+from model.model_architecture import SwinVoxModel
+
+
+def random_batch_norm_statistics(model):
+    # Freshly built BatchNorms are the identity, give them statistics as a trained model would have
+    for module in model.modules():
+        if isinstance(module, (torch.nn.BatchNorm2d, torch.nn.BatchNorm3d)):
+            module.running_mean.uniform_(-0.1, 0.1)
+            module.running_var.uniform_(0.5, 1.5)
+            module.weight.data.uniform_(0.5, 1.5)
+            module.bias.data.uniform_(-0.1, 0.1)
+
+
+class TestGraphOptimization(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(0)
+        cls.model = SwinVoxModel(cfg)
+        random_batch_norm_statistics(cls.model)
+        cls.model.eval()
+        cls.images = torch.rand(1, 3, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W)
+        cls.expected = cls.model(cls.images)
+
+    def test_fold_batch_norms(self):
+        # Every BatchNorm is folded away and the output matches the unfolded model
+        model = copy.deepcopy(self.model)
+        self.assertEqual(fold_batch_norms(model), 25)
+        self.assertFalse(any(isinstance(module, (torch.nn.BatchNorm2d, torch.nn.BatchNorm3d)) for module in model.modules()))
+        self.assertTrue(torch.allclose(model(self.images), self.expected, atol=1e-5))
+
+    def test_freeze_model(self):
+        # The frozen graphs match the model for other view counts than the traced one, streamed in chunks too
+        model = copy.deepcopy(self.model)
+        fold_batch_norms(model)
+        freeze_model(model, cfg)
+        self.assertIsInstance(model.encoder, torch.jit.ScriptModule)
+        self.assertTrue(torch.allclose(model(self.images), self.expected, atol=1e-5))
+
+        images = torch.rand(1, 5, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W)
+        with patch.object(model, "view_chunk_size", 2), patch.object(self.model, "view_chunk_size", 2):
+            self.assertTrue(torch.allclose(model(images), self.model(images), atol=1e-5))
+
+    def test_modes(self):
+        # The none mode leaves the model as it is, unknown modes are rejected
+        with patch.dict(cfg.INFERENCE, {"OPTIMIZE": "none"}):
+            self.assertIs(optimize_model(self.model, cfg), self.model)
+        self.assertIsInstance(self.model.encoder.vgg[1], torch.nn.BatchNorm2d)
+        with patch.dict(cfg.INFERENCE, {"OPTIMIZE": "compile"}):
+            with self.assertRaises(ValueError):
+                optimize_model(self.model, cfg)
+
+
+if __name__ == '__main__':
+    unittest.main()
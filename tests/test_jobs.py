@@ -0,0 +1,124 @@
+import unittest
+import os
+import tempfile
+import threading
+import time
+from lib.jobs import JobQueue, MemoryJobStore, SQLiteJobStore, QUEUED, RUNNING, DONE, FAILED
+
+
+def wait_for(job_queue, job_id, timeout=5):
+    # Poll a job until it is finished
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = job_queue.get(job_id)
+        if job["status"] in (DONE, FAILED):
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(f"Job {job_id} did not finish")
+
+
+class JobStoreTests(object):
+    # Tests shared by every job store, mixed into a TestCase that sets self.store
+
+    def test_create_and_update(self):
+        # A job moves from queued to done and keeps its result
+        self.store.create("job-1")
+        self.assertEqual(self.store.get("job-1")["status"], QUEUED)
+
+        self.store.update("job-1", RUNNING)
+        self.assertEqual(self.store.get("job-1")["status"], RUNNING)
+
+        self.store.update("job-1", DONE, result=b"glTF data")
+        job = self.store.get("job-1")
+        self.assertEqual(job["status"], DONE)
+        self.assertEqual(job["result"], b"glTF data")
+        self.assertIsNone(job["error"])
+
+    def test_failed_job(self):
+        # A failed job keeps its error message
+        self.store.create("job-1")
+        self.store.update("job-1", FAILED, error="Error processing image")
+        job = self.store.get("job-1")
+        self.assertEqual(job["status"], FAILED)
+        self.assertEqual(job["error"], "Error processing image")
+
+    def test_unknown_job(self):
+        self.assertIsNone(self.store.get("missing"))
+
+    def test_purge(self):
+        # Jobs created before the cutoff are removed
+        self.store.create("old")
+        cutoff = time.time() + 1
+        self.store.purge(cutoff)
+        self.assertIsNone(self.store.get("old"))
+
+
+class TestMemoryJobStore(JobStoreTests, unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryJobStore()
+
+
+class TestSQLiteJobStore(JobStoreTests, unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "instance", "jobs.db")
+        self.store = SQLiteJobStore(self.path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_results_survive_restart(self):
+        # Finished jobs are kept, unfinished jobs are marked as failed by the next process
+        self.store.create("finished")
+        self.store.update("finished", DONE, result=b"glTF data")
+        self.store.create("interrupted")
+        self.store.update("interrupted", RUNNING)
+
+        store = SQLiteJobStore(self.path)
+        self.assertEqual(store.get("finished")["result"], b"glTF data")
+        self.assertEqual(store.get("interrupted")["status"], FAILED)
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.job_queue = JobQueue(MemoryJobStore(), max_workers=2)
+
+    def tearDown(self):
+        self.job_queue.shutdown()
+
+    def test_submit_returns_immediately(self):
+        # submit returns a job id before the work is done
+        release = threading.Event()
+        job_id = self.job_queue.submit(lambda: release.wait(5) and b"glTF data")
+
+        self.assertIn(self.job_queue.get(job_id)["status"], (QUEUED, RUNNING))
+        release.set()
+        job = wait_for(self.job_queue, job_id)
+        self.assertEqual(job["status"], DONE)
+        self.assertEqual(job["result"], b"glTF data")
+
+    def test_failed_job(self):
+        # Exceptions are recorded as failed jobs
+        def fail():
+            raise ValueError("Error processing image")
+
+        job = wait_for(self.job_queue, self.job_queue.submit(fail))
+        self.assertEqual(job["status"], FAILED)
+        self.assertEqual(job["error"], "Error processing image")
+
+    def test_expired_jobs_are_purged(self):
+        # Jobs older than the result TTL are removed on the next submit
+        job_queue = JobQueue(MemoryJobStore(), result_ttl=-1)
+        try:
+            job_id = job_queue.submit(lambda: b"glTF data")
+            wait_for(job_queue, job_id)
+            job_queue.submit(lambda: b"glTF data")
+            self.assertIsNone(job_queue.get(job_id))
+        finally:
+            job_queue.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
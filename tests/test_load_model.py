@@ -1,5 +1,7 @@
 import unittest
 from unittest.mock import patch, MagicMock
+import os
+import tempfile
 import torch
 from model.model_architecture import SwinVoxModel
 from lib.utils import load_model 
@@ -117,5 +119,23 @@ class TestLoadModel(unittest.TestCase):
         with self.assertRaises(FileNotFoundError):
             load_model(cfg)
 
+    def test_load_model_metadata(self):
+        # The parameter counts and checkpoint details are computed once when the model is loaded
+        model = SwinVoxModel(cfg)
+        checkpoint = {f"{name}_state_dict": module.state_dict() for name, module in model.named_children()}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "checkpoint.pth")
+            torch.save(checkpoint, path)
+            with patch.dict(cfg.INFERENCE, {"CHECKPOINT_PATH": path}):
+                loaded_model = load_model(cfg)
+
+        metadata = loaded_model.metadata
+        self.assertEqual(metadata["backend"], "torch")
+        self.assertEqual(metadata["checkpoint_format"], "torch")
+        self.assertEqual(metadata["checkpoint_fingerprint"], loaded_model.checkpoint_fingerprint)
+        self.assertEqual(metadata["dtype"], "float32")
+        self.assertEqual(metadata["parameters"]["total"], sum(p.numel() for p in model.parameters()))
+        self.assertEqual(metadata["parameters"]["refiner"], sum(p.numel() for p in model.refiner.parameters()))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,109 @@
+import os
+import signal
+import time
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import MagicMock, patch
+import numpy as np
+import torch
+from lib.meshing import MeshingPool, pack_volume, unpack_volume, volume_to_glb, MESH_MODES
+from lib.tracing import tracer
+from lib.utils import generate_3d_model
+
+
+class TestPackVolume(unittest.TestCase):
+
+    def setUp(self):
+        # Random probability volume like the model output
+        self.volume = np.random.default_rng(0).random((32, 32, 32)).astype(np.float32)
+
+    def test_occupancy_is_bit_packed(self):
+        # The cubes and greedy modes only keep the occupancy, 1 bit per voxel
+        shape, data = pack_volume(self.volume, "cubes")
+        self.assertEqual(len(data), 32 ** 3 // 8)
+        np.testing.assert_array_equal(unpack_volume((shape, data), "cubes"), self.volume > 0.5)
+
+    def test_probabilities_are_kept(self):
+        # The smooth mode keeps the probabilities as float16
+        packed = pack_volume(self.volume, "smooth")
+        np.testing.assert_allclose(unpack_volume(packed, "smooth"), self.volume, atol=1e-3)
+
+
+class TestMeshingPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.mesh_pool = MeshingPool(max_workers=2).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.mesh_pool.shutdown()
+
+    def setUp(self):
+        # Probability volume of a soft sphere
+        x, y, z = np.mgrid[:32, :32, :32]
+        radius = np.sqrt((x - 15.5) ** 2 + (y - 15.5) ** 2 + (z - 15.5) ** 2)
+        self.volume = (1 / (1 + np.exp(radius - 12))).astype(np.float32)
+
+    def test_same_glb_as_inline_meshing(self):
+        # The worker processes produce the same GLB as meshing on the calling thread
+        for mesh_mode in ("cubes", "greedy"):
+            glb_data = self.mesh_pool.submit(self.volume, mesh_mode).result()
+            self.assertEqual(glb_data, volume_to_glb(self.volume, mesh_mode))
+
+    def test_smooth_mode(self):
+        # The smooth mode works on the float16 probabilities
+        glb_data = self.mesh_pool.submit(self.volume, "smooth", iso_level=0.4).result()
+        self.assertEqual(glb_data[:4], b'glTF')
+
+    def test_generate_3d_model_with_pool(self):
+        # generate_3d_model returns the same GLB with and without the pool
+        mock_model = MagicMock(return_value=torch.from_numpy(self.volume).unsqueeze(0))
+        dummy_input = torch.rand(1, 1, 3, 224, 224)
+        for mesh_mode in MESH_MODES:
+            self.assertEqual(
+                generate_3d_model(dummy_input, mock_model, mesh_mode, mesh_pool=self.mesh_pool)[:4], b'glTF'
+            )
+        self.assertEqual(
+            generate_3d_model(dummy_input, mock_model, "cubes", mesh_pool=self.mesh_pool),
+            generate_3d_model(dummy_input, mock_model, "cubes"),
+        )
+
+
+class TestBrokenMeshingPool(unittest.TestCase):
+
+    def setUp(self):
+        self.mesh_pool = MeshingPool(max_workers=1).start()
+        self.addCleanup(self.mesh_pool.shutdown)
+        self.volume = np.zeros((32, 32, 32), dtype=np.float32)
+        self.volume[8:24, 8:24, 8:24] = 1
+
+    def test_killed_worker(self):
+        # A worker killed between requests, e.g. by the OOM killer, does not fail the requests after it
+        for pid in list(self.mesh_pool._executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        for _ in range(2):
+            self.assertEqual(self.mesh_pool.submit(self.volume, "cubes").result(timeout=60)[:4], b'glTF')
+
+    def test_call_that_kills_its_worker(self):
+        # A call that kills its worker every time fails after one retry, and the pool keeps working
+        with self.assertRaises(BrokenProcessPool):
+            self.mesh_pool._run(os._exit, 1).result(timeout=60)
+        self.assertEqual(self.mesh_pool.submit(self.volume, "cubes").result(timeout=60)[:4], b'glTF')
+
+    def test_lock_held_during_restart(self):
+        # A lock held by another thread while the workers are replaced is free in the new workers. The traced
+        # meshing call takes the lock of the tracer in the worker, a forked copy of the held lock would block it.
+        executor = self.mesh_pool._executor
+        for pid in list(executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        with patch.object(tracer, "enabled", True):
+            with tracer._lock:
+                future = self.mesh_pool.submit(self.volume, "cubes")
+                while self.mesh_pool._executor is executor or not self.mesh_pool._executor._processes:
+                    time.sleep(0.01)
+            self.assertEqual(future.result(timeout=60)[:4], b'glTF')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+import threading
+from lib.model_loader import ModelLoader, LOADING, READY, FAILED
+
+
+class TestModelLoader(unittest.TestCase):
+
+    def test_ready_after_setup(self):
+        # A setup run on the calling thread is done when start returns
+        loader = ModelLoader(lambda: None).start(background=False)
+        self.assertTrue(loader.ready)
+        self.assertEqual(loader.status()["status"], READY)
+        self.assertIsNone(loader.status()["error"])
+
+    def test_loading_in_background(self):
+        # The loader reports loading until the background setup returns
+        release = threading.Event()
+        loader = ModelLoader(release.wait).start(background=True)
+        self.assertFalse(loader.ready)
+        self.assertFalse(loader.wait(timeout=0.05))
+        self.assertEqual(loader.status()["status"], LOADING)
+        self.assertIsNotNone(loader.status()["seconds"])
+
+        release.set()
+        self.assertTrue(loader.wait(timeout=5))
+        self.assertEqual(loader.status()["status"], READY)
+
+    def test_failed_setup(self):
+        # An exception in the setup is reported instead of raised
+        def setup():
+            raise RuntimeError("missing checkpoint")
+
+        loader = ModelLoader(setup).start(background=True)
+        self.assertFalse(loader.wait(timeout=5))
+        status = loader.status()
+        self.assertEqual(status["status"], FAILED)
+        self.assertEqual(status["error"], "missing checkpoint")
+
+
+if __name__ == '__main__':
+    unittest.main()
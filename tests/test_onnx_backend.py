@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import patch
+import importlib.util
+import os
+import tempfile
+import torch
+from lib.onnx_backend import OnnxRuntimeModel, export_onnx
+from lib.utils import load_inference_backend
+from model.config import cfg
+from model.model_architecture import SwinVoxModel
+
+ONNX_AVAILABLE = all(importlib.util.find_spec(name) for name in ("onnx", "onnxscript", "onnxruntime"))
+
+
+@unittest.skipUnless(ONNX_AVAILABLE, "needs the onnx, onnxscript and onnxruntime packages")
+class TestOnnxBackend(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(0)
+        cls.model = SwinVoxModel(cfg)
+        cls.model.eval()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "model.onnx")
+        export_onnx(cls.model, cls.path, cfg, max_views=8)
+        cls.onnx_model = OnnxRuntimeModel(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_parity(self):
+        # ONNX Runtime matches the PyTorch model for other batch sizes and view counts than the exported one
+        for batch_size, n_views in ((1, 1), (1, 5), (2, 3)):
+            images = torch.rand(batch_size, n_views, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W)
+            with torch.no_grad():
+                expected = self.model(images)
+            volumes = self.onnx_model(images)
+            self.assertEqual(volumes.shape, (batch_size, 32, 32, 32))
+            self.assertTrue(torch.allclose(volumes, expected, atol=1e-5))
+
+    def test_load_inference_backend(self):
+        # The onnxruntime backend loads the exported model and namespaces the caches with its fingerprint
+        with patch.dict(cfg.INFERENCE, {"BACKEND": "onnxruntime", "ONNX_PATH": self.path}):
+            model = load_inference_backend(cfg)
+        self.assertIsInstance(model, OnnxRuntimeModel)
+        self.assertTrue(model.checkpoint_fingerprint)
+        self.assertEqual(model.metadata["backend"], "onnxruntime")
+        self.assertEqual(model.metadata["dtype"], "float32")
+        self.assertEqual(model.metadata["parameters"]["total"], sum(p.numel() for p in self.model.parameters()))
+
+
+class TestInferenceBackends(unittest.TestCase):
+
+    def test_unknown_backend(self):
+        with patch.dict(cfg.INFERENCE, {"BACKEND": "tensorrt"}):
+            with self.assertRaises(ValueError):
+                load_inference_backend(cfg)
+
+    def test_missing_model(self):
+        # A missing exported model fails the load, like a missing checkpoint
+        with patch.dict(cfg.INFERENCE, {"BACKEND": "onnxruntime", "ONNX_PATH": "missing.onnx"}):
+            with self.assertRaises(RuntimeError):
+                load_inference_backend(cfg)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import main
+from model.config import cfg
+
+
+class TestStartWorker(unittest.TestCase):
+
+    @patch('main.start_model_services')
+    @patch('main.start_mesh_pool')
+    @patch('main.configure_runtime')
+    def test_start_worker(self, mock_configure_runtime, mock_start_mesh_pool, mock_start_model_services):
+        # The worker takes its share of the cores and starts its own processes and threads
+        with patch.dict(cfg.SERVER, {"WORKERS": 4}), patch('main.model_loader', MagicMock(ready=True)):
+            main.start_worker(worker_index=2)
+        mock_configure_runtime.assert_called_once_with(cfg, workers=4, worker_index=2)
+        mock_start_mesh_pool.assert_called_once()
+        mock_start_model_services.assert_called_once()
+
+    @patch('main.start_model_services')
+    @patch('main.start_mesh_pool')
+    @patch('main.configure_runtime')
+    def test_model_not_loaded(self, mock_configure_runtime, mock_start_mesh_pool, mock_start_model_services):
+        # The model services only start when the master loaded the model
+        with patch('main.model_loader', MagicMock(ready=False)):
+            main.start_worker()
+        mock_start_mesh_pool.assert_called_once()
+        mock_start_model_services.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
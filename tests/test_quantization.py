@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import patch
+import copy
+import os
+import tempfile
+import torch
+from lib.quantization import quantize_model, quantize_linear_layers, calibrate_encoder, save_calibration, select_engine
+from model.config import cfg
+from model.model_architecture import SwinVoxModel
+
+
+class TestQuantization(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(0)
+        cls.model = SwinVoxModel(cfg)
+        cls.model.eval()
+        cls.images = [torch.rand(1, 2, 3, cfg.CONST.IMG_H, cfg.CONST.IMG_W) for _ in range(2)]
+
+    def test_dynamic_linear_layers(self):
+        # The refiner Linear layers get int8 weights and the output stays close to the float model
+        model = quantize_linear_layers(copy.deepcopy(self.model))
+        self.assertIsInstance(model.refiner.layer4[0], torch.ao.nn.quantized.dynamic.Linear)
+        self.assertIsInstance(model.refiner.layer5[0], torch.ao.nn.quantized.dynamic.Linear)
+        self.assertLess((model(self.images[0]) - self.model(self.images[0])).abs().max().item(), 0.05)
+
+    def test_static_mode_loads_calibration(self):
+        # The static mode rebuilds the calibrated int8 encoder from the calibration file
+        engine = select_engine(cfg)
+        calibrated = calibrate_encoder(quantize_linear_layers(copy.deepcopy(self.model)), self.images, engine)
+        encoder_features = self.model.encoder(self.images[0])
+        self.assertEqual(calibrated.encoder(self.images[0]).shape, encoder_features.shape)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "encoder_int8.pth")
+            save_calibration(calibrated.encoder, engine, path)
+            with patch.dict(cfg.QUANTIZATION, {"MODE": "static", "ENGINE": "", "CALIBRATION_PATH": path}):
+                model = quantize_model(copy.deepcopy(self.model), cfg)
+
+        self.assertTrue(torch.equal(model(self.images[1]), calibrated(self.images[1])))
+
+    def test_modes(self):
+        # The none mode leaves the model as it is, unknown modes are rejected
+        with patch.dict(cfg.QUANTIZATION, {"MODE": "none"}):
+            self.assertIs(quantize_model(self.model, cfg), self.model)
+        self.assertIsInstance(self.model.refiner.layer4[0], torch.nn.Linear)
+        with patch.dict(cfg.QUANTIZATION, {"MODE": "int4"}):
+            with self.assertRaises(ValueError):
+                quantize_model(self.model, cfg)
+
+    def test_calibrate_script_loads_float_model(self):
+        # calibrate.py fuses the encoder itself, whatever quantization and graph optimization the server uses
+        import calibrate
+
+        def load_model(cfg):
+            self.assertEqual((cfg.QUANTIZATION.MODE, cfg.INFERENCE.OPTIMIZE), ("none", "none"))
+            return copy.deepcopy(self.model)
+
+        with patch.dict(cfg.QUANTIZATION, {"MODE": "static"}), patch.dict(cfg.INFERENCE, {"OPTIMIZE": "freeze"}), \
+                patch("sys.argv", ["calibrate.py"]), patch("calibrate.load_model", side_effect=load_model) as mock_load, \
+                patch("calibrate.load_image_groups", return_value=self.images), \
+                patch("calibrate.save_calibration") as mock_save:
+            calibrate.main()
+        mock_load.assert_called_once()
+        mock_save.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
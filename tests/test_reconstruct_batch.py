@@ -0,0 +1,73 @@
+import unittest
+from unittest.mock import MagicMock
+from io import BytesIO
+import torch
+from PIL import Image
+from lib.utils import reconstruct_batch, process_images
+from model.config import cfg
+
+
+def image_bytes(color, size=(64, 48)):
+    # Encode a plain color image as PNG bytes
+    buffer = BytesIO()
+    Image.new('RGB', size, color=color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def fake_forward(images_tensor):
+    # Occupancy volume of a solid block for every object in the batch
+    voxel_output = torch.zeros(images_tensor.size(0), 32, 32, 32)
+    voxel_output[:, 8:24, 8:24, 8:24] = 0.9
+    return voxel_output
+
+
+class TestReconstructBatch(unittest.TestCase):
+
+    def setUp(self):
+        # Mock model that records the batches it is called with
+        self.mock_model = MagicMock(side_effect=fake_forward)
+
+        # Four objects: two with one view, one with two views and one with three views
+        self.image_groups = [
+            [image_bytes('red')],
+            [image_bytes('green'), image_bytes('blue')],
+            [image_bytes('white')],
+            [image_bytes('red'), image_bytes('green'), image_bytes('blue')],
+        ]
+
+    def test_one_forward_pass_per_view_count(self):
+        # Objects with the same number of views share a forward pass
+        glb_models = reconstruct_batch(self.image_groups, self.mock_model, cfg)
+
+        self.assertEqual(len(glb_models), len(self.image_groups))
+        self.assertTrue(all(glb_model[:4] == b'glTF' for glb_model in glb_models))
+
+        batch_shapes = sorted(tuple(call.args[0].shape[:2]) for call in self.mock_model.call_args_list)
+        self.assertEqual(batch_shapes, [(1, 2), (1, 3), (2, 1)])
+
+    def test_batches_follow_object_order(self):
+        # Objects keep their order within a batch, so each output belongs to the right object
+        reconstruct_batch(self.image_groups, self.mock_model, cfg)
+        single_view_batch = next(c.args[0] for c in self.mock_model.call_args_list if c.args[0].size(1) == 1)
+
+        for batch_index, object_index in enumerate([0, 2]):
+            torch.testing.assert_close(
+                single_view_batch[batch_index], process_images(self.image_groups[object_index], cfg)[0]
+            )
+
+    def test_max_batch_size(self):
+        # Large groups are split into several forward passes
+        image_groups = [[image_bytes('red')] for _ in range(5)]
+        glb_models = reconstruct_batch(image_groups, self.mock_model, cfg, max_batch_size=2)
+
+        self.assertEqual(len(glb_models), 5)
+        self.assertEqual([call.args[0].size(0) for call in self.mock_model.call_args_list], [2, 2, 1])
+
+    def test_unknown_mesh_mode(self):
+        # An unknown mesh mode fails before running the model
+        with self.assertRaises(ValueError):
+            reconstruct_batch(self.image_groups, self.mock_model, cfg, mesh_mode="spheres")
+        self.mock_model.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
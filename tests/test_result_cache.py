@@ -0,0 +1,114 @@
+import unittest
+import os
+import tempfile
+import time
+from lib.result_cache import ResultCache, SQLiteResultStore, DirectoryResultStore, result_key
+from model.config import cfg
+
+MESH_OPTIONS = {"iso_level": 0.5, "smoothing_iterations": 0, "step_size": 1}
+
+
+class TestResultKey(unittest.TestCase):
+
+    def test_order_independent(self):
+        # The same files in another order give the same key
+        self.assertEqual(
+            result_key([b"front", b"side"], cfg, "cubes", MESH_OPTIONS),
+            result_key([b"side", b"front"], cfg, "cubes", MESH_OPTIONS),
+        )
+
+    def test_settings_change_the_key(self):
+        # Other files, mesh settings or checkpoints give other keys
+        key = result_key([b"front", b"side"], cfg, "cubes", MESH_OPTIONS)
+        self.assertNotEqual(key, result_key([b"front"], cfg, "cubes", MESH_OPTIONS))
+        self.assertNotEqual(key, result_key([b"front", b"side"], cfg, "greedy", MESH_OPTIONS))
+        self.assertNotEqual(key, result_key([b"front", b"side"], cfg, "cubes", MESH_OPTIONS, namespace="other"))
+        smooth_key = result_key([b"front", b"side"], cfg, "smooth", MESH_OPTIONS)
+        self.assertNotEqual(smooth_key, result_key([b"front", b"side"], cfg, "smooth", dict(MESH_OPTIONS, iso_level=0.4)))
+        self.assertNotEqual(smooth_key, result_key([b"front", b"side"], cfg, "smooth", dict(MESH_OPTIONS, step_size=2)))
+
+    def test_ignored_mesh_options(self):
+        # The cubes and greedy modes ignore the smooth mode options, requests differing only in those hit the cache
+        cache = ResultCache(1024)
+        for mesh_mode in ("cubes", "greedy"):
+            cache.put(result_key([b"front"], cfg, mesh_mode, MESH_OPTIONS), b"glTF")
+            other_options = dict(MESH_OPTIONS, iso_level=0.4, smoothing_iterations=3, step_size=2)
+            self.assertEqual(cache.get(result_key([b"front"], cfg, mesh_mode, other_options)), b"glTF")
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_lru_eviction_by_bytes(self):
+        # With room for two results the least recently used one is evicted
+        cache = ResultCache(8)
+        cache.put("a", b"glTF")
+        cache.put("b", b"glTF")
+        cache.get("a")
+        cache.put("c", b"glTF")
+
+        self.assertEqual(cache.get("a"), b"glTF")
+        self.assertIsNone(cache.get("b"))
+        metrics = cache.metrics()
+        self.assertEqual(metrics["evictions"], 1)
+        self.assertEqual((metrics["hits"], metrics["misses"]), (2, 1))
+
+    def test_backing_store(self):
+        # Results evicted from memory are read back from the store
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        cache = ResultCache(4, DirectoryResultStore(temp_dir.name, 1024))
+        cache.put("a", b"glTF")
+        cache.put("b", b"glTF")
+
+        self.assertEqual(cache.get("a"), b"glTF")
+        self.assertEqual(cache.metrics()["store_hits"], 1)
+
+
+class ResultStoreTests(object):
+    # Tests shared by every result store, mixed into a TestCase that sets self.make_store
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        store = self.make_store(1024)
+        self.assertIsNone(store.get("a"))
+        store.put("a", b"glTF data")
+        self.assertEqual(store.get("a"), b"glTF data")
+
+    def test_results_survive_restart(self):
+        self.make_store(1024).put("a", b"glTF data")
+        self.assertEqual(self.make_store(1024).get("a"), b"glTF data")
+
+    def test_least_recently_used_removed_over_budget(self):
+        # Reading a result keeps it, the oldest untouched result is removed
+        store = self.make_store(20)
+        store.put("a", b"0123456789")
+        time.sleep(0.01)
+        store.put("b", b"0123456789")
+        time.sleep(0.01)
+        store.get("a")
+        time.sleep(0.01)
+        store.put("c", b"0123456789")
+
+        self.assertIsNotNone(store.get("a"))
+        self.assertIsNone(store.get("b"))
+        self.assertIsNotNone(store.get("c"))
+
+
+class TestSQLiteResultStore(ResultStoreTests, unittest.TestCase):
+
+    def make_store(self, max_bytes):
+        return SQLiteResultStore(os.path.join(self.temp_dir.name, "instance", "results.db"), max_bytes)
+
+
+class TestDirectoryResultStore(ResultStoreTests, unittest.TestCase):
+
+    def make_store(self, max_bytes):
+        return DirectoryResultStore(os.path.join(self.temp_dir.name, "results"), max_bytes)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import patch
+import os
+import subprocess
+import sys
+import threading
+import time
+import torch
+from lib.runtime import configure_runtime, InferenceLimiter, WorkerSlots, available_cores
+from model.config import cfg
+
+
+class TestConfigureRuntime(unittest.TestCase):
+
+    def setUp(self):
+        self.threads = torch.get_num_threads()
+        self.cores = available_cores()
+
+    def tearDown(self):
+        torch.set_num_threads(self.threads)
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.cores)
+
+    @patch('lib.runtime.available_cores', return_value=list(range(8)))
+    def test_threads_split_between_workers(self, mock_available_cores):
+        # Without INTRA_OP_THREADS the workers divide the cores between them
+        with patch.dict(cfg.RUNTIME, {"INTRA_OP_THREADS": 0, "PINNING": "none"}):
+            settings = configure_runtime(cfg, workers=4)
+        self.assertEqual(settings["intra_op_threads"], 2)
+        self.assertEqual(torch.get_num_threads(), 2)
+
+    def test_configured_threads(self):
+        # INTRA_OP_THREADS is used as is
+        with patch.dict(cfg.RUNTIME, {"INTRA_OP_THREADS": 3, "PINNING": "none"}):
+            configure_runtime(cfg, workers=4)
+        self.assertEqual(torch.get_num_threads(), 3)
+
+    @patch('lib.runtime.os.sched_setaffinity')
+    @patch('lib.runtime.available_cores', return_value=list(range(8)))
+    def test_worker_pinning(self, mock_available_cores, mock_sched_setaffinity):
+        # Every worker is pinned to its own slice of the cores
+        with patch.dict(cfg.RUNTIME, {"INTRA_OP_THREADS": 0, "PINNING": "worker"}):
+            settings = configure_runtime(cfg, workers=4, worker_index=1)
+        mock_sched_setaffinity.assert_called_once_with(0, [2, 3])
+        self.assertEqual(settings["cores"], [2, 3])
+
+    def test_unknown_pinning(self):
+        with patch.dict(cfg.RUNTIME, {"PINNING": "everywhere"}):
+            with self.assertRaises(ValueError):
+                configure_runtime(cfg)
+
+    def test_environment_overrides(self):
+        # SWINVOX_RUNTIME_<KEY> overrides the default, converted to its type
+        env = dict(os.environ, SWINVOX_RUNTIME_INTRA_OP_THREADS="6", SWINVOX_RUNTIME_PINNING="worker")
+        output = subprocess.run(
+            [sys.executable, "-c", "from model.config import cfg; print(cfg.RUNTIME.INTRA_OP_THREADS, cfg.RUNTIME.PINNING)"],
+            capture_output=True, text=True, check=True, env=env,
+        ).stdout
+        self.assertEqual(output.split(), ["6", "worker"])
+
+
+
+class TestWorkerSlots(unittest.TestCase):
+
+    def test_restarted_worker_takes_the_free_index(self):
+        # Worker ids keep growing as workers restart, the indices of the live workers stay distinct and compact
+        slots = WorkerSlots()
+        self.assertEqual([slots.acquire(worker_id) for worker_id in (1, 2, 3)], [0, 1, 2])
+        slots.release(2)
+        self.assertEqual(slots.acquire(4), 1)
+        slots.release(1)
+        slots.release(3)
+        self.assertEqual([slots.acquire(worker_id) for worker_id in (5, 6)], [0, 2])
+        slots.release(7)
+
+class TestInferenceLimiter(unittest.TestCase):
+
+    def test_limits_concurrent_calls(self):
+        # No more than max_concurrent calls run the model at the same time
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def model(images_tensor):
+            with lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return images_tensor * 2
+
+        limiter = InferenceLimiter(model, max_concurrent=2)
+        threads = [threading.Thread(target=limiter, args=(torch.ones(1),)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(running[1], 2)
+        self.assertTrue(torch.equal(limiter(torch.ones(1)), torch.full((1,), 2.0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
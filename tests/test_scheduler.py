@@ -0,0 +1,100 @@
+import unittest
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import torch
+from lib.scheduler import MicroBatchScheduler
+
+
+class FakeModel:
+    # Returns a volume filled with the mean of each object's images and records the batch shapes
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batch_shapes = []
+        self.lock = threading.Lock()
+
+    def __call__(self, images_tensor):
+        with self.lock:
+            self.batch_shapes.append(tuple(images_tensor.shape[:2]))
+        time.sleep(self.delay)
+        means = images_tensor.mean(dim=(1, 2, 3, 4))
+        return means.view(-1, 1, 1, 1).expand(-1, 32, 32, 32).clone()
+
+
+def images(value, n_views=1):
+    # [1, n_views, 3, 8, 8] tensor of a constant value
+    return torch.full((1, n_views, 3, 8, 8), float(value))
+
+
+class TestMicroBatchScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.model = FakeModel(delay=0.05)
+        self.scheduler = MicroBatchScheduler(self.model, max_batch_size=4, max_wait_ms=50).start()
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def test_single_job(self):
+        # A single job behaves like calling the model directly
+        voxel_output = self.scheduler(images(3))
+        self.assertEqual(voxel_output.shape, (1, 32, 32, 32))
+        self.assertTrue(torch.all(voxel_output == 3))
+
+    def test_concurrent_jobs_are_batched(self):
+        # Concurrent jobs share forward passes and every caller gets its own result
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda value: self.scheduler(images(value)), range(8)))
+
+        for value, voxel_output in enumerate(results):
+            self.assertTrue(torch.all(voxel_output == value))
+        self.assertLess(len(self.model.batch_shapes), 8)
+        self.assertTrue(all(batch_size <= 4 for batch_size, _ in self.model.batch_shapes))
+
+    def test_view_counts_are_not_mixed(self):
+        # Jobs with different view counts never share a forward pass
+        futures = [self.scheduler.submit(images(value, n_views=1 + value % 3)) for value in range(6)]
+        results = [future.result() for future in futures]
+
+        for value, voxel_output in enumerate(results):
+            self.assertTrue(torch.all(voxel_output == value))
+        for n_views in (1, 2, 3):
+            self.assertEqual(sum(batch_size for batch_size, views in self.model.batch_shapes if views == n_views), 2)
+
+    def test_errors_reach_the_caller(self):
+        # A failing forward pass is raised by every future in the batch
+        scheduler = MicroBatchScheduler(lambda images_tensor: 1 / 0).start()
+        try:
+            with self.assertRaises(ZeroDivisionError):
+                scheduler(images(1))
+            self.assertEqual(scheduler.metrics()["jobs_failed"], 1)
+        finally:
+            scheduler.stop()
+
+    def test_metrics(self):
+        # Metrics count jobs, forward passes and batch sizes
+        futures = [self.scheduler.submit(images(value)) for value in range(4)]
+        for future in futures:
+            future.result()
+        metrics = self.scheduler.metrics()
+
+        self.assertEqual(metrics["jobs_submitted"], 4)
+        self.assertEqual(metrics["jobs_completed"], 4)
+        self.assertEqual(metrics["queue_depth"], 0)
+        self.assertEqual(sum(size * count for size, count in metrics["batch_sizes"].items()), 4)
+        self.assertGreaterEqual(metrics["mean_batch_size"], 1)
+        self.assertGreaterEqual(metrics["max_queue_depth"], 1)
+
+    def test_stop_drains_queue(self):
+        # Jobs submitted before stop are still completed
+        futures = [self.scheduler.submit(images(value)) for value in range(3)]
+        self.scheduler.stop()
+        self.assertTrue(all(future.done() for future in futures))
+
+    def test_submit_requires_start(self):
+        # Submitting to a scheduler that is not running fails immediately
+        with self.assertRaises(RuntimeError):
+            MicroBatchScheduler(self.model).submit(images(1))
+
+if __name__ == '__main__':
+    unittest.main()
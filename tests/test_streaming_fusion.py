@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import patch
+import torch
+from model.config import cfg
+from model.merger import Merger, StreamingFusion
+from model.model_architecture import SwinVoxModel
+
+
+class TestStreamingFusion(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.merger = Merger(cfg).eval()
+
+    def test_matches_merger(self):
+        # Fusing the views in chunks gives the same volume as the merger on all the views
+        raw_features = torch.rand(2, 7, 9, 32, 32, 32)
+        coarse_volumes = torch.rand(2, 7, 32, 32, 32)
+        with torch.no_grad():
+            expected = self.merger(raw_features, coarse_volumes)
+            for chunk_size in (1, 3, 7):
+                fusion = StreamingFusion()
+                for views in range(0, 7, chunk_size):
+                    fusion.update(
+                        self.merger.score(raw_features[:, views:views + chunk_size]),
+                        coarse_volumes[:, views:views + chunk_size],
+                    )
+                torch.testing.assert_close(fusion.result(), expected, rtol=1e-5, atol=1e-5)
+
+    def test_large_weights_are_stable(self):
+        # The running maximum keeps the exponentials finite for large fusion weights
+        volume_weights = torch.tensor([[[500.0]], [[1000.0]], [[-1000.0]]]).view(1, 3, 1, 1, 1)
+        coarse_volumes = torch.tensor([0.2, 0.7, 0.9]).view(1, 3, 1, 1, 1)
+        fusion = StreamingFusion()
+        for view in range(3):
+            fusion.update(volume_weights[:, view:view + 1], coarse_volumes[:, view:view + 1])
+        torch.testing.assert_close(fusion.result(), torch.full((1, 1, 1, 1), 0.7))
+
+    def test_no_views(self):
+        with self.assertRaises(ValueError):
+            StreamingFusion().result()
+
+
+class TestStreamingModel(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(0)
+        cls.model = SwinVoxModel(cfg).eval()
+
+    def test_chunked_forward_matches_full_forward(self):
+        # Chunks of 2 views give the same volume as running the 5 views at once
+        rendering_images = torch.rand(1, 5, 3, 224, 224)
+        self.model.view_chunk_size = 0
+        expected = self.model(rendering_images)
+
+        self.model.view_chunk_size = 2
+        with patch.object(self.model.encoder, "forward", wraps=self.model.encoder.forward) as encoder_forward:
+            generated_volume = self.model(rendering_images)
+
+        self.assertEqual([call.args[0].size(1) for call in encoder_forward.call_args_list], [2, 2, 1])
+        torch.testing.assert_close(generated_volume, expected, rtol=1e-4, atol=1e-4)
+
+if __name__ == '__main__':
+    unittest.main()
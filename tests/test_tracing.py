@@ -0,0 +1,150 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import io
+import threading
+import time
+import numpy as np
+import torch
+from PIL import Image
+from lib.meshing import MeshingPool
+from lib.scheduler import MicroBatchScheduler
+from lib.tracing import Histogram, Tracer, tracer
+from lib.utils import process_images
+from model.config import cfg
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_cumulative_buckets(self):
+        # An observation on a bucket bound counts for that bucket, the last count is the +Inf bucket
+        histogram = Histogram(buckets=(0.01, 0.1))
+        for seconds in (0.005, 0.01, 0.05, 2.0):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.cumulative_counts(), [2, 3, 4])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 2.065)
+
+
+class TestTracer(unittest.TestCase):
+
+    def test_disabled(self):
+        # Stages do nothing and no trace is started
+        disabled = Tracer(enabled=False)
+        with disabled.trace() as trace:
+            with disabled.stage("encoder"):
+                pass
+        self.assertIsNone(trace)
+        self.assertIs(disabled.stage("encoder"), disabled.stage("decoder"))
+        self.assertNotIn("encoder", disabled.prometheus())
+
+    def test_trace(self):
+        # Repeated stages add up in the trace of the request and are observed one by one in the histogram
+        enabled = Tracer(enabled=True)
+        with enabled.trace() as trace:
+            for _ in range(2):
+                with enabled.stage("decode"):
+                    time.sleep(0.01)
+        with enabled.stage("decode"):
+            pass
+
+        self.assertGreaterEqual(trace.stages["decode"], 0.02)
+        self.assertIsNone(enabled.current_trace())
+        self.assertIn('swinvox_stage_duration_seconds_count{stage="decode"} 3', enabled.prometheus())
+        self.assertRegex(trace.server_timing(), r"^decode;dur=\d+\.\d, total;dur=\d+\.\d$")
+
+    def test_trace_passed_to_threads(self):
+        # A thread working for a request adds its stages to the trace it is given
+        enabled = Tracer(enabled=True)
+
+        def resize(trace):
+            with enabled.stage("resize", trace):
+                pass
+
+        with enabled.trace() as trace:
+            thread = threading.Thread(target=resize, args=(trace,))
+            thread.start()
+            thread.join()
+        self.assertIn("resize", trace.stages)
+
+    def test_prometheus_format(self):
+        enabled = Tracer(enabled=True, buckets=(0.1, 1.0))
+        enabled.record("mesh", 0.5)
+        self.assertEqual(enabled.prometheus().splitlines()[2:], [
+            'swinvox_stage_duration_seconds_bucket{stage="mesh",le="0.1"} 0',
+            'swinvox_stage_duration_seconds_bucket{stage="mesh",le="1.0"} 1',
+            'swinvox_stage_duration_seconds_bucket{stage="mesh",le="+Inf"} 1',
+            'swinvox_stage_duration_seconds_sum{stage="mesh"} 0.5',
+            'swinvox_stage_duration_seconds_count{stage="mesh"} 1',
+        ])
+
+
+class TestPipelineStages(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.object(tracer, "enabled", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_process_images(self):
+        # Decoding and resizing are timed for every image, also on the decode pool threads
+        buffer = io.BytesIO()
+        Image.fromarray(np.zeros((64, 48, 3), dtype=np.uint8)).save(buffer, "PNG")
+        with tracer.trace() as trace:
+            process_images([buffer.getvalue()] * 3, cfg)
+        self.assertEqual(set(trace.stages), {"decode", "resize"})
+
+    def test_scheduler(self):
+        # The stages of a batched forward pass reach the trace of every request in the batch
+        def model(images_tensor):
+            with tracer.stage("encoder"):
+                return torch.zeros(images_tensor.size(0), 32, 32, 32)
+
+        scheduler = MicroBatchScheduler(model).start()
+        self.addCleanup(scheduler.stop)
+        with tracer.trace() as trace:
+            scheduler(torch.zeros(1, 1, 3, 8, 8))
+        self.assertIn("encoder", trace.stages)
+
+    def test_meshing_pool(self):
+        # Meshing and GLB export are timed in the worker process and recorded in this one
+        mesh_pool = MeshingPool(max_workers=1).start()
+        self.addCleanup(mesh_pool.shutdown)
+        volume = np.zeros((32, 32, 32), dtype=np.float32)
+        volume[8:24, 8:24, 8:24] = 1
+        with tracer.trace() as trace:
+            glb_data = mesh_pool.submit(volume, "cubes").result()
+        self.assertEqual(glb_data[:4], b"glTF")
+        self.assertEqual(set(trace.stages), {"mesh", "glb"})
+
+
+class TestTracingEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        import main
+        self.main = main
+        self.app = main.app.test_client()
+
+    def test_metrics_disabled(self):
+        with patch.object(tracer, "enabled", False):
+            self.assertEqual(self.app.get('/api/metrics').status_code, 404)
+
+    def test_server_timing(self):
+        # The stages run by a request are returned in its Server-Timing header and feed /api/metrics
+        def reconstruct(images, mesh_mode, mesh_options, cache_key=None):
+            with tracer.stage("inference"):
+                return b"glTF data"
+
+        with patch.object(tracer, "enabled", True), patch.object(self.main, "model_unavailable", return_value=None), \
+                patch.object(self.main, "model", MagicMock(checkpoint_fingerprint="test")), \
+                patch.object(self.main, "result_cache", None), patch.object(self.main, "reconstruct", reconstruct):
+            response = self.app.post('/upload', data={'images[]': (io.BytesIO(b"image"), "image.png")})
+            self.assertEqual(response.status_code, 200)
+            self.assertRegex(response.headers['Server-Timing'], r"^inference;dur=\d+\.\d, total;dur=\d+\.\d$")
+
+            metrics = self.app.get('/api/metrics')
+            self.assertEqual(metrics.status_code, 200)
+            self.assertIn('swinvox_stage_duration_seconds_count{stage="inference"}', metrics.data.decode())
+
+
+if __name__ == '__main__':
+    unittest.main()
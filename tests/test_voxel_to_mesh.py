@@ -0,0 +1,212 @@
+import unittest
+from unittest.mock import MagicMock
+import json
+import struct
+import numpy as np
+import torch
+from lib.meshing import box_per_voxel_mesh, volume_to_glb
+from lib.utils import voxel_to_mesh, voxel_to_greedy_mesh, volume_to_smooth_mesh, generate_3d_model, MESH_MODES
+from model.config import cfg
+
+
+def glb_primitive(glb_data):
+    # JSON description of the single primitive of a GLB file, and the accessors it refers to
+    json_length, = struct.unpack_from("<I", glb_data, 12)
+    gltf = json.loads(bytes(glb_data[20:20 + json_length]))
+    return gltf["meshes"][0]["primitives"][0], gltf["accessors"]
+
+
+def glb_triangle_count(glb_data):
+    # Triangles of the single primitive of a GLB file, from the count of its index accessor
+    primitive, accessors = glb_primitive(glb_data)
+    return accessors[primitive["indices"]]["count"] // 3
+
+
+class TestVoxelToMesh(unittest.TestCase):
+
+    def setUp(self):
+        # Random occupancy grid similar in size to the model output
+        rng = np.random.default_rng(0)
+        self.random_grid = (rng.random((32, 32, 32)) > 0.5).astype(np.float32)
+
+        # Solid 4x4x4 block inside an otherwise empty grid
+        self.block_grid = np.zeros((8, 8, 8), dtype=np.float32)
+        self.block_grid[2:6, 1:5, 3:7] = 1
+
+    def test_single_voxel(self):
+        # A single voxel is a closed cube with 8 shared corners and 12 triangles
+        voxel_grid = np.zeros((3, 3, 3), dtype=np.float32)
+        voxel_grid[1, 1, 1] = 1
+        mesh = voxel_to_mesh(voxel_grid)
+
+        self.assertEqual(mesh.vertices.shape, (8, 3))
+        self.assertEqual(mesh.faces.shape, (12, 3))
+        self.assertTrue(mesh.is_watertight)
+        self.assertAlmostEqual(mesh.volume, 1.0)
+        np.testing.assert_allclose(mesh.bounds, [[0.5, 0.5, 0.5], [1.5, 1.5, 1.5]])
+
+    def test_hidden_faces_are_culled(self):
+        # Only the outer shell of a solid block is meshed
+        mesh = voxel_to_mesh(self.block_grid)
+
+        self.assertTrue(mesh.is_watertight)
+        self.assertEqual(len(mesh.faces), 6 * 16 * 2)  # 6 sides, 4x4 faces each, 2 triangles per face
+        self.assertAlmostEqual(mesh.volume, 64.0)
+        self.assertAlmostEqual(mesh.area, 96.0)
+
+    def test_faces_point_outwards(self):
+        # Every face normal points away from the centre of the voxel it belongs to
+        mesh = voxel_to_mesh(self.block_grid)
+        centre = np.array([3.5, 2.5, 4.5])
+        outward = np.einsum('ij,ij->i', mesh.triangles_center - centre, mesh.face_normals)
+        self.assertTrue(np.all(outward > 0))
+
+    def test_matches_box_per_voxel_mesh(self):
+        # The culled mesh covers the same space as one box per voxel
+        voxel_size = 0.7
+        mesh = voxel_to_mesh(self.random_grid, voxel_size=voxel_size)
+        reference = box_per_voxel_mesh(self.random_grid, voxel_size=voxel_size)
+
+        np.testing.assert_allclose(mesh.bounds, reference.bounds)
+        self.assertAlmostEqual(mesh.volume, np.count_nonzero(self.random_grid) * voxel_size ** 3, places=6)
+        self.assertTrue(mesh.is_winding_consistent)
+
+    def test_empty_grid(self):
+        # An empty grid produces an empty mesh
+        mesh = voxel_to_mesh(np.zeros((32, 32, 32), dtype=np.float32))
+        self.assertEqual(len(mesh.vertices), 0)
+        self.assertEqual(len(mesh.faces), 0)
+
+    def test_export_glb(self):
+        # The mesh can still be exported as GLB
+        glb_data = voxel_to_mesh(self.random_grid).export(file_type='glb')
+        self.assertIsInstance(glb_data, bytes)
+        self.assertEqual(glb_data[:4], b'glTF')
+
+
+class TestVoxelToGreedyMesh(unittest.TestCase):
+
+    def setUp(self):
+        # Random occupancy grid similar in size to the model output
+        rng = np.random.default_rng(0)
+        self.random_grid = (rng.random((32, 32, 32)) > 0.5).astype(np.float32)
+
+        # Solid sphere, the kind of shape greedy meshing is meant for
+        x, y, z = np.mgrid[:32, :32, :32]
+        self.sphere_grid = ((x - 15.5) ** 2 + (y - 15.5) ** 2 + (z - 15.5) ** 2 < 14 ** 2).astype(np.float32)
+
+    def test_block_becomes_six_quads(self):
+        # Each side of a solid block is merged into a single rectangle
+        voxel_grid = np.zeros((8, 8, 8), dtype=np.float32)
+        voxel_grid[2:6, 1:5, 3:7] = 1
+        mesh = voxel_to_greedy_mesh(voxel_grid)
+
+        self.assertEqual(len(mesh.faces), 12)
+        self.assertAlmostEqual(mesh.volume, 64.0)
+        self.assertAlmostEqual(mesh.area, 96.0)
+        np.testing.assert_allclose(mesh.bounds, [[1.5, 0.5, 2.5], [5.5, 4.5, 6.5]])
+
+    def test_same_surface_as_voxel_to_mesh(self):
+        # Merging faces keeps the surface, volume and bounds, with fewer triangles
+        for voxel_grid in (self.random_grid, self.sphere_grid):
+            mesh = voxel_to_greedy_mesh(voxel_grid, voxel_size=0.5)
+            reference = voxel_to_mesh(voxel_grid, voxel_size=0.5)
+
+            self.assertLess(len(mesh.faces), len(reference.faces))
+            self.assertAlmostEqual(mesh.area, reference.area, places=6)
+            self.assertAlmostEqual(mesh.volume, reference.volume, places=6)
+            np.testing.assert_allclose(mesh.bounds, reference.bounds)
+
+    def test_empty_grid(self):
+        # An empty grid produces an empty mesh
+        mesh = voxel_to_greedy_mesh(np.zeros((32, 32, 32), dtype=np.float32))
+        self.assertEqual(len(mesh.faces), 0)
+
+
+class TestVolumeToSmoothMesh(unittest.TestCase):
+
+    def setUp(self):
+        # Probability volume of a soft sphere with radius 13 voxels
+        x, y, z = np.mgrid[:32, :32, :32]
+        radius = np.sqrt((x - 15.5) ** 2 + (y - 15.5) ** 2 + (z - 15.5) ** 2)
+        self.volume = (1 / (1 + np.exp((radius - 13) * 1.5))).astype(np.float32)
+
+    def test_closed_surface(self):
+        # The iso-surface of the sphere is closed, faces point outwards and it is about the right size
+        mesh = volume_to_smooth_mesh(self.volume)
+
+        self.assertTrue(mesh.is_watertight)
+        self.assertAlmostEqual(mesh.volume, 4 / 3 * np.pi * 13 ** 3, delta=0.02 * 4 / 3 * np.pi * 13 ** 3)
+
+    def test_iso_level(self):
+        # A higher iso-level gives a smaller surface
+        low = volume_to_smooth_mesh(self.volume, iso_level=0.3)
+        high = volume_to_smooth_mesh(self.volume, iso_level=0.7)
+        self.assertGreater(low.volume, high.volume)
+
+    def test_fewer_triangles_than_cubes(self):
+        # Sampling every other voxel gives far fewer triangles than one quad per voxel face
+        mesh = volume_to_smooth_mesh(self.volume, step_size=2)
+        reference = voxel_to_mesh(self.volume > 0.5)
+        self.assertLess(len(mesh.faces), len(reference.faces) / 2)
+        self.assertTrue(mesh.is_watertight)
+
+    def test_served_default_fewer_triangles_than_cubes(self):
+        # The GLB served with the configured step size has fewer triangles than the cubes mode, also for a noisy volume
+        noisy = np.random.default_rng(0).random((32, 32, 32)).astype(np.float32)
+        for volume in (self.volume, noisy):
+            smooth = volume_to_glb(volume, "smooth", step_size=cfg.MESH.STEP_SIZE)
+            cubes = volume_to_glb(volume, "cubes")
+            self.assertLess(glb_triangle_count(smooth), glb_triangle_count(cubes))
+            self.assertLess(len(smooth), len(cubes))
+
+    def test_vertex_normals(self):
+        # The smooth surface is written with a NORMAL for every vertex, the flat modes without
+        primitive, accessors = glb_primitive(volume_to_glb(self.volume, "smooth"))
+        self.assertIn("NORMAL", primitive["attributes"])
+        normal_accessor = accessors[primitive["attributes"]["NORMAL"]]
+        self.assertEqual(normal_accessor["count"], accessors[primitive["attributes"]["POSITION"]]["count"])
+        self.assertEqual(normal_accessor["type"], "VEC3")
+
+        primitive, _ = glb_primitive(volume_to_glb(self.volume, "cubes"))
+        self.assertNotIn("NORMAL", primitive["attributes"])
+
+    def test_smoothing(self):
+        # Smoothing moves vertices but keeps the topology
+        mesh = volume_to_smooth_mesh(self.volume)
+        smoothed = volume_to_smooth_mesh(self.volume, smoothing_iterations=5)
+
+        np.testing.assert_array_equal(mesh.faces, smoothed.faces)
+        self.assertFalse(np.allclose(mesh.vertices, smoothed.vertices))
+        self.assertTrue(smoothed.is_watertight)
+
+    def test_empty_volume(self):
+        # No voxel above the iso-level produces an empty mesh
+        mesh = volume_to_smooth_mesh(np.full((32, 32, 32), 0.1, dtype=np.float32))
+        self.assertEqual(len(mesh.faces), 0)
+
+
+class TestGenerate3DModelMeshModes(unittest.TestCase):
+
+    def setUp(self):
+        # Mock model returning a probability volume with a solid block in the middle
+        voxel_output = torch.zeros(1, 32, 32, 32)
+        voxel_output[:, 8:24, 8:24, 8:24] = 0.9
+        self.mock_model = MagicMock(return_value=voxel_output)
+        self.dummy_input = torch.rand(1, 1, 3, 224, 224)
+
+    def test_every_mesh_mode(self):
+        # Every mesh mode returns GLB bytes
+        for mesh_mode in MESH_MODES:
+            glb_data = generate_3d_model(self.dummy_input, self.mock_model, mesh_mode)
+            self.assertIsInstance(glb_data, bytearray)
+            self.assertEqual(glb_data[:4], b'glTF')
+
+    def test_unknown_mesh_mode(self):
+        # An unknown mesh mode fails before running the model
+        with self.assertRaises(ValueError):
+            generate_3d_model(self.dummy_input, self.mock_model, "spheres")
+        self.mock_model.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()